@@ -0,0 +1,165 @@
+
+import os
+import copy
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import save_format
+from save_format import SaveFormatError
+from metrics import LOAD_SECONDS
+
+
+# Как часто (в секундах) сверять запись индекса с mtime файла.
+# Между проверками индекс отвечает из памяти без системных вызовов.
+REVALIDATE_INTERVAL = 2.0
+
+# Сколько аккаунтов и отсутствующих имён помнит индекс (вытесняются давние)
+INDEX_SIZE = int(os.environ.get("TAJNA_INDEX_SIZE", "10000"))
+MISSING_SIZE = 1024
+
+# Секции записи, которые не декодируются при входе
+LAZY_SECTIONS = ("saved_game", "slots", "history")
+
+
+def safe_name(name: str) -> str:
+    """Имя аккаунта, пригодное для имени файла."""
+    return "".join(c for c in name if c.isalnum() or c in ('_', '-'))
+
+
+class AccountEntry:
+    """Запись индекса: где лежит аккаунт, хэш пароля и статистика.
+
+    Сохранение, слоты и история в индексе не хранятся — их читают
+    из файла при входе (AccountIndex.read_record).
+    """
+
+    __slots__ = ("path", "mtime", "version", "password_hash", "stats", "checked_at")
+
+    def __init__(self, path: str, mtime: int, record: Dict[str, Any]):
+        self.path = path
+        self.mtime = mtime
+        self.version: int = record.get("version", 0)
+        self.password_hash: str = record.get("password_hash", "")
+        self.stats: Optional[Dict[str, Any]] = record.get("stats")
+        self.checked_at = time.monotonic()
+
+    def copy_stats(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self.stats)
+
+
+class AccountIndex:
+    """Индекс аккаунтов процесса: имя → путь, хэш пароля, статистика.
+
+    Оба кэша — найденных аккаунтов и отсутствующих имён — ограничены
+    по размеру и вытесняют давно не запрошенные имена.
+    """
+
+    def __init__(self, locate: Callable[[str], Optional[str]],
+                 revalidate_interval: float = REVALIDATE_INTERVAL,
+                 size: int = INDEX_SIZE, missing_size: int = MISSING_SIZE):
+        self._locate = locate
+        self.revalidate_interval = revalidate_interval
+        self.size = size
+        self.missing_size = missing_size
+        self._entries: "OrderedDict[str, AccountEntry]" = OrderedDict()
+        # Отрицательный кэш: имя → время проверки отсутствия
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, name: str, fresh: bool = False) -> Optional[AccountEntry]:
+        """Найти аккаунт. fresh=True — обязательно сверить с диском."""
+        key = safe_name(name)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            missing_at = self._missing.get(key)
+
+        if not fresh:
+            if entry is not None and now - entry.checked_at < self.revalidate_interval:
+                return entry
+            if missing_at is not None and now - missing_at < self.revalidate_interval:
+                return None
+
+        if entry is not None:
+            try:
+                mtime = os.stat(entry.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime == entry.mtime:
+                entry.checked_at = now
+                return entry
+
+        return self._load(key, name)
+
+    def _read(self, name: str) -> Optional[Tuple[AccountEntry, Dict[str, Any]]]:
+        path = self._locate(name)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                mtime = os.fstat(f.fileno()).st_mtime_ns
+                record = save_format.decode_record(f.read(), lazy=LAZY_SECTIONS)
+            return AccountEntry(path, mtime, record), record
+        except (IOError, SaveFormatError):
+            return None
+
+    @LOAD_SECONDS.timed
+    def read(self, name: str) -> Optional[AccountEntry]:
+        """Прочитать аккаунт с диска, не занося в индекс (массовые обходы)."""
+        item = self._read(name)
+        return item[0] if item else None
+
+    @LOAD_SECONDS.timed
+    def read_record(self, name: str, remember: bool = True) -> Optional[Dict[str, Any]]:
+        """Прочитать запись аккаунта целиком: секции LAZY_SECTIONS —
+        собственные LazySection вызывающего. remember — обновить индекс."""
+        item = self._read(name)
+        if remember:
+            self._remember(safe_name(name), item[0] if item else None)
+        return item[1] if item else None
+
+    def _remember(self, key: str, entry: Optional[AccountEntry]) -> None:
+        with self._lock:
+            if entry is None:
+                self._entries.pop(key, None)
+                self._missing[key] = time.monotonic()
+                self._missing.move_to_end(key)
+                while len(self._missing) > self.missing_size:
+                    self._missing.popitem(last=False)
+            else:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                self._missing.pop(key, None)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+
+    def _load(self, key: str, name: str) -> Optional[AccountEntry]:
+        entry = self.read(name)
+        self._remember(key, entry)
+        return entry
+
+    def update(self, name: str, path: str, data: bytes) -> None:
+        """Лента изменений: запись только что сохранена этим процессом."""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self.invalidate(name)
+            return
+        entry = AccountEntry(path, mtime, save_format.decode_record(data, lazy=LAZY_SECTIONS))
+        self._remember(safe_name(name), entry)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Забыть один аккаунт или весь индекс."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+                self._missing.clear()
+            else:
+                key = safe_name(name)
+                self._entries.pop(key, None)
+                self._missing.pop(key, None)
@@ -0,0 +1,89 @@
+
+import os
+import atexit
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Set
+
+
+# Писать сохранения в фоновом потоке (0 — синхронно, для отладки)
+BACKGROUND_SAVES = os.environ.get("TAJNA_SYNC_SAVES", "0") != "1"
+
+
+class SaveWriter:
+    """Фоновый поток записи аккаунтов.
+
+    Несколько запросов от одного владельца, ожидающих записи,
+    объединяются в одну запись самого свежего состояния.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[Any, Callable[[], bool]]" = OrderedDict()
+        self._in_flight: Optional[Any] = None
+        self._failed: Set[Any] = set()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.coalesced = 0
+
+    def submit(self, owner: Any, job: Callable[[], bool]) -> None:
+        """Поставить запись в очередь. job() возвращает успех записи."""
+        with self._cond:
+            if owner in self._pending:
+                self.coalesced += 1
+            # Порядок очереди сохраняется, выполняется последний job
+            self._pending[owner] = job
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def _ensure_thread(self) -> None:
+        # После fork() поток записи в дочернем процессе не существует
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="save-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                owner, job = self._pending.popitem(last=False)
+                self._in_flight = owner
+
+            try:
+                ok = job()
+            except Exception:
+                ok = False
+
+            with self._cond:
+                self._in_flight = None
+                self.written += 1
+                if ok:
+                    self._failed.discard(owner)
+                else:
+                    self._failed.add(owner)
+                self._cond.notify_all()
+
+    def _busy(self, owner: Optional[Any]) -> bool:
+        if owner is None:
+            return bool(self._pending) or self._in_flight is not None
+        return owner in self._pending or self._in_flight is owner
+
+    def flush(self, owner: Optional[Any] = None, timeout: Optional[float] = None) -> bool:
+        """Дождаться записи (всех или одного владельца). False — была ошибка."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: not self._busy(owner), timeout):
+                return False
+            if owner is None:
+                ok = not self._failed
+                self._failed.clear()
+            else:
+                ok = owner not in self._failed
+                self._failed.discard(owner)
+            return ok
+
+
+save_writer = SaveWriter()
+
+# Незаписанные сохранения дописываются при выходе из процесса
+atexit.register(save_writer.flush)
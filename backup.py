@@ -0,0 +1,212 @@
+
+import os
+import sys
+import json
+import struct
+import hashlib
+import argparse
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+import save_format
+import storage
+from save_format import LazySection, SaveFormatError
+from account_index import LAZY_SECTIONS
+from game_state import GameManager, account_index
+
+
+# Заголовок бинарного потока выгрузки
+STREAM_MAGIC = b"TLSB\x01"
+_LENGTH = struct.Struct(">I")
+
+
+class BackupError(ValueError):
+    """Повреждённый поток выгрузки."""
+
+
+def _checksum(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _canonical_json(record: Dict[str, Any]) -> bytes:
+    return json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+# ─── выгрузка ─────────────────────────────────────────────
+
+def _read_account(name: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Прочитать аккаунт тем же путём, что и вход в игру."""
+    manager = GameManager()
+    if not manager.load_account(name, cache=False):
+        return None
+    return name, manager.to_record()
+
+
+def _jsonl_frame(name: str, record: Dict[str, Any]) -> bytes:
+    data = {k: (v.load() if isinstance(v, LazySection) else v) for k, v in record.items()}
+    line = {"name": name, "sha256": _checksum(_canonical_json(data)), "record": data}
+    return json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _binary_frame(name: str, record: Dict[str, Any]) -> bytes:
+    # Нетронутые секции копируются в поток без декодирования
+    payload = save_format.encode_record(record, "binary")
+    raw_name = name.encode("utf-8")
+    return (_LENGTH.pack(len(raw_name)) + raw_name +
+            _LENGTH.pack(len(payload)) + payload +
+            hashlib.sha256(payload).digest())
+
+
+def _unique_names(workers: int) -> Iterator[str]:
+    # Обходятся только шарды: аккаунты плоской раскладки сначала переносятся
+    storage.migrate_flat_layout()
+    # Аккаунт может лежать в шарде в обоих форматах — но всегда в одном
+    # каталоге, а файлы каталога идут подряд: помнить имена дольше не нужно
+    seen = set()
+    directory = None
+    for name, path in storage.stream_accounts(workers):
+        if os.path.dirname(path) != directory:
+            directory = os.path.dirname(path)
+            seen.clear()
+        if name not in seen:
+            seen.add(name)
+            yield name
+
+
+def export_accounts(out: BinaryIO, fmt: str = "jsonl", workers: int = storage.SCAN_WORKERS) -> int:
+    """Выгрузить все аккаунты в поток. Возвращает число аккаунтов."""
+    frame = _binary_frame if fmt == "binary" else _jsonl_frame
+    if fmt == "binary":
+        out.write(STREAM_MAGIC)
+
+    count = 0
+    for item in storage.parallel_map(_read_account, _unique_names(workers), workers):
+        if item is None:
+            continue
+        out.write(frame(*item))
+        count += 1
+    return count
+
+
+# ─── восстановление ───────────────────────────────────────
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise BackupError("Поток обрезан")
+    return data
+
+
+def _iter_binary(stream: BinaryIO) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    while True:
+        head = stream.read(_LENGTH.size)
+        if not head:
+            return
+        if len(head) != _LENGTH.size:
+            raise BackupError("Поток обрезан")
+        name = _read_exact(stream, _LENGTH.unpack(head)[0]).decode("utf-8")
+        payload = _read_exact(stream, _LENGTH.unpack(_read_exact(stream, _LENGTH.size))[0])
+        if hashlib.sha256(payload).digest() != _read_exact(stream, 32):
+            raise BackupError(f"Неверная контрольная сумма аккаунта «{name}»")
+        try:
+            yield name, save_format.decode_record(payload, lazy=LAZY_SECTIONS)
+        except SaveFormatError as e:
+            raise BackupError(f"Аккаунт «{name}»: {e}")
+
+
+def _iter_jsonl(stream: BinaryIO) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            name, record = item["name"], item["record"]
+        except (ValueError, KeyError, TypeError):
+            raise BackupError(f"Строка {number}: не удалось разобрать")
+        if _checksum(_canonical_json(record)) != item.get("sha256"):
+            raise BackupError(f"Неверная контрольная сумма аккаунта «{name}»")
+        for section in LAZY_SECTIONS:
+            if record.get(section) is not None:
+                record[section] = LazySection(value=record[section])
+        yield name, record
+
+
+def iter_backup(stream: BinaryIO) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Аккаунты из потока выгрузки (формат определяется по заголовку)."""
+    head = stream.peek(len(STREAM_MAGIC))[:len(STREAM_MAGIC)] if hasattr(stream, "peek") else b""
+    if head == STREAM_MAGIC:
+        stream.read(len(STREAM_MAGIC))
+        return _iter_binary(stream)
+    return _iter_jsonl(stream)
+
+
+def _restore_account(item: Tuple[str, Dict[str, Any]], overwrite: bool) -> str:
+    name, record = item
+    if not overwrite and account_index.read(name) is not None:
+        return "skipped"
+    if not GameManager().restore_record(name, record, overwrite):
+        return "failed"
+
+    # Проверяем, что восстановленный аккаунт открывается как при входе
+    check = GameManager()
+    if not check.load_account(name, cache=False) or check.password_hash != record.get("password_hash"):
+        return "failed"
+    if (record.get("saved_game") is not None) != check.has_saved_game():
+        return "failed"
+    return "restored"
+
+
+def import_accounts(stream: BinaryIO, overwrite: bool = False,
+                    workers: int = storage.SCAN_WORKERS) -> Dict[str, int]:
+    """Восстановить аккаунты из потока. Возвращает счётчики по результатам."""
+    counts = {"restored": 0, "skipped": 0, "failed": 0}
+    results = storage.parallel_map(lambda item: (item[0], _restore_account(item, overwrite)),
+                                   iter_backup(stream), workers)
+    for name, status in results:
+        counts[status] += 1
+        if status == "failed":
+            print(f"  ❌ Не удалось восстановить «{name}»", file=sys.stderr)
+    return counts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Выгрузка и восстановление аккаунтов")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = sub.add_parser("export", help="выгрузить все аккаунты")
+    export_cmd.add_argument("file", help="файл выгрузки ('-' — stdout)")
+    export_cmd.add_argument("--format", choices=("jsonl", "binary"), default="jsonl")
+    export_cmd.add_argument("--workers", type=int, default=storage.SCAN_WORKERS)
+
+    import_cmd = sub.add_parser("import", help="восстановить аккаунты")
+    import_cmd.add_argument("file", help="файл выгрузки ('-' — stdin)")
+    import_cmd.add_argument("--overwrite", action="store_true", help="заменять существующие аккаунты")
+    import_cmd.add_argument("--workers", type=int, default=storage.SCAN_WORKERS)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        out = sys.stdout.buffer if args.file == "-" else open(args.file, "wb")
+        try:
+            count = export_accounts(out, args.format, args.workers)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+        print(f"  ✅ Выгружено аккаунтов: {count}", file=sys.stderr)
+        return 0
+
+    stream = sys.stdin.buffer if args.file == "-" else open(args.file, "rb")
+    try:
+        counts = import_accounts(stream, args.overwrite, args.workers)
+    except BackupError as e:
+        print(f"  ❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+    print(f"  ✅ Восстановлено: {counts['restored']}, пропущено: {counts['skipped']}, "
+          f"ошибок: {counts['failed']}", file=sys.stderr)
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
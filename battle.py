@@ -2,126 +2,133 @@ import random
 from typing import Optional, Tuple
 from core import Enemy, Item
 from heroes import Hero
+from flow import Flow, Prompt, BATTLE
+from metrics import BATTLES
+from tracing import span, traced
 
 
-def get_input(prompt: str, valid_range: range) -> int:
+def get_input(io, prompt: str, valid_range: range) -> Flow[int]:
     """Получить числовой ввод."""
     while True:
         try:
-            value = int(input(prompt))
+            value = int((yield Prompt(prompt, BATTLE, valid_range)))
             if value in valid_range:
                 return value
-            print(f"  ⚠️ Введите число от {valid_range.start} до {valid_range.stop - 1}")
+            io.print(f"  ⚠️ Введите число от {valid_range.start} до {valid_range.stop - 1}")
         except ValueError:
-            print("  ⚠️ Введите число!")
+            io.print("  ⚠️ Введите число!")
 
 
-def show_combat_status(hero: Hero, enemy: Enemy) -> None:
+def show_combat_status(io, hero: Hero, enemy: Enemy) -> None:
     """Показать статус боя с именами."""
-    print(f"\n  {'─' * 50}")
+    io.print(f"\n  {'─' * 50}")
     
     # Герой
     hero_status = f"  {hero.CLASS_ICON} {hero.name}: HP {hero.hp}/{hero.max_hp}"
     if hasattr(hero, 'mp'):
         hero_status += f" | MP {hero.mp}/{hero.max_mp}"
-    print(hero_status)
+    io.print(hero_status)
     
     if hero.effects:
         effects = ", ".join(f"{e.name}({e.duration})" for e in hero.effects)
-        print(f"     Эффекты {hero.name}: {effects}")
+        io.print(f"     Эффекты {hero.name}: {effects}")
     
     # Враг
-    print(f"\n  👹 {enemy.name}: HP {enemy.hp}/{enemy.max_hp}")
+    io.print(f"\n  👹 {enemy.name}: HP {enemy.hp}/{enemy.max_hp}")
     if enemy.effects:
         effects = ", ".join(f"{e.name}({e.duration})" for e in enemy.effects)
-        print(f"     Эффекты {enemy.name}: {effects}")
+        io.print(f"     Эффекты {enemy.name}: {effects}")
     
-    print(f"  {'─' * 50}")
+    io.print(f"  {'─' * 50}")
 
 
-def choose_ability(hero: Hero) -> Optional[int]:
+def choose_ability(io, hero: Hero) -> Flow[Optional[int]]:
     """Выбор способности из списка."""
     abilities = hero.get_abilities()
     available = [(i, name, desc, avail) for i, (name, desc, avail) in enumerate(abilities)]
     
     if not any(avail for _, _, _, avail in available):
-        print("  ⚠️ Нет доступных способностей!")
+        io.print("  ⚠️ Нет доступных способностей!")
         return None
     
-    print("\n  ⚡ СПОСОБНОСТИ:")
+    io.print("\n  ⚡ СПОСОБНОСТИ:")
     for i, name, desc, avail in available:
         status = "" if avail else " [использовано]"
-        print(f"    {i + 1}. {name}{status}")
-        print(f"       {desc}")
-    print(f"    0. Отмена")
+        io.print(f"    {i + 1}. {name}{status}")
+        io.print(f"       {desc}")
+    io.print(f"    0. Отмена")
     
     while True:
-        choice = get_input("\n  Выберите способность: ", range(0, len(abilities) + 1))
+        choice = yield from get_input(io, "\n  Выберите способность: ", range(0, len(abilities) + 1))
         if choice == 0:
             return None
         
         idx = choice - 1
         if not available[idx][3]:
-            print("  ⚠️ Эта способность уже использована!")
+            io.print("  ⚠️ Эта способность уже использована!")
             continue
         return idx
 
 
-def choose_item(hero: Hero, enemy: Optional[Enemy] = None) -> Optional[Item]:
+def choose_item(io, hero: Hero, enemy: Optional[Enemy] = None) -> Flow[Optional[Item]]:
     """Выбор предмета для использования в бою."""
     usable = hero.get_usable_items(in_combat=True)
     
     if not usable:
-        print("  ⚠️ Нет предметов для использования в бою!")
+        io.print("  ⚠️ Нет предметов для использования в бою!")
         return None
     
-    print("\n  🎒 ПРЕДМЕТЫ:")
+    io.print("\n  🎒 ПРЕДМЕТЫ:")
     for i, item in enumerate(usable, 1):
         effect = item.get_effect_description()
         effect_str = f" ({effect})" if effect else ""
         target_str = " [на врага]" if item.damage > 0 else " [на себя]"
-        print(f"    {i}. {item.name}{effect_str}{target_str}")
-    print(f"    0. Отмена")
+        io.print(f"    {i}. {item.name}{effect_str}{target_str}")
+    io.print(f"    0. Отмена")
     
-    choice = get_input("\n  Выберите предмет: ", range(0, len(usable) + 1))
+    choice = yield from get_input(io, "\n  Выберите предмет: ", range(0, len(usable) + 1))
     if choice == 0:
         return None
     return usable[choice - 1]
 
 
-def battle(hero: Hero, enemy: Enemy, 
-           can_flee: bool = True) -> Tuple[bool, str]:
+@traced("battle")
+def battle(io, hero: Hero, enemy: Enemy, 
+           can_flee: bool = True) -> Flow[Tuple[bool, str]]:
     """
     Пошаговый бой.
     Возвращает: (победа: bool, результат: str)
     """
     
-    print("\n" + "⚔️" * 25)
-    print(f"\n  ⚔️ НАЧИНАЕТСЯ БОЙ!")
-    print(f"\n  {hero.CLASS_ICON} {hero.name} (HP: {hero.hp}/{hero.max_hp})")
-    print(f"  против")
-    print(f"  👹 {enemy.name} (HP: {enemy.hp}/{enemy.max_hp})")
-    print(f"\n  {enemy.description}")
-    print("\n" + "⚔️" * 25)
+    io.print("\n" + "⚔️" * 25)
+    io.print(f"\n  ⚔️ НАЧИНАЕТСЯ БОЙ!")
+    io.print(f"\n  {hero.CLASS_ICON} {hero.name} (HP: {hero.hp}/{hero.max_hp})")
+    io.print(f"  против")
+    io.print(f"  👹 {enemy.name} (HP: {enemy.hp}/{enemy.max_hp})")
+    io.print(f"\n  {enemy.description}")
+    io.print("\n" + "⚔️" * 25)
+    
+    boss = enemy.boss_id or "none"
+    BATTLES.inc(boss, "started")
     
     round_num = 1
     fled = False
     
     while hero.is_alive() and enemy.is_alive() and not fled:
-        print(f"\n{'═' * 55}")
-        print(f"  ══ РАУНД {round_num} ══")
-        print(f"{'═' * 55}")
+        io.print(f"\n{'═' * 55}")
+        io.print(f"  ══ РАУНД {round_num} ══")
+        io.print(f"{'═' * 55}")
         
         # Показываем текущий статус (эффекты ДО их срабатывания)
-        show_combat_status(hero, enemy)
+        show_combat_status(io, hero, enemy)
         
         # Обработка эффектов героя - применяем воздействие (урон от яда и т.д.)
         hero_effect_msgs = hero.process_effects()
         if hero_effect_msgs:
-            print(f"\n  📍 Эффекты {hero.name}:")
+            io.print(f"\n  📍 Эффекты {hero.name}:")
             for msg in hero_effect_msgs:
                 if msg:
-                    print(msg)
+                    io.print(msg)
         
         if not hero.is_alive():
             break
@@ -131,51 +138,51 @@ def battle(hero: Hero, enemy: Enemy,
             action_done = False
             
             while not action_done:
-                print(f"\n  📋 ДЕЙСТВИЯ {hero.name}:")
-                print(f"    1. ⚔️ Атаковать")
-                print(f"    2. ⚡ Способность ({hero.get_ability_status()})")
-                print(f"    3. 🎒 Предмет")
+                io.print(f"\n  📋 ДЕЙСТВИЯ {hero.name}:")
+                io.print(f"    1. ⚔️ Атаковать")
+                io.print(f"    2. ⚡ Способность ({hero.get_ability_status()})")
+                io.print(f"    3. 🎒 Предмет")
                 if can_flee:
-                    print(f"    4. 🏃 Бежать")
+                    io.print(f"    4. 🏃 Бежать")
                 
                 max_choice = 4 if can_flee else 3
-                choice = get_input(f"\n  Действие {hero.name}: ", range(1, max_choice + 1))
+                choice = yield from get_input(io, f"\n  Действие {hero.name}: ", range(1, max_choice + 1))
                 
                 if choice == 1:
-                    print()
-                    print(hero.attack(enemy))
+                    io.print()
+                    io.print(hero.attack(enemy))
                     action_done = True
                 
                 elif choice == 2:
                     if not hero.can_use_ability():
-                        print("  ⚠️ Способности израсходованы!")
+                        io.print("  ⚠️ Способности израсходованы!")
                         continue
                     
-                    ability_idx = choose_ability(hero)
+                    ability_idx = yield from choose_ability(io, hero)
                     if ability_idx is not None:
-                        print()
-                        print(hero.use_ability(ability_idx, enemy))
+                        io.print()
+                        io.print(hero.use_ability(ability_idx, enemy))
                         action_done = True
                 
                 elif choice == 3:
-                    item = choose_item(hero, enemy)
+                    item = yield from choose_item(io, hero, enemy)
                     if item:
-                        print()
+                        io.print()
                         target = enemy if item.damage > 0 else None
-                        print(hero.use_item(item, target))
+                        io.print(hero.use_item(item, target))
                         action_done = True
                 
                 elif choice == 4 and can_flee:
                     flee_chance = min(80, 30 + hero.agility)
                     if random.randint(1, 100) <= flee_chance:
-                        print(f"\n  🏃 {hero.name} сбегает с поля боя!")
+                        io.print(f"\n  🏃 {hero.name} сбегает с поля боя!")
                         fled = True
                         action_done = True
                     else:
-                        print(f"\n  ❌ Побег не удался! {enemy.name} преграждает путь!")
+                        io.print(f"\n  ❌ Побег не удался! {enemy.name} преграждает путь!")
                         action_done = True
         else:
-            print(f"\n  ❄️ {hero.name} не может действовать в этом раунде!")
+            io.print(f"\n  ❄️ {hero.name} не может действовать в этом раунде!")
         
         if fled or not enemy.is_alive():
             break
@@ -183,102 +190,107 @@ def battle(hero: Hero, enemy: Enemy,
         # Обработка эффектов врага - применяем воздействие
         enemy_effect_msgs = enemy.process_effects()
         if enemy_effect_msgs:
-            print(f"\n  📍 Эффекты {enemy.name}:")
+            io.print(f"\n  📍 Эффекты {enemy.name}:")
             for msg in enemy_effect_msgs:
                 if msg:
-                    print(msg)
+                    io.print(msg)
         
         if not enemy.is_alive():
             break
         
         # Ход врага
         if enemy.can_act():
-            print(f"\n  👹 Ход {enemy.name}:")
-            print(enemy.choose_action(hero))
+            io.print(f"\n  👹 Ход {enemy.name}:")
+            with span("choose_action"):
+                action = enemy.choose_action(hero)
+            io.print(action)
         else:
-            print(f"\n  ❄️ {enemy.name} не может действовать в этом раунде!")
+            io.print(f"\n  ❄️ {enemy.name} не может действовать в этом раунде!")
         
         # КОНЕЦ РАУНДА - уменьшаем duration эффектов
         hero_end_msgs = hero.end_round_effects()
         enemy_end_msgs = enemy.end_round_effects()
         
         if hero_end_msgs or enemy_end_msgs:
-            print(f"\n  ⏱️ Конец раунда:")
+            io.print(f"\n  ⏱️ Конец раунда:")
             for msg in hero_end_msgs:
                 if msg:
-                    print(msg)
+                    io.print(msg)
             for msg in enemy_end_msgs:
                 if msg:
-                    print(msg)
+                    io.print(msg)
         
         round_num += 1
         
         if round_num > 50:
-            print("\n  ⚠️ Бой затянулся...")
+            io.print("\n  ⚠️ Бой затянулся...")
             break
     
     # Результат
-    print("\n" + "═" * 55)
+    io.print("\n" + "═" * 55)
     
     if fled:
+        BATTLES.inc(boss, "fled")
         return False, "побег"
     
     if hero.is_alive() and not enemy.is_alive():
-        print(f"\n  🏆 ПОБЕДА!")
-        print(f"\n  {enemy.name} повержен!")
+        io.print(f"\n  🏆 ПОБЕДА!")
+        io.print(f"\n  {enemy.name} повержен!")
         
         if enemy.boss_id:
             hero.defeat_boss(enemy.boss_id)
         
         # Восстановление
-        print(hero.restore_after_combat())
+        io.print(hero.restore_after_combat())
         
+        BATTLES.inc(boss, "won")
         return True, "победа"
     
     else:
         verb = "пала" if hero.gender.value == "female" else "пал"
-        print(f"\n  💀 ПОРАЖЕНИЕ...")
-        print(f"\n  {hero.name} {verb} в бою...")
+        io.print(f"\n  💀 ПОРАЖЕНИЕ...")
+        io.print(f"\n  {hero.name} {verb} в бою...")
         
+        BATTLES.inc(boss, "lost")
         return False, "поражение"
 
 
-def boss_battle(hero: Hero, boss: Enemy, intro_text: str = "") -> Tuple[bool, str]:
+def boss_battle(io, hero: Hero, boss: Enemy, intro_text: str = "") -> Flow[Tuple[bool, str]]:
     """Битва с боссом - нельзя сбежать."""
     
     if intro_text:
-        print(f"\n{intro_text}")
+        io.print(f"\n{intro_text}")
     
-    print("\n" + "💀" * 25)
-    print(f"\n  ⚠️ БИТВА С БОССОМ!")
-    print(f"\n  👹 {boss.name} (HP: {boss.hp}/{boss.max_hp})")
-    print("\n" + "💀" * 25)
+    io.print("\n" + "💀" * 25)
+    io.print(f"\n  ⚠️ БИТВА С БОССОМ!")
+    io.print(f"\n  👹 {boss.name} (HP: {boss.hp}/{boss.max_hp})")
+    io.print("\n" + "💀" * 25)
     
-    return battle(hero, boss, can_flee=False)
+    return (yield from battle(io, hero, boss, can_flee=False))
 
 
-def use_item_outside_combat(hero: Hero) -> bool:
+def use_item_outside_combat(io, hero: Hero) -> Flow[bool]:
     """Использовать предмет вне боя."""
     usable = [item for item in hero.inventory if item.can_use(hero) and item.damage == 0]
     
     if not usable:
-        print("\n  ⚠️ Нет предметов для использования вне боя.")
+        io.print("\n  ⚠️ Нет предметов для использования вне боя.")
         return False
     
-    print(f"\n  🎒 ПРЕДМЕТЫ {hero.name} (вне боя):")
+    io.print(f"\n  🎒 ПРЕДМЕТЫ {hero.name} (вне боя):")
     for i, item in enumerate(usable, 1):
         effect = item.get_effect_description()
         effect_str = f" ({effect})" if effect else ""
-        print(f"    {i}. {item.name}{effect_str}")
-        print(f"       {item.description}")
-    print(f"    0. Отмена")
+        io.print(f"    {i}. {item.name}{effect_str}")
+        io.print(f"       {item.description}")
+    io.print(f"    0. Отмена")
     
-    choice = get_input("\n  Выберите предмет: ", range(0, len(usable) + 1))
+    choice = yield from get_input(io, "\n  Выберите предмет: ", range(0, len(usable) + 1))
     
     if choice == 0:
         return False
     
     item = usable[choice - 1]
-    print()
-    print(hero.use_item(item))
+    io.print()
+    io.print(hero.use_item(item))
     return True
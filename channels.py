@@ -0,0 +1,207 @@
+
+import os
+import sys
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Optional
+
+from renderer import Renderer, terminal_renderer
+
+
+# Вывод сбрасывается не реже, чем накопится столько символов
+MAX_BUFFERED = 64 * 1024
+
+
+class InputSource:
+    """Источник строк ввода.
+
+    readline() получает текст, выведенный с прошлого ввода (экран),
+    и возвращает строку без перевода строки. В конце ввода — EOFError.
+    """
+
+    echo = False
+
+    def readline(self, screen: str) -> str:
+        raise NotImplementedError
+
+
+class StreamSource(InputSource):
+    """Ввод из текстового потока (файла, сокета)."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readline(self, screen: str) -> str:
+        line = self.stream.readline()
+        if not line:
+            raise EOFError
+        return line.rstrip("\r\n")
+
+
+class TerminalSource(StreamSource):
+    """Ввод с терминала процесса (sys.stdin на момент чтения)."""
+
+    def __init__(self):
+        super().__init__(None)
+
+    def readline(self, screen: str) -> str:
+        self.stream = sys.stdin
+        return super().readline(screen)
+
+
+class SocketSource(StreamSource):
+    """Ввод из блокирующего сокета."""
+
+    def __init__(self, sock):
+        super().__init__(sock.makefile('r', encoding='utf-8', errors='replace', newline=''))
+
+
+class ScriptSource(InputSource):
+    """Ввод из заранее заданных строк. Ответы выводятся в поток, как эхо терминала."""
+
+    echo = True
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+
+    def readline(self, screen: str) -> str:
+        try:
+            return next(self._lines).rstrip("\r\n")
+        except StopIteration:
+            raise EOFError
+
+
+class BotSource(InputSource):
+    """Ввод от бота: функция получает экран и возвращает ответ."""
+
+    def __init__(self, choose: Callable[[str], str], echo: bool = False):
+        self._choose = choose
+        self.echo = echo
+
+    def readline(self, screen: str) -> str:
+        answer = self._choose(screen)
+        if answer is None:
+            raise EOFError
+        return answer
+
+
+class SocketWriter:
+    """Вывод в сокет: UTF-8, переводы строк как в telnet."""
+
+    def __init__(self, sock):
+        self._sock = sock
+
+    def write(self, text: str) -> None:
+        self._sock.sendall(text.replace("\n", "\r\n").encode('utf-8'))
+
+    def flush(self) -> None:
+        pass
+
+
+class NullWriter:
+    """Вывод в никуда (боты, нагрузочные прогоны)."""
+
+    def write(self, text: str) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+class IOChannel:
+    """Канал ввода-вывода сессии.
+
+    Вывод копится в буфере и уходит одной записью перед каждым
+    запросом ввода, а не строкой на каждый print().
+    """
+
+    def __init__(self, source: InputSource, out=None, renderer: Optional[Renderer] = None):
+        self.source = source
+        # None — sys.stdout на момент записи
+        self.out = out
+        # Экран с строкой состояния; status() возвращает её поля
+        self.renderer = renderer
+        self.status: Optional[Callable[[], Optional[List[str]]]] = None
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self.flushes = 0
+
+    def print(self, *args, sep: str = " ", end: str = "\n") -> None:
+        text = sep.join(str(arg) for arg in args) + end
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= MAX_BUFFERED:
+            self.flush()
+
+    def write(self, text: str) -> None:
+        self.print(text, end="")
+
+    def flush(self) -> str:
+        """Отправить накопленный вывод. Возвращает отправленный текст."""
+        if self.renderer is not None and self.status is not None:
+            # Строка состояния — по положению на момент отправки
+            update = self.renderer.update(self.status())
+            if update:
+                self._buffer.insert(0, update)
+        if not self._buffer:
+            return ""
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+        out = self.out or sys.stdout
+        out.write(text)
+        out.flush()
+        self.flushes += 1
+        return text
+
+    def input(self, prompt: str = "") -> str:
+        self.write(prompt)
+        screen = self.flush()
+        line = self.source.readline(screen)
+        if self.source.echo:
+            self.print(line)
+        return line
+
+    def clear(self) -> None:
+        if self.renderer is not None:
+            self.write(self.renderer.clear())
+        else:
+            self.write("\033[2J\033[H")
+
+    @contextmanager
+    def muted(self):
+        """Вывод в никуда — для повтора того, что игрок уже видел."""
+        out, renderer = self.out, self.renderer
+        self.out, self.renderer = NullWriter(), None
+        try:
+            yield
+        finally:
+            self.flush()
+            self.out, self.renderer = out, renderer
+
+    def close(self) -> None:
+        """Вернуть терминал в обычный режим и отправить остаток вывода."""
+        if self.renderer is not None:
+            self.write(self.renderer.reset())
+        self.flush()
+
+
+class HeadlessIO(IOChannel):
+    """Канал без терминала (сценарии, прогоны): очистка экрана пропускается."""
+
+    def clear(self) -> None:
+        pass
+
+
+class ConsoleIO(IOChannel):
+    """Ввод и вывод через терминал процесса."""
+
+    def __init__(self, source: Optional[InputSource] = None):
+        super().__init__(source or TerminalSource(), renderer=terminal_renderer())
+
+    def clear(self) -> None:
+        if self.renderer is not None:
+            super().clear()
+            return
+        # Не терминал или консоль без ANSI
+        self.flush()
+        os.system('cls' if os.name == 'nt' else 'clear')
@@ -0,0 +1,455 @@
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import heroes
+import locations
+from channels import HeadlessIO, ScriptSource, NullWriter
+from core import ARTIFACTS
+from flow import CHOICE, PAUSE
+from game_state import CLASS_NAMES, PATH_NAMES, FINGERPRINT_FIELDS, GameState
+from heroes import create_hero
+from regress import CLASS_PATHS
+from session import Session
+
+
+# Предел состояний на героя: дальше обход прерывается с предупреждением
+MAX_STATES = int(os.environ.get("TAJNA_EXPLORE_MAX", "100000"))
+
+# Приглашений за одно посещение локации — больше считается зацикливанием
+MAX_STEPS = 500
+
+# Сколько примеров тупиков печатать на героя
+EXAMPLES = 5
+
+WIN, LOSE, FLEE = "победа", "поражение", "побег"
+
+START_LOCATION = "opushka"
+
+
+class NeedDecision(Exception):
+    """Прогон дошёл до развилки, для которой ещё нет решения."""
+
+    def __init__(self, options: Sequence):
+        super().__init__(options)
+        self.options = list(options)
+
+
+class Chooser:
+    """Решения на развилках одного прогона: ответы, исходы боёв и событий."""
+
+    def __init__(self, decisions: Sequence):
+        self.decisions = list(decisions)
+        self.position = 0
+
+    def pick(self, options: Sequence):
+        if self.position >= len(self.decisions):
+            raise NeedDecision(options)
+        decision = self.decisions[self.position]
+        self.position += 1
+        return decision
+
+
+# Решения текущего прогона (в процессе идёт один прогон за раз)
+_chooser: Optional[Chooser] = None
+
+
+class Roll:
+    """Результат random(), который выбирается только при сравнении.
+
+    Сравнение с порогом внутри ещё возможного отрезка — развилка «< p»
+    или «≥ p», после неё отрезок сужается. Так проходится по одному
+    значению на каждый промежуток между порогами, которые сюжет
+    сравнивает с этим броском (0.33 и 0.66 у «Авось!» — три ветки).
+    """
+
+    __slots__ = ("low", "high")
+
+    def __init__(self):
+        self.low = 0.0
+        self.high = 1.0
+
+    def _below(self, threshold: float) -> bool:
+        if self.high <= threshold:
+            return True
+        if self.low >= threshold:
+            return False
+        below = f"<{threshold:g}"
+        if _chooser.pick([below, f"≥{threshold:g}"]) == below:
+            self.high = threshold
+            return True
+        self.low = threshold
+        return False
+
+    # Равенство порогу имеет нулевую вероятность: <= и > — те же развилки
+    def __lt__(self, threshold: float) -> bool:
+        return self._below(threshold)
+
+    __le__ = __lt__
+
+    def __ge__(self, threshold: float) -> bool:
+        return not self._below(threshold)
+
+    __gt__ = __ge__
+
+    def __float__(self) -> float:
+        return (self.low + self.high) / 2
+
+
+class OutcomeRandom:
+    """Замена модуля random в сюжете: каждый бросок — развилка по классам исходов.
+
+    random() возвращает Roll: ветвятся только сравнения, которые сюжет
+    действительно делает. randint() не ветвится и даёт середину отрезка —
+    это величины урона и лечения, а бои в обходе разыгрываются развилкой;
+    разные значения дали бы лишь разные HP, а не новые места сюжета.
+    """
+
+    def random(self) -> Roll:
+        return Roll()
+
+    def randint(self, a: int, b: int) -> int:
+        return (a + b) // 2
+
+    def choice(self, seq: Sequence):
+        return _chooser.pick(list(seq))
+
+
+def _battle(io, hero, enemy, can_flee: bool = True):
+    """Бой без раундов: исход выбирается развилкой."""
+    outcome = _chooser.pick([WIN, LOSE, FLEE] if can_flee else [WIN, LOSE])
+    if outcome == WIN:
+        enemy.hp = 0
+        if enemy.boss_id:
+            hero.defeat_boss(enemy.boss_id)
+        hero.restore_after_combat()
+        return True, outcome
+    return False, outcome
+    yield
+
+
+def _boss_battle(io, hero, boss, intro_text: str = ""):
+    return (yield from _battle(io, hero, boss, can_flee=False))
+
+
+def install() -> None:
+    """Подменить бои и случайность в сюжете (в процессах пула — навсегда)."""
+    locations.battle = _battle
+    locations.boss_battle = _boss_battle
+    locations.random = OutcomeRandom()
+    heroes.random = OutcomeRandom()
+
+
+# Не влияют на развилки: имя игрока и посещённые места (от них зависит
+# только текст описания — первое посещение или повторное)
+KEY_FIELDS = tuple(name for name in FINGERPRINT_FIELDS if name != "visited_locations")
+
+
+def state_key(state: GameState) -> int:
+    """Ключ состояния для отсева повторов: без оформления и порядка в
+    множествах. Хэши полей, не изменившихся в локации, не пересчитываются."""
+    return state.fingerprint(KEY_FIELDS)
+
+
+class SilentIO(HeadlessIO):
+    """Канал обхода: текст игры не нужен, даже не собирается."""
+
+    def __init__(self):
+        super().__init__(ScriptSource([]), out=NullWriter())
+
+    def print(self, *args, sep: str = " ", end: str = "\n") -> None:
+        pass
+
+
+def initial_state(class_id: str) -> GameState:
+    hero = create_hero(class_id)
+    session = Session(io=SilentIO())
+    session.manager.new_game(class_id)
+    session.manager.sync_from_hero(hero)
+    session.manager.current_state.current_location = START_LOCATION
+    return session.manager.current_state
+
+
+@dataclass
+class Exit:
+    """Чем закончилось посещение локации при данных решениях."""
+
+    kind: str                      # next, victory, defeat, error
+    decisions: List[Any]
+    next_location: str = ""
+    state: Optional[Dict[str, Any]] = None
+    message: str = ""
+    key: int = 0
+
+
+def _snapshot(state: GameState) -> Dict[str, Any]:
+    """Состояние словарём без глубокого копирования: sync_from_hero
+    каждый раз собирает списки и словари заново, делить их не с кем."""
+    return {f.name: getattr(state, f.name) for f in fields(GameState)}
+
+
+def _run(session: Session, class_id: str, location_id: str, start: GameState,
+         decisions: List) -> Exit:
+    """Пройти локацию с заданными решениями. NeedDecision — решений не хватило."""
+    global _chooser
+    _chooser = Chooser(decisions)
+    manager = session.manager
+    # sync_to_hero копирует списки, общее со start не меняется; хэши
+    # полей копируются вместе с ним
+    manager.current_state = start.copy(deep=False)
+    hero = create_hero(class_id)
+    manager.sync_to_hero(hero)
+
+    flow = locations.get_location(location_id).enter(session)
+    answer = None
+    try:
+        for _ in range(MAX_STEPS):
+            prompt = flow.send(answer)
+            if prompt.kind == PAUSE:
+                answer = ""
+            elif prompt.kind == CHOICE and prompt.valid_range is not None:
+                answer = str(_chooser.pick(list(prompt.valid_range)))
+            else:
+                return Exit("error", decisions, message=f"неожиданное приглашение {prompt.text.strip()!r}")
+        return Exit("error", decisions, message=f"больше {MAX_STEPS} приглашений в локации")
+    except StopIteration as stop:
+        result = stop.value
+    except NeedDecision:
+        raise
+    except Exception as e:
+        return Exit("error", decisions, message=f"{type(e).__name__}: {e}")
+    finally:
+        flow.close()
+
+    manager.sync_from_hero(hero)
+    state = manager.current_state
+    if result.game_over:
+        return Exit("victory" if result.victory else "defeat", decisions,
+                    result.path_taken, _snapshot(state), key=state_key(state))
+    state.current_location = result.next_location or START_LOCATION
+    return Exit("next", decisions, state.current_location, _snapshot(state), key=state_key(state))
+
+
+def visit(task: Tuple[str, str, Dict[str, Any]]) -> List[Exit]:
+    """Все различные исходы посещения локации из данного состояния.
+
+    Прогон повторяется с начала локации для каждого набора решений:
+    поток игры нельзя скопировать на развилке. Первым находится исход
+    с наименьшим числом решений.
+    """
+    class_id, location_id, state = task
+    start = GameState.from_dict(state)
+    state_key(start)
+    session = Session(io=SilentIO())
+    exits: List[Exit] = []
+    seen: Set[Tuple[str, str, Any]] = set()
+    pending = deque([[]])
+    while pending:
+        decisions = pending.popleft()
+        try:
+            found = _run(session, class_id, location_id, start, decisions)
+        except NeedDecision as need:
+            pending.extend(decisions + [option] for option in need.options)
+            continue
+        key = (found.kind, found.next_location, found.key if found.state is not None else found.message)
+        if key not in seen:
+            seen.add(key)
+            exits.append(found)
+    return exits
+
+
+@dataclass
+class HeroGraph:
+    """Граф состояний одного героя: вершина — вход в локацию в данном состоянии."""
+
+    class_id: str
+    keys: Dict[int, int] = field(default_factory=dict)
+    # Вершина → (локация, состояние)
+    nodes: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)
+    # Вершина → (вершина-родитель, решения) — кратчайший путь от начала
+    parents: List[Optional[Tuple[int, List[Any]]]] = field(default_factory=list)
+    successors: List[Set[int]] = field(default_factory=list)
+    # Концовка (путь) → (вершина, решения) первого найденного прохождения
+    endings: Dict[str, Tuple[int, List[Any]]] = field(default_factory=dict)
+    defeats: Dict[str, int] = field(default_factory=dict)
+    errors: List[Tuple[int, List[Any], str]] = field(default_factory=list)
+    # Вершины, из которых одно посещение локации ведёт к победе
+    winning: Set[int] = field(default_factory=set)
+    artifacts: Set[str] = field(default_factory=set)
+    truncated: bool = False
+
+    def add(self, location_id: str, state: Dict[str, Any], key: int,
+            parent: Optional[Tuple[int, List[Any]]]) -> Optional[int]:
+        """Новая вершина или None, если такое состояние уже было."""
+        if key in self.keys:
+            if parent is not None:
+                self.successors[parent[0]].add(self.keys[key])
+            return None
+        if len(self.nodes) >= MAX_STATES:
+            self.truncated = True
+            return None
+        index = self.keys[key] = len(self.nodes)
+        self.nodes.append((location_id, state))
+        self.parents.append(parent)
+        self.successors.append(set())
+        if parent is not None:
+            self.successors[parent[0]].add(index)
+        self.artifacts.update(state.get("artifacts", ()))
+        return index
+
+    def route(self, index: int, last: Optional[List[Any]] = None) -> str:
+        """Путь до вершины: локации и решения в них."""
+        steps = []
+        decisions = last
+        while index is not None:
+            location_id = self.nodes[index][0]
+            if decisions is None:
+                steps.append(location_id)
+            else:
+                steps.append(f"{location_id}[{','.join(str(d) for d in decisions)}]")
+            parent = self.parents[index]
+            if parent is None:
+                break
+            index, decisions = parent
+        return " → ".join(reversed(steps))
+
+    def dead_ends(self) -> List[int]:
+        """Вершины, из которых не дойти ни до одной победы (поражения не в счёт)."""
+        predecessors: List[List[int]] = [[] for _ in self.nodes]
+        for node, children in enumerate(self.successors):
+            for child in children:
+                predecessors[child].append(node)
+        # Все вершины, откуда есть победа: обход назад от победных
+        good = set(self.winning)
+        stack = list(good)
+        while stack:
+            node = stack.pop()
+            for parent in predecessors[node]:
+                if parent not in good:
+                    good.add(parent)
+                    stack.append(parent)
+        return [node for node in range(len(self.nodes)) if node not in good]
+
+
+def explore(classes: Sequence[str], jobs: int = 1) -> Dict[str, HeroGraph]:
+    """Обойти граф сюжета для героев: в ширину, уровень за уровнем.
+
+    Посещения локаций одного уровня раздаются процессам пула; отсев
+    повторов и граф — в этом процессе.
+    """
+    graphs = {class_id: HeroGraph(class_id) for class_id in classes}
+    frontier: List[Tuple[str, int]] = []
+    for class_id, graph in graphs.items():
+        start = initial_state(class_id)
+        frontier.append((class_id, graph.add(START_LOCATION, start.to_dict(), state_key(start), None)))
+
+    pool = None
+    if jobs > 1:
+        # spawn: процессы пула сами подменяют бои и случайность
+        pool = ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=install)
+    else:
+        install()
+    try:
+        while frontier:
+            tasks = [(class_id,) + graphs[class_id].nodes[index] for class_id, index in frontier]
+            if pool is None:
+                results = map(visit, tasks)
+            else:
+                results = pool.map(visit, tasks, chunksize=max(1, len(tasks) // (jobs * 4)))
+            next_frontier: List[Tuple[str, int]] = []
+            for (class_id, index), exits in zip(frontier, results):
+                graph = graphs[class_id]
+                for found in exits:
+                    if found.kind == "next":
+                        child = graph.add(found.next_location, found.state, found.key, (index, found.decisions))
+                        if child is not None:
+                            next_frontier.append((class_id, child))
+                    elif found.kind == "victory":
+                        graph.artifacts.update(found.state.get("artifacts", ()))
+                        graph.winning.add(index)
+                        graph.endings.setdefault(found.next_location, (index, found.decisions))
+                    elif found.kind == "defeat":
+                        location_id = graph.nodes[index][0]
+                        graph.defeats[location_id] = graph.defeats.get(location_id, 0) + 1
+                    else:
+                        graph.errors.append((index, found.decisions, found.message))
+            frontier = next_frontier
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return graphs
+
+
+def report(graphs: Dict[str, HeroGraph], elapsed: float, examples: int = EXAMPLES, out=None) -> bool:
+    """Напечатать итоги обхода. Возвращает True, если тупиков и ошибок нет."""
+    out = out or sys.stdout
+    clean = True
+    for class_id, graph in graphs.items():
+        out.write(f"\n{'═' * 60}\n  {CLASS_NAMES[class_id]}: состояний {len(graph.nodes)}")
+        out.write(" (обход прерван по пределу)\n" if graph.truncated else "\n")
+
+        out.write("\n  🏁 Концовки:\n")
+        for path, path_name in PATH_NAMES.items():
+            if path in graph.endings:
+                node, decisions = graph.endings[path]
+                out.write(f"    ✅ {path_name}: {graph.route(node, decisions)}\n")
+        missing = [PATH_NAMES[p] for p in CLASS_PATHS[class_id] if p not in graph.endings]
+        if missing:
+            out.write(f"    —  недостижимы: {', '.join(missing)}\n")
+
+        keys = sorted(a for a in graph.artifacts if a.endswith("_kluch"))
+        others = sorted(a for a in graph.artifacts if not a.endswith("_kluch"))
+        out.write(f"\n  🔑 Ключи: {', '.join(ARTIFACTS[a].name for a in keys) or 'нет'}\n")
+        out.write(f"  🏺 Артефакты: {', '.join(ARTIFACTS[a].name for a in others) or 'нет'}\n")
+        if graph.defeats:
+            places = ", ".join(f"{loc} ({count})" for loc, count in sorted(graph.defeats.items()))
+            out.write(f"  💀 Поражения возможны: {places}\n")
+
+        # Без полного графа недостижимость победы не доказать
+        dead = [] if graph.truncated else graph.dead_ends()
+        if graph.truncated:
+            clean = False
+        if dead:
+            clean = False
+            out.write(f"\n  ⚠️ Тупики — состояний, откуда не дойти до победы: {len(dead)}\n")
+            # Сначала — где игрок попадает в тупик из ещё проходимого состояния
+            dead_set = set(dead)
+            entries = [n for n in dead if graph.parents[n] and graph.parents[n][0] not in dead_set]
+            for node in (entries or dead)[:examples]:
+                out.write(f"    {graph.route(node)}\n")
+        for node, decisions, message in graph.errors[:examples]:
+            out.write(f"\n  ❌ {message}\n    {graph.route(node, decisions)}\n")
+        if graph.errors:
+            clean = False
+            out.write(f"  Ошибок всего: {len(graph.errors)}\n")
+
+    out.write(f"\n  Обход за {elapsed:.1f} с\n")
+    return clean
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Полный обход сюжета: концовки, ключи, тупики")
+    parser.add_argument("--hero", action="append", choices=list(CLASS_NAMES),
+                        help="герой (можно несколько раз; по умолчанию все)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="процессов")
+    parser.add_argument("--examples", type=int, default=EXAMPLES, help="примеров тупиков на героя")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    graphs = explore(args.hero or list(CLASS_NAMES), args.jobs)
+    clean = report(graphs, time.perf_counter() - started, args.examples)
+    return 0 if clean else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+
+import json
+import hashlib
+from typing import Any, Iterable, Mapping
+
+
+# Поля-множества: порядок в них — лишь порядок событий, на игру он не влияет
+UNORDERED_FIELDS = frozenset(("visited_locations", "defeated_bosses", "artifacts", "inventory"))
+
+# Оформление: имя игрока (в GameState) и героя (в Hero.to_dict)
+COSMETIC_FIELDS = frozenset(("player_name", "name"))
+
+MASK = (1 << 64) - 1
+
+
+def _digest(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+# Простые значения кодируются repr: он устойчив и в разы быстрее json.dumps
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def _encode(value: Any) -> bytes:
+    if type(value) in _SCALARS:
+        return repr(value).encode('utf-8')
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+
+def field_hash(name: str, value: Any) -> int:
+    """Хэш одного поля состояния вместе с его именем.
+
+    Множество хэшируется суммой хэшей элементов: от порядка она не
+    зависит, повторы (два одинаковых зелья) учитываются.
+    """
+    if name in UNORDERED_FIELDS:
+        total = sum(_digest(_encode(item)) for item in value) & MASK
+        return _digest(name.encode('utf-8') + b"\0" + total.to_bytes(8, 'little'))
+    return _digest(name.encode('utf-8') + b"\0" + _encode(value))
+
+
+def combine(hashes: Iterable[int]) -> int:
+    """Отпечаток из хэшей полей. Сумма: поле можно заменить, не пересчитывая остальные."""
+    return sum(hashes) & MASK
+
+
+def mapping_fingerprint(data: Mapping[str, Any], skip: Iterable[str] = COSMETIC_FIELDS) -> int:
+    """Отпечаток словаря состояния целиком, без кэша."""
+    skip = set(skip)
+    return combine(field_hash(name, value) for name, value in data.items() if name not in skip)
+
@@ -0,0 +1,80 @@
+
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Generator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+# Виды приглашений
+CHOICE = "choice"        # выбор в сюжете; 0 — меню
+BATTLE = "battle"        # действие в бою
+MENU = "menu"            # пункт меню
+PAUSE = "pause"          # [Enter — ...]
+TEXT = "text"            # произвольный ответ (y/n, код)
+NAME = "name"            # имя аккаунта
+PASSWORD = "password"    # пароль
+WAIT = "wait"            # не ввод: ожидание future, ответ — её результат
+
+
+@dataclass(frozen=True)
+class Prompt:
+    """Запрос ввода, который поток игры отдаёт наружу через yield."""
+    text: str
+    kind: str = TEXT
+    valid_range: Optional[range] = None
+    # Для WAIT: чего ждёт поток
+    future: Optional[Future] = field(default=None, compare=False)
+
+
+# Поток игры: отдаёт Prompt, получает строку ответа, возвращает T
+Flow = Generator[Prompt, str, T]
+
+
+def wait(future: Future) -> "Flow[Any]":
+    """Дождаться future вне потока игры. Сервер ждёт её в цикле
+    событий, не занимая поток шага; исключение future бросается в поток."""
+    return (yield Prompt("", WAIT, future=future))
+
+
+def run_flow(io, flow: "Flow[T]", skip: Tuple[str, ...] = ()) -> T:
+    """Провести поток игры синхронно, читая ответы из канала io.
+
+    EOFError и KeyboardInterrupt передаются внутрь потока в точку
+    ожидания ввода — как если бы их бросил input(). Приглашения видов
+    из skip не показываются и получают пустой ответ. WAIT ждёт future
+    прямо здесь.
+    """
+    try:
+        prompt = next(flow)
+        while True:
+            if prompt.kind == WAIT:
+                try:
+                    result = prompt.future.result()
+                except Exception as e:
+                    prompt = flow.throw(e)
+                    continue
+                prompt = flow.send(result)
+                continue
+            if prompt.kind in skip:
+                prompt = flow.send("")
+                continue
+            try:
+                answer = io.input(prompt.text)
+            except (EOFError, KeyboardInterrupt) as e:
+                prompt = flow.throw(e)
+                continue
+            prompt = flow.send(answer)
+    except StopIteration as stop:
+        return stop.value
+
+
+def advance(flow: "Flow", answer: Optional[str] = None,
+            error: Optional[BaseException] = None) -> Optional[Prompt]:
+    """Продвинуть поток до следующего приглашения. None — поток закончился."""
+    try:
+        if error is not None:
+            return flow.throw(error)
+        return flow.send(answer)
+    except StopIteration:
+        return None
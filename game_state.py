@@ -1,46 +1,159 @@
 
 
 import os
-import json
-import hashlib
 import copy
-from typing import Optional, Dict, Any, List
+import threading
+from typing import Optional, Dict, Any, Iterable, List, Callable, Tuple
 from dataclasses import dataclass, field, asdict, fields
 
+import save_format
+import storage
+from save_format import LazySection, SaveFormatError
+from account_index import AccountIndex, LAZY_SECTIONS
+from history import SaveHistory, MAX_SLOTS
+from autosave import save_writer, BACKGROUND_SAVES
+from leaderboard import leaderboard
+from passwords import password_hasher
+from resume import resume_cache
+from journal import Journal
+from flow import Flow, Prompt, MENU, PAUSE, wait
+from metrics import SAVE_SECONDS, SYNC_SECONDS
+from tracing import traced
+from fingerprint import COSMETIC_FIELDS, MASK, field_hash
 
-SAVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_games")
 
+def _load_section(section: Optional[LazySection]) -> Any:
+    """Декодировать отложенную секцию; повреждённая считается пустой."""
+    if section is None:
+        return None
+    try:
+        return section.load()
+    except SaveFormatError:
+        return None
 
-# Глобальная переменная для хранения последнего приглашения
-_last_prompt_info = {
-    "text": "",
-    "options": [],
-    "valid_range": None,
-    "prompt": ""
+
+CLASS_NAMES = {
+    "иван": "🤪 Иван-дурак",
+    "василиса": "✨ Василиса Премудрая",
+    "слуга": "🗡️ Кощеев слуга"
+}
+
+PATH_NAMES = {
+    "вода": "💧 Путь воды",
+    "дым": "🏚️ Путь дыма",
+    "тьма": "🌲 Путь тьмы",
+    "тайный": "🕳️ Тайный путь"
 }
 
 
-def set_last_prompt(text: str, options: Optional[List[str]] = None, 
-                   valid_range: Optional[range] = None, prompt: str = "") -> None:
-    """Сохранить последнее приглашение для повтора после меню."""
-    _last_prompt_info["text"] = text
-    _last_prompt_info["options"] = options or []
-    _last_prompt_info["valid_range"] = valid_range
-    _last_prompt_info["prompt"] = prompt
+def empty_stats() -> Dict[str, Any]:
+    return {
+        "victories": {"иван": [], "василиса": [], "слуга": []},
+        "defeats": 0,
+        "total_games": 0
+    }
+
+
+def merge_stats(base: Dict[str, Any], ours: Dict[str, Any],
+                theirs: Dict[str, Any]) -> Dict[str, Any]:
+    """Наложить изменения ours (относительно base) поверх theirs."""
+    merged = copy.deepcopy(theirs)
+    for key in ("defeats", "total_games"):
+        merged[key] = merged.get(key, 0) + ours.get(key, 0) - base.get(key, 0)
+    
+    victories = merged.setdefault("victories", {})
+    for class_id, paths in ours.get("victories", {}).items():
+        target = victories.setdefault(class_id, [])
+        for path in paths:
+            if path not in target:
+                target.append(path)
+    return merged
+
+
+def merge_sections(base: Dict[str, Optional[bytes]], ours: Dict[str, Any],
+                   theirs: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Слить секции LAZY_SECTIONS двух записей по отпечаткам в base.
+
+    Секция, которую ours не менял, берётся из theirs. Возвращает секции
+    для записи и имена конфликтующих — изменённых обеими сторонами
+    по-разному; для них остаётся версия theirs.
+    """
+    merged: Dict[str, Any] = {}
+    conflicts: List[str] = []
+    for name in LAZY_SECTIONS:
+        mine = save_format.section_digest(ours.get(name))
+        if mine == base.get(name):
+            merged[name] = theirs.get(name)
+            continue
+        other = save_format.section_digest(theirs.get(name))
+        if other == base.get(name) or other == mine:
+            merged[name] = ours.get(name)
+        else:
+            merged[name] = theirs.get(name)
+            conflicts.append(name)
+    return merged, conflicts
+
+
+# Версия схемы GameState. При изменении полей — увеличить и добавить миграцию.
+SCHEMA_VERSION = 1
+
+# Сколько раз вход перепроверяет пароль, если хэш в файле сменился во время проверки
+LOGIN_RECHECKS = 3
 
 
-def show_last_prompt() -> None:
-    """Показать последнее приглашение."""
-    if _last_prompt_info["text"]:
-        print(_last_prompt_info["text"])
-    for opt in _last_prompt_info["options"]:
-        print(opt)
+def _migrate_v0(data: Dict[str, Any]) -> Dict[str, Any]:
+    """v0 → v1: недостающие характеристики берутся у класса героя, а не общие."""
+    from heroes import create_hero
+    
+    data = dict(data)
+    try:
+        hero = create_hero(data.get("class_id", ""))
+    except ValueError:
+        hero = None
+    
+    if hero is not None:
+        defaults = {
+            "hp": hero.hp, "max_hp": hero.max_hp,
+            "strength": hero.strength, "base_strength": hero.base_strength,
+            "agility": hero.agility, "intellect": hero.intellect,
+            "mp": getattr(hero, 'mp', 0), "max_mp": getattr(hero, 'max_mp', 0),
+        }
+        for key, value in defaults.items():
+            data.setdefault(key, value)
+    
+    spells = list(data.get("spells_used", []))
+    data["spells_used"] = spells + [False] * (3 - len(spells))
+    
+    item_defaults = {"desc": "", "type": "misc", "hp": 0, "mp": 0, "damage": 0,
+                     "usable": True, "consumable": True}
+    data["inventory"] = [{**item_defaults, **item} for item in data.get("inventory", [])]
+    return data
+
+
+# Миграции: версия → функция, переводящая словарь состояния в следующую версию
+MIGRATIONS: Dict[int, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    0: _migrate_v0,
+}
+
+
+def migrate_state(data: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    """Довести словарь состояния до SCHEMA_VERSION. Возвращает (данные, изменён ли)."""
+    version = data.get("schema_version", 0)
+    if version >= SCHEMA_VERSION:
+        return data, False
+    
+    while version < SCHEMA_VERSION:
+        data = MIGRATIONS[version](data)
+        version += 1
+        data["schema_version"] = version
+    return data, True
 
 
 @dataclass
 class GameState:
     """Состояние игры."""
     
+    schema_version: int = SCHEMA_VERSION
     class_id: str = ""
     player_name: str = ""
     hp: int = 100
@@ -64,136 +177,438 @@ class GameState:
     game_flags: Dict[str, Any] = field(default_factory=dict)
     path_taken: str = ""
     
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Хэш поля сбрасывается, только если значение действительно другое:
+        # sync_from_hero присваивает все поля заново при каждом вызове
+        hashes = self.__dict__.get('_hashes')
+        if hashes and name in hashes and self.__dict__[name] != value:
+            del hashes[name]
+        object.__setattr__(self, name, value)
+    
+    def fingerprint(self, names: Optional[Iterable[str]] = None) -> int:
+        """Отпечаток состояния (см. fingerprint.py): без имени игрока,
+        порядок в множествах не важен. Пересчитываются только поля,
+        изменившиеся с прошлого вызова. Списки и словари полей нельзя
+        менять на месте — только присваивать заново."""
+        hashes = self.__dict__.setdefault('_hashes', {})
+        total = 0
+        for name in names or FINGERPRINT_FIELDS:
+            value = hashes.get(name)
+            if value is None:
+                value = hashes[name] = field_hash(name, getattr(self, name))
+            total += value
+        return total & MASK
+    
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'GameState':
+        """Без миграции: для старых сохранений сначала migrate_state()."""
         valid_fields = {f.name for f in fields(cls)}
         return cls(**{k: v for k, v in data.items() if k in valid_fields})
     
-    def copy(self) -> 'GameState':
-        return GameState.from_dict(copy.deepcopy(self.to_dict()))
+    def copy(self, deep: bool = True) -> 'GameState':
+        """Копия состояния. deep=False делит списки и словари с исходным —
+        годится, пока их не меняют на месте."""
+        if deep:
+            state = GameState.from_dict(copy.deepcopy(self.to_dict()))
+        else:
+            state = GameState.from_dict({f.name: getattr(self, f.name) for f in fields(self)})
+        hashes = self.__dict__.get('_hashes')
+        if hashes is not None:
+            # Значения те же — хэши полей остаются верными
+            state.__dict__['_hashes'] = dict(hashes)
+        return state
+
+
+# Поля отпечатка по умолчанию
+FINGERPRINT_FIELDS = tuple(f.name for f in fields(GameState) if f.name not in COSMETIC_FIELDS)
+
+# Поля, изменение которых позволяет сохранить игру заново
+SAVE_FIELDS = ('class_id', 'hp', 'max_hp', 'strength', 'mp', 'max_mp',
+               'ability_uses', 'current_location', 'visited_locations',
+               'defeated_bosses', 'inventory', 'artifacts',
+               'npc_relations', 'game_flags', 'path_taken')
 
 
 class GameManager:
     """Менеджер игры."""
     
-    def __init__(self):
+    def __init__(self, io=None):
         self.account_name: str = ""
         self.password_hash: str = ""
+        # Хэш пароля в последней прочитанной/записанной версии файла
+        self._password_base: str = ""
         self.current_state: Optional[GameState] = None
-        self.saved_state: Optional[GameState] = None
+        self._saved_state: Optional[GameState] = None
+        # Сохранённая игра, ещё не декодированная после входа
+        self._saved_pending: Optional[LazySection] = None
+        # Слоты и история снимков, тоже декодируются по требованию
+        self._slots: Optional[Dict[str, Any]] = None
+        self._slots_pending: Optional[LazySection] = None
+        self._history: Optional[SaveHistory] = None
+        self._history_pending: Optional[LazySection] = None
         self.hero = None
         
-        self.stats: Dict[str, Any] = {
-            "victories": {"иван": [], "василиса": [], "слуга": []},
-            "defeats": 0,
-            "total_games": 0
-        }
-        
-        os.makedirs(SAVE_DIR, exist_ok=True)
+        self.stats: Dict[str, Any] = empty_stats()
+        # Версия файла аккаунта и статистика на момент чтения/записи этой версии
+        self._version: int = 0
+        self._stats_base: Dict[str, Any] = empty_stats()
+        # Отпечатки секций в последней прочитанной/записанной версии файла
+        self._section_base: Dict[str, Optional[bytes]] = dict.fromkeys(LAZY_SECTIONS)
+        # Секции, которые при последней записи изменила и другая сессия
+        self.save_conflicts: List[str] = []
+        # Ввод-вывод сессии, которой принадлежит менеджер (у служебных
+        # инструментов его нет)
+        self.io = io
+        # Защищает stats и версию от фонового потока записи
+        self._lock = threading.RLock()
+        # Код возврата, под которым сессия лежит в resume_cache
+        self.resume_token: str = ""
+        # Контрольная точка потока игры — по ней сессия поднимается из снимка
+        self.journal = Journal()
     
-    @staticmethod
-    def hash_password(password: str) -> str:
-        return hashlib.sha256(password.encode('utf-8')).hexdigest()
+    @property
+    def saved_state(self) -> Optional[GameState]:
+        """Сохранённая игра. Декодируется при первом обращении."""
+        if self._saved_pending is not None:
+            data = _load_section(self._saved_pending)
+            self._saved_pending = None
+            self._saved_state = None
+            if data:
+                data, migrated = migrate_state(data)
+                self._saved_state = GameState.from_dict(data)
+                if migrated:
+                    self._request_save()
+        return self._saved_state
+    
+    @saved_state.setter
+    def saved_state(self, state: Optional[GameState]) -> None:
+        self._saved_pending = None
+        self._saved_state = state
+    
+    @property
+    def slots(self) -> Dict[str, Any]:
+        """Именованные слоты: номер → {"label": ..., "state": ...}."""
+        if self._slots is None:
+            self._slots = _load_section(self._slots_pending) or {}
+            self._slots_pending = None
+            migrated = False
+            for slot in self._slots.values():
+                slot["state"], changed = migrate_state(slot["state"])
+                migrated = migrated or changed
+            if migrated:
+                self._request_save()
+        return self._slots
+    
+    @property
+    def history(self) -> SaveHistory:
+        """Автоматическая история снимков."""
+        if self._history is None:
+            self._history = SaveHistory.from_dict(_load_section(self._history_pending))
+            self._history_pending = None
+            if self._history.map_states(migrate_state):
+                self._request_save()
+        return self._history
+    
+    def _set_section(self, name: str, section: Optional[LazySection]) -> None:
+        """Заменить секцию записи ещё не декодированной."""
+        if name == "saved_game":
+            self.saved_state = None
+            self._saved_pending = section
+        elif name == "slots":
+            self._slots = None
+            self._slots_pending = section
+        else:
+            self._history = None
+            self._history_pending = section
+    
+    def _section(self, name: str) -> Any:
+        """Секция для записи; нетронутая остаётся LazySection."""
+        with self._lock:
+            if name == "saved_game":
+                if self._saved_pending is not None:
+                    # Не трогали сохранение — переписываем секцию как есть
+                    return self._saved_pending
+                return self._saved_state.to_dict() if self._saved_state else None
+            if name == "slots":
+                if self._slots is None:
+                    return self._slots_pending
+                return copy.deepcopy(self._slots) or None
+            if self._history is None:
+                return self._history_pending
+            return copy.deepcopy(self._history.to_dict())
+    
+    def _reset_sections(self, record: Optional[Dict[str, Any]] = None) -> None:
+        """Сбросить сохранение, слоты и историю (или взять их из записи аккаунта)."""
+        for name in LAZY_SECTIONS:
+            section = record.get(name) if record else None
+            self._set_section(name, section)
+            self._section_base[name] = save_format.section_digest(section)
     
     def get_save_path(self) -> str:
-        safe_name = "".join(c for c in self.account_name if c.isalnum() or c in ('_', '-'))
-        return os.path.join(SAVE_DIR, f"{safe_name}.json")
+        return storage.account_path(self.account_name)
     
     @staticmethod
     def account_exists(name: str) -> bool:
-        safe_name = "".join(c for c in name if c.isalnum() or c in ('_', '-'))
-        return os.path.exists(os.path.join(SAVE_DIR, f"{safe_name}.json"))
+        return account_index.lookup(name) is not None
     
-    def create_account(self, name: str, password: str) -> bool:
+    def create_account(self, name: str, password: str) -> Flow[bool]:
+        # Индекс мог устареть — перед созданием сверяемся с диском
+        if account_index.lookup(name, fresh=True) is not None:
+            return False
+        
+        password_hash = yield from wait(password_hasher.hash_async(password))
         self.account_name = name
-        self.password_hash = self.hash_password(password)
-        self.stats = {
-            "victories": {"иван": [], "василиса": [], "слуга": []},
-            "defeats": 0,
-            "total_games": 0
-        }
+        self.password_hash = self._password_base = password_hash
+        self.stats = empty_stats()
+        self._version = 0
+        self._stats_base = empty_stats()
         self.current_state = None
-        self.saved_state = None
-        return self._save_account()
+        self._reset_sections()
+        if not self._save_account(create=True):
+            return False
+        storage.add_to_index(name)
+        return True
     
-    def login(self, name: str, password: str) -> bool:
-        safe_name = "".join(c for c in name if c.isalnum() or c in ('_', '-'))
-        path = os.path.join(SAVE_DIR, f"{safe_name}.json")
+    @traced("login")
+    def login(self, name: str, password: str) -> Flow[bool]:
+        entry = account_index.lookup(name)
+        if entry is None or not entry.password_hash:
+            return False
         
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if data.get("password_hash") != self.hash_password(password):
+        stored = entry.password_hash
+        for _ in range(LOGIN_RECHECKS):
+            ok, rehash = yield from wait(password_hasher.verify_async(password, stored))
+            if not ok:
                 return False
             
-            self.account_name = name
-            self.password_hash = data["password_hash"]
-            self.stats = data.get("stats", {
-                "victories": {"иван": [], "василиса": [], "слуга": []},
-                "defeats": 0,
-                "total_games": 0
-            })
-            
-            saved_game = data.get("saved_game")
-            if saved_game:
-                self.saved_state = GameState.from_dict(saved_game)
-                self.current_state = self.saved_state.copy()
-            else:
-                self.saved_state = None
-                self.current_state = None
-            
-            return True
-        except (IOError, KeyError, json.JSONDecodeError):
+            # Сохранение, слоты и история читаются из файла только при входе
+            record = account_index.read_record(name)
+            if record is None or not record.get("password_hash"):
+                return False
+            if record["password_hash"] == stored:
+                break
+            # Хэш сменился, пока шла проверка (например, другой вход заменил
+            # старый хэш) — проверяем пароль по записанному
+            stored = record["password_hash"]
+        else:
             return False
+        self._apply_record(name, record)
+        if rehash:
+            # Старый хэш (SHA-256 или прежние параметры) заменяем при входе
+            self.password_hash = yield from wait(password_hasher.hash_async(password))
+            self._request_save()
+        return True
     
-    def _save_account(self) -> bool:
-        data = {
-            "password_hash": self.password_hash,
-            "stats": self.stats,
-            "saved_game": self.saved_state.to_dict() if self.saved_state else None
-        }
+    def issue_resume_token(self) -> str:
+        """Код для быстрого возврата в эту сессию без ввода пароля."""
+        self.resume_token = resume_cache.issue(self.account_name, self)
+        return self.resume_token
+    
+    def touch(self) -> None:
+        """Игрок активен: сессию не нужно выгружать на диск."""
+        if self.resume_token:
+            resume_cache.touch(self.resume_token)
+    
+    def snapshot(self) -> bytes:
+        """Компактный снимок сессии для выгрузки из памяти."""
+        self.flush_saves()
+        with self._lock:
+            if self.hero is not None:
+                self.sync_from_hero(self.hero)
+            record = dict(self.to_record(),
+                          account_name=self.account_name,
+                          stats_base=copy.deepcopy(self._stats_base),
+                          current_state=self.current_state.to_dict() if self.current_state else None,
+                          in_game=self.hero is not None,
+                          resume_token=self.resume_token,
+                          section_base={name: digest.hex() if digest else None
+                                        for name, digest in self._section_base.items()},
+                          journal=self.journal.to_dict())
+        return save_format.encode_record(record, "binary")
+    
+    @classmethod
+    def from_snapshot(cls, data: bytes) -> 'GameManager':
+        """Поднять сессию из снимка. Герой посреди игры создаётся заново
+        из current_state — как при загрузке сохранения."""
+        from heroes import create_hero
+        
+        try:
+            record = save_format.decode_record(data, lazy=LAZY_SECTIONS)
+        except SaveFormatError as e:
+            raise ValueError(str(e))
+        manager = cls()
+        manager._apply_record(record["account_name"], record)
+        manager._stats_base = record.get("stats_base") or empty_stats()
+        if record.get("current_state"):
+            manager.current_state = GameState.from_dict(record["current_state"])
+            if record.get("in_game"):
+                manager.sync_to_hero(create_hero(manager.current_state.class_id))
+        manager.resume_token = record.get("resume_token", "")
+        # Версия на диске могла отстать от секций в памяти — слияние при
+        # записи должно идти от той же базы, что и до выгрузки
+        for name, digest in (record.get("section_base") or {}).items():
+            if name in manager._section_base:
+                manager._section_base[name] = bytes.fromhex(digest) if digest else None
+        manager.journal = Journal.from_dict(record.get("journal"))
+        return manager
+    
+    def load_account(self, name: str, cache: bool = True) -> bool:
+        """Загрузить аккаунт без проверки пароля (для служебных инструментов)."""
+        record = account_index.read_record(name, remember=cache)
+        if record is None:
+            return False
+        self._apply_record(name, record)
+        return True
+    
+    def restore_record(self, name: str, record: Dict[str, Any], overwrite: bool = False) -> bool:
+        """Записать аккаунт из резервной копии тем же путём, что и обычное сохранение.
+        
+        Отложенные секции записи (LAZY_SECTIONS) должны быть LazySection.
+        """
+        existing = account_index.read(name)
+        if existing is not None and not overwrite:
+            return False
+        
+        self._apply_record(name, record)
+        if existing is not None:
+            # Замена целиком: без слияния статистики с версией на диске
+            self._version = existing.version
+        if not self._save_account(create=existing is None):
+            return False
+        if existing is None:
+            storage.add_to_index(name)
+        return True
+    
+    def _apply_record(self, name: str, record: Dict[str, Any]) -> None:
+        """Взять аккаунт из записи; её LazySection переходят менеджеру."""
+        self.account_name = name
+        self.password_hash = self._password_base = record.get("password_hash", "")
+        self.stats = copy.deepcopy(record.get("stats")) or empty_stats()
+        self._version = record.get("version", 0)
+        self._stats_base = copy.deepcopy(self.stats)
+        
+        # Игра, слоты и история декодируются только когда понадобятся
+        self._reset_sections(record)
+        # Текущее состояние создаётся из сохранения в load_game()
+        self.current_state = None
+        self.journal = Journal()
+    
+    def _read_disk_record(self) -> Optional[Dict[str, Any]]:
+        """Прочитать запись аккаунта с диска в обход индекса."""
+        path = storage.locate(self.account_name)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return save_format.decode_record(f.read(), lazy=LAZY_SECTIONS)
+        except SaveFormatError:
+            # Повреждённый файл будет перезаписан
+            return None
+    
+    def to_record(self) -> Dict[str, Any]:
+        """Снимок записи аккаунта. Нетронутые секции остаются LazySection."""
+        with self._lock:
+            record = {
+                "version": self._version,
+                "password_hash": self.password_hash,
+                "stats": copy.deepcopy(self.stats),
+            }
+            for name in LAZY_SECTIONS:
+                record[name] = self._section(name)
+            return record
+    
+    @traced("_save_account")
+    @SAVE_SECONDS.timed
+    def _save_account(self, create: bool = False) -> bool:
+        with self._lock:
+            record = self.to_record()
+            stats_base = self._stats_base
+            section_base = dict(self._section_base)
+            password_base = self._password_base
+        version = record["version"]
+        stats = record["stats"]
         
         path = self.get_save_path()
-        temp_path = path + ".tmp"
         
         try:
-            with open(temp_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with storage.account_lock(self.account_name):
+                disk = self._read_disk_record()
+                disk_version = 0
+                written_stats = stats
+                password_hash = record["password_hash"]
+                sections: Dict[str, Any] = {}
+                conflicts: List[str] = []
+                if disk is not None:
+                    if create:
+                        return False
+                    disk_version = disk.get("version", 0)
+                    if disk_version != version:
+                        # Файл успел записать другой процесс — сливаем статистику,
+                        # а секции, которые мы не меняли, берём из файла
+                        written_stats = merge_stats(stats_base, stats,
+                                                    disk.get("stats") or empty_stats())
+                        sections, conflicts = merge_sections(section_base, record, disk)
+                        if disk.get("password_hash") != password_base:
+                            # Хэш уже заменил другой вход — пароль тот же, берём его хэш
+                            password_hash = disk.get("password_hash")
+                
+                data = dict(record, version=disk_version + 1, stats=written_stats,
+                            password_hash=password_hash, **sections)
+                digests = dict.fromkeys(LAZY_SECTIONS)
+                encoded = save_format.encode_record(data, digests=digests)
+                storage.write_atomic(path, encoded)
+                
+                # Файл в другом формате после смены SAVE_FORMAT больше не нужен
+                base = path[:-len(save_format.extension())]
+                for ext in (save_format.BINARY_EXT, save_format.JSON_EXT):
+                    if base + ext != path and os.path.exists(base + ext):
+                        os.remove(base + ext)
+                
+                account_index.update(self.account_name, path, encoded)
             
-            if os.path.exists(path):
-                os.remove(path)
-            os.rename(temp_path, path)
-            return True
+            with self._lock:
+                # Изменения, сделанные во время записи, остаются поверх записанного
+                self.stats = merge_stats(stats, self.stats, written_stats)
+                self._stats_base = written_stats
+                self._version = disk_version + 1
+                self._section_base = digests
+                self.password_hash = self._password_base = password_hash
+                for name, section in sections.items():
+                    # Секцию из файла берём, если её не изменили, пока шла запись
+                    if (section is not record[name] and
+                            save_format.section_digest(self._section(name)) ==
+                            save_format.section_digest(record[name])):
+                        self._set_section(name, section)
+                self.save_conflicts = conflicts
+            # Конфликт — ошибка записи: наша версия секции не записана
+            return not conflicts
         except IOError:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            account_index.invalidate(self.account_name)
             return False
     
+    def _request_save(self) -> bool:
+        """Записать аккаунт в фоне. Ошибки видны через flush_saves()."""
+        if not BACKGROUND_SAVES:
+            return self._save_account()
+        save_writer.submit(self, self._save_account)
+        return True
+    
+    def flush_saves(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться записи аккаунта на диск."""
+        return save_writer.flush(self, timeout)
+    
     def state_differs_from_saved(self) -> bool:
         if self.current_state is None:
             return False
         if self.saved_state is None:
             return True
-        
-        current = self.current_state.to_dict()
-        saved = self.saved_state.to_dict()
-        
-        keys = ['class_id', 'hp', 'max_hp', 'strength', 'mp', 'max_mp',
-                'ability_uses', 'current_location', 'visited_locations', 
-                'defeated_bosses', 'inventory', 'artifacts',
-                'npc_relations', 'game_flags', 'path_taken']
-        
-        for key in keys:
-            if current.get(key) != saved.get(key):
-                return True
-        return False
+        return self.current_state.fingerprint(SAVE_FIELDS) != self.saved_state.fingerprint(SAVE_FIELDS)
     
     def has_saved_game(self) -> bool:
-        return self.saved_state is not None
+        return self._saved_pending is not None or self._saved_state is not None
     
     def can_load(self) -> bool:
         return self.has_saved_game()
@@ -205,7 +620,7 @@ class GameManager:
         if self.current_state is None:
             return False
         self.saved_state = self.current_state.copy()
-        return self._save_account()
+        return self._request_save()
     
     def load_game(self) -> bool:
         if self.saved_state is None:
@@ -213,14 +628,126 @@ class GameManager:
         self.current_state = self.saved_state.copy()
         return True
     
+    def push_history(self, label: str) -> None:
+        """Автоматический снимок текущего состояния в историю."""
+        if self.current_state is None:
+            return
+        key = self.current_state.fingerprint()
+        with self._lock:
+            if key == self.history.last_key:
+                return
+            changed = self.history.push(self.current_state.to_dict(), label, key)
+        if changed:
+            self._request_save()
+    
+    def load_history(self, index: int) -> bool:
+        try:
+            state = self.history.get(index)
+        except IndexError:
+            return False
+        self.current_state = GameState.from_dict(state)
+        return True
+    
+    def save_to_slot(self, slot: str, label: str) -> bool:
+        if self.current_state is None:
+            return False
+        with self._lock:
+            self.slots[slot] = {"label": label, "state": self.current_state.to_dict()}
+        return self._request_save()
+    
+    def load_slot(self, slot: str) -> bool:
+        data = self.slots.get(slot)
+        if not data:
+            return False
+        self.current_state = GameState.from_dict(copy.deepcopy(data["state"]))
+        return True
+    
+    def choose_history(self) -> Flow[bool]:
+        """Выбрать снимок из истории. Возвращает True, если игра загружена."""
+        labels = self.history.labels
+        if not labels:
+            self.io.print("  ⚠️ История пуста.")
+            return False
+        
+        self.io.print("\n  ⏪ ИСТОРИЯ (от новых к старым):")
+        newest_first = list(range(len(labels) - 1, -1, -1))
+        for i, index in enumerate(newest_first, 1):
+            self.io.print(f"    {i}. {labels[index]}")
+        self.io.print("    0. Назад")
+        
+        while True:
+            try:
+                choice = int((yield Prompt("\n  Выберите снимок: ", MENU, range(0, len(newest_first) + 1))))
+                if choice == 0:
+                    return False
+                if 1 <= choice <= len(newest_first):
+                    return self.load_history(newest_first[choice - 1])
+                self.io.print("  ⚠️ Неверный выбор.")
+            except ValueError:
+                self.io.print("  ⚠️ Введите число!")
+    
+    def slots_menu(self) -> Flow[bool]:
+        """Меню слотов и истории. Возвращает True, если игра загружена."""
+        while True:
+            self.io.print("\n" + "═" * 50)
+            self.io.print("  🗂️ СЛОТЫ И ИСТОРИЯ")
+            self.io.print("═" * 50)
+            
+            for i in range(1, MAX_SLOTS + 1):
+                data = self.slots.get(str(i))
+                label = data["label"] if data else "пусто"
+                self.io.print(f"  {i}. 📂 Слот {i}: {label}")
+            self.io.print(f"  {MAX_SLOTS + 1}. 💾 Записать игру в слот")
+            self.io.print(f"  {MAX_SLOTS + 2}. ⏪ История (снимков: {len(self.history)})")
+            self.io.print("  0. Назад")
+            
+            try:
+                choice = int((yield Prompt("\n  Выберите: ", MENU)))
+            except ValueError:
+                self.io.print("  ⚠️ Введите число!")
+                continue
+            
+            if choice == 0:
+                return False
+            
+            if 1 <= choice <= MAX_SLOTS:
+                if self.load_slot(str(choice)):
+                    return True
+                self.io.print("  ⚠️ Слот пуст.")
+            
+            elif choice == MAX_SLOTS + 1:
+                if self.current_state is None:
+                    self.io.print("  ⚠️ Нет текущей игры.")
+                    continue
+                try:
+                    slot = int((yield Prompt(f"  Номер слота (1-{MAX_SLOTS}): ", MENU, range(1, MAX_SLOTS + 1))))
+                except ValueError:
+                    self.io.print("  ⚠️ Введите число!")
+                    continue
+                if not 1 <= slot <= MAX_SLOTS:
+                    self.io.print("  ⚠️ Неверный слот.")
+                    continue
+                label = (yield Prompt("  Название: ")).strip() or self.current_state.current_location
+                self.save_to_slot(str(slot), label)
+                self.io.print(f"  ✅ Записано в слот {slot}!")
+            
+            elif choice == MAX_SLOTS + 2:
+                if (yield from self.choose_history()):
+                    return True
+            
+            else:
+                self.io.print("  ⚠️ Неверный выбор.")
+    
     def new_game(self, class_id: str) -> None:
         self.current_state = GameState(class_id=class_id)
     
     def clear_saved_game(self) -> bool:
         self.saved_state = None
         self.current_state = None
-        return self._save_account()
+        return self._request_save()
     
+    @traced("sync_from_hero")
+    @SYNC_SECONDS.timed
     def sync_from_hero(self, hero) -> None:
         """Синхронизировать состояние из героя."""
         if self.current_state is None:
@@ -298,62 +825,56 @@ class GameManager:
         self.hero = hero
     
     def record_victory(self, path_taken: str) -> None:
-        if self.current_state:
-            class_id = self.current_state.class_id
+        class_id = self.current_state.class_id if self.current_state else ""
+        with self._lock:
             if class_id in self.stats["victories"]:
                 if path_taken and path_taken not in self.stats["victories"][class_id]:
                     self.stats["victories"][class_id].append(path_taken)
-        self.stats["total_games"] += 1
-        self._save_account()
+            self.stats["total_games"] += 1
+            stats = copy.deepcopy(self.stats)
+        self._request_save()
+        leaderboard.record(self.account_name, class_id, path_taken, True, stats)
     
     def record_defeat(self) -> None:
-        self.stats["defeats"] += 1
-        self.stats["total_games"] += 1
-        self._save_account()
+        state = self.current_state
+        with self._lock:
+            self.stats["defeats"] += 1
+            self.stats["total_games"] += 1
+            stats = copy.deepcopy(self.stats)
+        self._request_save()
+        leaderboard.record(self.account_name, state.class_id if state else "",
+                           state.path_taken if state else "", False, stats)
     
     def show_stats(self) -> None:
-        print("\n" + "═" * 50)
-        print(f"  📊 СТАТИСТИКА: {self.account_name}")
-        print("═" * 50)
-        
-        class_names = {
-            "иван": "🤪 Иван-дурак",
-            "василиса": "✨ Василиса Премудрая",
-            "слуга": "🗡️ Кощеев слуга"
-        }
-        
-        path_names = {
-            "вода": "💧 Путь воды",
-            "дым": "🏚️ Путь дыма",
-            "тьма": "🌲 Путь тьмы",
-            "тайный": "🕳️ Тайный путь"
-        }
+        self.io.print("\n" + "═" * 50)
+        self.io.print(f"  📊 СТАТИСТИКА: {self.account_name}")
+        self.io.print("═" * 50)
         
         total_victories = 0
-        print("\n  🏆 ПОБЕДЫ:")
+        self.io.print("\n  🏆 ПОБЕДЫ:")
         
-        for class_id, class_name in class_names.items():
+        for class_id, class_name in CLASS_NAMES.items():
             paths = self.stats["victories"].get(class_id, [])
             if paths:
                 total_victories += len(paths)
-                print(f"\n  {class_name}:")
+                self.io.print(f"\n  {class_name}:")
                 for path in paths:
-                    print(f"    ✅ {path_names.get(path, path)}")
+                    self.io.print(f"    ✅ {PATH_NAMES.get(path, path)}")
             else:
-                print(f"\n  {class_name}: ещё не пройден")
+                self.io.print(f"\n  {class_name}: ещё не пройден")
         
-        print(f"\n  📈 ОБЩЕЕ:")
-        print(f"    🎮 Всего игр: {self.stats['total_games']}")
-        print(f"    🏆 Побед: {total_victories}")
-        print(f"    💀 Поражений: {self.stats['defeats']}")
-        print("═" * 50)
+        self.io.print(f"\n  📈 ОБЩЕЕ:")
+        self.io.print(f"    🎮 Всего игр: {self.stats['total_games']}")
+        self.io.print(f"    🏆 Побед: {total_victories}")
+        self.io.print(f"    💀 Поражений: {self.stats['defeats']}")
+        self.io.print("═" * 50)
     
-    def show_menu(self) -> str:
+    def show_menu(self) -> Flow[str]:
         """Показать меню. Возвращает действие."""
         
-        print("\n" + "═" * 50)
-        print("  📋 МЕНЮ")
-        print("═" * 50)
+        self.io.print("\n" + "═" * 50)
+        self.io.print("  📋 МЕНЮ")
+        self.io.print("═" * 50)
         
         options: List[str] = []
         actions: List[str] = []
@@ -375,6 +896,9 @@ class GameManager:
             options.append("📂 Загрузить (нет сохранения)")
             actions.append("load_disabled")
         
+        options.append("🗂️ Слоты и история")
+        actions.append("slots")
+        
         options.append("👤 Статус персонажа")
         actions.append("status")
         
@@ -388,29 +912,29 @@ class GameManager:
         actions.append("quit")
         
         for i, opt in enumerate(options, 1):
-            print(f"  {i}. {opt}")
+            self.io.print(f"  {i}. {opt}")
         
-        print("═" * 50)
+        self.io.print("═" * 50)
         
         while True:
             try:
-                choice = int(input("\n  Выберите: "))
+                choice = int((yield Prompt("\n  Выберите: ", MENU)))
                 if 1 <= choice <= len(options):
                     action = actions[choice - 1]
                     
                     if action == "save_disabled":
-                        print("  ⚠️ Нечего сохранять - изменений нет.")
+                        self.io.print("  ⚠️ Нечего сохранять - изменений нет.")
                         continue
                     elif action == "load_disabled":
-                        print("  ⚠️ Нет сохранённой игры.")
+                        self.io.print("  ⚠️ Нет сохранённой игры.")
                         continue
                     
                     return action
-                print("  ⚠️ Неверный выбор.")
+                self.io.print("  ⚠️ Неверный выбор.")
             except ValueError:
-                print("  ⚠️ Введите число!")
+                self.io.print("  ⚠️ Введите число!")
     
-    def process_menu_action(self, action: str) -> bool:
+    def process_menu_action(self, action: str) -> Flow[bool]:
         """Обработать действие. Возвращает True если продолжить игру."""
         
         if action == "continue":
@@ -419,60 +943,71 @@ class GameManager:
         
         elif action == "save":
             if self.save_game():
-                print("\n  ✅ Игра сохранена!")
+                self.io.print("\n  ✅ Игра сохранена!")
             else:
-                print("\n  ❌ Ошибка сохранения!")
-            input("\n  [Enter — продолжить]")
+                self.io.print("\n  ❌ Ошибка сохранения!")
+            yield Prompt("\n  [Enter — продолжить]", PAUSE)
             return True
         
         elif action == "load":
             if self.load_game():
-                print("\n  ✅ Игра загружена!")
+                self.io.print("\n  ✅ Игра загружена!")
                 if self.hero:
                     self.sync_to_hero(self.hero)
                 return True  # Сигнал о необходимости перезапуска локации
             else:
-                print("\n  ❌ Ошибка загрузки!")
-            input("\n  [Enter — продолжить]")
+                self.io.print("\n  ❌ Ошибка загрузки!")
+            yield Prompt("\n  [Enter — продолжить]", PAUSE)
+            return True
+        
+        elif action == "slots":
+            if (yield from self.slots_menu()):
+                self.io.print("\n  ✅ Игра загружена!")
+                if self.hero:
+                    self.sync_to_hero(self.hero)
+            yield Prompt("\n  [Enter — продолжить]", PAUSE)
             return True
         
         elif action == "status":
             if self.hero:
-                print(self.hero.get_full_status())
-            input("\n  [Enter — продолжить]")
+                self.io.print(self.hero.get_full_status())
+            yield Prompt("\n  [Enter — продолжить]", PAUSE)
             return True
         
         elif action == "inventory":
             if self.hero:
-                print(self.hero.show_inventory())
+                self.io.print(self.hero.show_inventory())
                 
                 from battle import use_item_outside_combat
                 usable = [i for i in self.hero.inventory if i.can_use(self.hero) and i.damage == 0]
                 if usable:
-                    print("\n  Использовать предмет? (y/n)")
-                    if input("  ").lower() == 'y':
-                        if use_item_outside_combat(self.hero):
+                    self.io.print("\n  Использовать предмет? (y/n)")
+                    if (yield Prompt("  ")).lower() == 'y':
+                        if (yield from use_item_outside_combat(self.io, self.hero)):
                             self.sync_from_hero(self.hero)
-            input("\n  [Enter — продолжить]")
+            yield Prompt("\n  [Enter — продолжить]", PAUSE)
             return True
         
         elif action == "stats":
             self.show_stats()
-            input("\n  [Enter — продолжить]")
+            yield Prompt("\n  [Enter — продолжить]", PAUSE)
             return True
         
         elif action == "quit":
             if self.can_save():
-                print("\n  ⚠️ Есть несохранённые изменения!")
-                print("  1. Сохранить и выйти")
-                print("  2. Выйти без сохранения")
-                print("  3. Отмена")
+                self.io.print("\n  ⚠️ Есть несохранённые изменения!")
+                self.io.print("  1. Сохранить и выйти")
+                self.io.print("  2. Выйти без сохранения")
+                self.io.print("  3. Отмена")
                 
                 try:
-                    choice = int(input("\n  Выберите: "))
+                    choice = int((yield Prompt("\n  Выберите: ", MENU)))
                     if choice == 1:
                         self.save_game()
-                        print("  ✅ Сохранено!")
+                        if self.flush_saves():
+                            self.io.print("  ✅ Сохранено!")
+                        else:
+                            self.io.print("  ❌ Ошибка сохранения!")
                         return False
                     elif choice == 2:
                         return False
@@ -484,24 +1019,24 @@ class GameManager:
         
         return True
     
-    def call_menu(self) -> bool:
+    def call_menu(self) -> Flow[bool]:
         """Вызвать меню. Возвращает True если продолжить."""
-        action = self.show_menu()
-        return self.process_menu_action(action)
+        action = yield from self.show_menu()
+        return (yield from self.process_menu_action(action))
     
-    def game_over_menu(self, victory: bool, path_taken: str = "") -> str:
+    def game_over_menu(self, victory: bool, path_taken: str = "") -> Flow[str]:
         """Меню после победы/поражения. Позволяет загрузить сохранение."""
         
         if victory:
             self.record_victory(path_taken)
-            print("\n" + "🏆" * 25)
-            print("\n  🎉 ПОЗДРАВЛЯЕМ С ПОБЕДОЙ!")
-            print("\n" + "🏆" * 25)
+            self.io.print("\n" + "🏆" * 25)
+            self.io.print("\n  🎉 ПОЗДРАВЛЯЕМ С ПОБЕДОЙ!")
+            self.io.print("\n" + "🏆" * 25)
         else:
             # Не записываем поражение сразу - даём шанс загрузить
-            print("\n" + "💀" * 25)
-            print("\n  😢 ИГРА ОКОНЧЕНА")
-            print("\n" + "💀" * 25)
+            self.io.print("\n" + "💀" * 25)
+            self.io.print("\n  😢 ИГРА ОКОНЧЕНА")
+            self.io.print("\n" + "💀" * 25)
         
         options: List[str] = ["🔄 Новая игра"]
         actions: List[str] = ["new_game"]
@@ -511,6 +1046,10 @@ class GameManager:
             options.append("📂 Загрузить сохранение")
             actions.append("load")
         
+        if not victory and len(self.history):
+            options.append("⏪ Вернуться в прошлое")
+            actions.append("history")
+        
         options.append("📊 Статистика")
         actions.append("stats")
         
@@ -521,12 +1060,12 @@ class GameManager:
         actions.append("quit")
         
         while True:
-            print()
+            self.io.print()
             for i, opt in enumerate(options, 1):
-                print(f"  {i}. {opt}")
+                self.io.print(f"  {i}. {opt}")
             
             try:
-                choice = int(input("\n  Выберите: "))
+                choice = int((yield Prompt("\n  Выберите: ", MENU)))
                 if choice < 1 or choice > len(options):
                     continue
                     
@@ -537,62 +1076,28 @@ class GameManager:
                     continue
                 elif action == "load":
                     if self.load_game():
-                        print("\n  ✅ Игра загружена!")
+                        self.io.print("\n  ✅ Игра загружена!")
                         if self.hero:
                             self.sync_to_hero(self.hero)
                         return "continue"  # Продолжить с сохранения
                     else:
-                        print("\n  ❌ Ошибка загрузки!")
+                        self.io.print("\n  ❌ Ошибка загрузки!")
                         continue
+                elif action == "history":
+                    if (yield from self.choose_history()):
+                        self.io.print("\n  ✅ Игра загружена!")
+                        if self.hero:
+                            self.sync_to_hero(self.hero)
+                        return "continue"
+                    continue
                 else:
                     if not victory and action in ("new_game", "main_menu", "quit"):
                         self.record_defeat()
                     return action
                     
             except ValueError:
-                print("  ⚠️ Введите число!")
-
+                self.io.print("  ⚠️ Введите число!")
 
-# Глобальный менеджер
-game_manager = GameManager()
 
-
-def get_input_with_menu(prompt: str, valid_range: range, 
-                       options_text: str = "", 
-                       options_list: Optional[List[str]] = None,
-                       game_mgr: Optional['GameManager'] = None) -> int:
-    """Ввод с возможностью меню (0). Сохраняет и повторяет приглашение после меню."""
-    if game_mgr is None:
-        game_mgr = game_manager
-    
-    mgr: GameManager = game_mgr  # Теперь точно не None
-    
-    # Сохраняем информацию о приглашении
-    set_last_prompt(options_text, options_list or [], valid_range, prompt)
-    
-    # Показываем подсказку о меню
-    print(f"\n  (0 — меню)")
-    
-    while True:
-        try:
-            value = int(input(prompt))
-            
-            if value == 0:
-                if mgr.hero:
-                    mgr.sync_from_hero(mgr.hero)
-                
-                if not mgr.call_menu():
-                    raise SystemExit("menu_exit")
-                
-                # После выхода из меню - повторяем ВСЁ приглашение
-                print("\n" + "─" * 50)
-                print("  ↩️ Возврат к выбору:")
-                show_last_prompt()
-                print(f"\n  (0 — меню)")
-                continue
-            
-            if value in valid_range:
-                return value
-            print(f"  ⚠️ Введите {valid_range.start}-{valid_range.stop - 1}")
-        except ValueError:
-            print("  ⚠️ Введите число!")
+# Индекс аккаунтов, общий для всех менеджеров процесса
+account_index = AccountIndex(storage.locate)
@@ -3,6 +3,7 @@ import random
 from typing import List, Optional, Dict, Any
 from core import (Character, Item, RegenEffect, StrengthBuff, 
                   FreezeEffect, PoisonEffect, Gender)
+from fingerprint import mapping_fingerprint
 
 
 class Hero(Character):
@@ -131,6 +132,15 @@ class Hero(Character):
             "path_taken": self.path_taken,
         })
         return data
+    
+    def fingerprint(self) -> int:
+        """Отпечаток героя по тем же правилам, что у GameState (см. fingerprint.py).
+        
+        Без кэша: списки героя меняются на месте (inventory.append),
+        поэтому хэши полей пришлось бы проверять каждый раз. Словарь
+        to_dict при этом не копирует списки — это дешевле asdict.
+        """
+        return mapping_fingerprint(self.to_dict())
 
 
 class Ivan(Hero):
@@ -0,0 +1,245 @@
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+import storage
+
+
+# Через сколько секунд без ввода сессия выгружается на диск
+HIBERNATE_AFTER = float(os.environ.get("TAJNA_HIBERNATE_AFTER", "300"))
+
+# Бюджет памяти: сколько сессий держать в памяти одновременно
+RESIDENT_LIMIT = int(os.environ.get("TAJNA_RESIDENT_SESSIONS", "1000"))
+
+# Как часто фоновый поток ищет простаивающие сессии
+SWEEP_INTERVAL = 30.0
+
+# Подкаталог SAVE_DIR для снимков
+HIBERNATE_DIR = "hibernate"
+
+
+def _alive(pid: int) -> bool:
+    if os.name == 'nt':
+        # os.kill на Windows завершает процесс; сервер там один
+        return pid == os.getpid()
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def remove_stale_snapshots() -> int:
+    """Удалить снимки, оставшиеся от завершившихся процессов (после сбоя)."""
+    directory = os.path.join(storage.SAVE_DIR, HIBERNATE_DIR)
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    removed = 0
+    for filename in names:
+        parts = filename.split(".")
+        if len(parts) != 3 or parts[2] != "snap" or not parts[1].isdigit():
+            continue
+        if not _alive(int(parts[1])):
+            try:
+                os.remove(os.path.join(directory, filename))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def snapshot_path(key: str) -> str:
+    """Файл снимка: имя процесса в нём — для remove_stale_snapshots()."""
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(storage.SAVE_DIR, HIBERNATE_DIR, f"{digest}.{os.getpid()}.snap")
+
+
+def write_snapshot(key: str, data: bytes) -> str:
+    """Записать снимок сессии; возвращает путь. Ошибка диска — IOError."""
+    path = snapshot_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    storage.write_atomic(path, data)
+    return path
+
+
+def read_snapshot(path: str) -> bytes:
+    """Прочитать снимок и удалить файл: сессия снова в памяти."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return data
+
+
+class _Slot:
+    __slots__ = ("session", "cls", "path", "used_at", "detached")
+
+    def __init__(self, session: Any):
+        self.session = session
+        self.cls = type(session)
+        self.path: Optional[str] = None
+        self.used_at = time.monotonic()
+        # Сессию никто не ведёт (соединение закрыто) — её можно выгрузить
+        self.detached = False
+
+
+class SessionStore:
+    """LRU-хранилище сессий с выгрузкой простаивающих на диск.
+
+    Сессия должна уметь snapshot() -> bytes, а её класс —
+    from_snapshot(bytes). Выгружаются только отпущенные сессии
+    (detach): у живой сессии шаг игры может идти в другом потоке.
+    Выгруженная сессия поднимается из снимка в claim(). Сессии живых
+    соединений выгружает сам сервер, когда игрок долго молчит.
+    """
+
+    def __init__(self, capacity: int, idle_after: float = HIBERNATE_AFTER,
+                 resident_limit: int = RESIDENT_LIMIT):
+        self.capacity = capacity
+        self.idle_after = idle_after
+        self.resident_limit = resident_limit
+        self._slots: "OrderedDict[str, _Slot]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self.hibernated = 0
+        self.woken = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def resident(self) -> int:
+        with self._lock:
+            return sum(1 for slot in self._slots.values() if slot.session is not None)
+
+    def put(self, key: str, session: Any) -> None:
+        dropped: List[_Slot] = []
+        with self._lock:
+            old = self._slots.pop(key, None)
+            if old is not None:
+                dropped.append(old)
+            self._slots[key] = _Slot(session)
+            while len(self._slots) > self.capacity:
+                dropped.append(self._slots.popitem(last=False)[1])
+        for slot in dropped:
+            self._remove_snapshot(slot)
+        self._ensure_sweeper()
+        if self.resident() > self.resident_limit:
+            self.sweep()
+
+    def touch(self, key: str) -> None:
+        """Отметить активность."""
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                return
+            slot.used_at = time.monotonic()
+            self._slots.move_to_end(key)
+
+    def detach(self, key: str, session: Any) -> None:
+        """Сессию больше никто не ведёт: теперь её можно выгрузить."""
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is not None and slot.session is session:
+                slot.detached = True
+                slot.used_at = time.monotonic()
+
+    def claim(self, key: str) -> Optional[Any]:
+        """Забрать отпущенную сессию; выгруженная поднимается из снимка.
+
+        None — сессии нет или её ещё ведёт другое соединение.
+        """
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None or not slot.detached:
+                return None
+            slot.used_at = time.monotonic()
+            self._slots.move_to_end(key)
+            if slot.session is not None:
+                slot.detached = False
+                return slot.session
+
+            try:
+                with open(slot.path, 'rb') as f:
+                    slot.session = slot.cls.from_snapshot(f.read())
+            except (IOError, ValueError):
+                # Снимок потерян — сессию придётся открыть заново
+                del self._slots[key]
+                return None
+            path, slot.path = slot.path, None
+            slot.detached = False
+            self.woken += 1
+        self._remove_file(path)
+        return slot.session
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._remove_snapshot(slot)
+
+    def sweep(self) -> int:
+        """Выгрузить простаивающие отпущенные сессии и лишние сверх бюджета."""
+        now = time.monotonic()
+        with self._lock:
+            resident = [(key, slot) for key, slot in self._slots.items() if slot.session is not None]
+            over = max(0, len(resident) - self.resident_limit)
+            # Порядок LRU: сначала самые давние; живые сессии не трогаем
+            idle = [(key, slot) for key, slot in resident if slot.detached]
+            victims = [(key, slot, slot.session, slot.used_at)
+                       for i, (key, slot) in enumerate(idle)
+                       if i < over or now - slot.used_at >= self.idle_after]
+
+        count = 0
+        for key, slot, session, used_at in victims:
+            if self._hibernate(key, slot, session, used_at):
+                count += 1
+        return count
+
+    def _hibernate(self, key: str, slot: _Slot, session: Any, used_at: float) -> bool:
+        try:
+            path = write_snapshot(key, session.snapshot())
+        except IOError:
+            return False
+
+        with self._lock:
+            # Пока писали снимок, сессию могли забрать
+            if (self._slots.get(key) is slot and slot.session is session
+                    and slot.detached and slot.used_at == used_at):
+                slot.session = None
+                slot.path = path
+                self.hibernated += 1
+                return True
+        self._remove_file(path)
+        return False
+
+    def _remove_snapshot(self, slot: _Slot) -> None:
+        if slot.path:
+            self._remove_file(slot.path)
+
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _ensure_sweeper(self) -> None:
+        # После fork() поток в дочернем процессе не существует
+        if self._sweeper is None or not self._sweeper.is_alive():
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self) -> None:
+        while True:
+            time.sleep(max(0.1, min(SWEEP_INTERVAL, self.idle_after)))
+            self.sweep()
@@ -0,0 +1,149 @@
+
+import copy
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# Сколько автоматических снимков хранится в истории
+HISTORY_LIMIT = 10
+
+# Количество именованных слотов сохранения
+MAX_SLOTS = 3
+
+
+def make_delta(prev: Dict[str, Any], cur: Dict[str, Any]) -> Dict[str, Any]:
+    """Разница между двумя состояниями (словарями GameState)."""
+    delta: Dict[str, Any] = {}
+
+    for key, value in cur.items():
+        if key in prev and prev[key] == value:
+            continue
+        old = prev.get(key)
+
+        if isinstance(value, list) and isinstance(old, list):
+            # Списки обычно растут с конца: храним общий префикс и хвост
+            keep = 0
+            limit = min(len(old), len(value))
+            while keep < limit and old[keep] == value[keep]:
+                keep += 1
+            delta[key] = {"op": "list", "keep": keep, "tail": value[keep:]}
+        elif isinstance(value, dict) and isinstance(old, dict):
+            changed = {k: v for k, v in value.items() if k not in old or old[k] != v}
+            dropped = [k for k in old if k not in value]
+            delta[key] = {"op": "dict", "set": changed, "drop": dropped}
+        else:
+            delta[key] = {"op": "set", "value": value}
+
+    for key in prev:
+        if key not in cur:
+            delta[key] = {"op": "del"}
+
+    return delta
+
+
+def apply_delta(prev: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Восстановить состояние по предыдущему и разнице."""
+    result = copy.deepcopy(prev)
+
+    for key, change in delta.items():
+        op = change["op"]
+        if op == "list":
+            result[key] = result.get(key, [])[:change["keep"]] + copy.deepcopy(change["tail"])
+        elif op == "dict":
+            target = result.setdefault(key, {})
+            for k in change["drop"]:
+                target.pop(k, None)
+            target.update(copy.deepcopy(change["set"]))
+        elif op == "set":
+            result[key] = copy.deepcopy(change["value"])
+        elif op == "del":
+            result.pop(key, None)
+
+    return result
+
+
+class SaveHistory:
+    """Скользящая история снимков: первый целиком, остальные — разницей."""
+
+    def __init__(self, limit: int = HISTORY_LIMIT):
+        self.limit = limit
+        self.base: Optional[Dict[str, Any]] = None
+        self.deltas: List[Dict[str, Any]] = []
+        self.labels: List[str] = []
+        # Последний снимок целиком — чтобы не восстанавливать его при push()
+        self._last: Optional[Dict[str, Any]] = None
+        # Отпечаток последнего снимка (GameState.fingerprint), если известен
+        self.last_key: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def push(self, state: Dict[str, Any], label: str, key: Optional[int] = None) -> bool:
+        """Добавить снимок. Повтор последнего снимка не записывается.
+
+        key — отпечаток снимка: по нему вызывающий может отсеять повтор,
+        не собирая словарь состояния.
+        """
+        self.last_key = key
+        if self._last is not None and self._last == state:
+            return False
+
+        state = copy.deepcopy(state)
+        if self.base is None:
+            self.base = state
+        else:
+            self.deltas.append(make_delta(self._last, state))
+        self.labels.append(label)
+        self._last = state
+
+        while len(self.labels) > self.limit:
+            # Самый старый снимок уходит: следующий становится опорным
+            self.base = apply_delta(self.base, self.deltas.pop(0))
+            self.labels.pop(0)
+        return True
+
+    def get(self, index: int) -> Dict[str, Any]:
+        """Восстановить снимок по номеру (0 — самый старый)."""
+        if not 0 <= index < len(self.labels):
+            raise IndexError(index)
+        if index == len(self.labels) - 1:
+            return copy.deepcopy(self._last)
+        state = self.base
+        for delta in self.deltas[:index]:
+            state = apply_delta(state, delta)
+        return copy.deepcopy(state)
+
+    def map_states(self, fn: Callable[[Dict[str, Any]], Tuple[Dict[str, Any], bool]]) -> bool:
+        """Преобразовать все снимки (например, миграцией). True — что-то изменилось."""
+        if self.base is None:
+            return False
+        results = [fn(self.get(i)) for i in range(len(self.labels))]
+        if not any(changed for _, changed in results):
+            return False
+
+        labels = self.labels
+        self.base = None
+        self.deltas = []
+        self.labels = []
+        self._last = None
+        self.last_key = None
+        for (state, _), label in zip(results, labels):
+            self.push(state, label)
+        return True
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        if self.base is None:
+            return None
+        return {"base": self.base, "deltas": self.deltas, "labels": self.labels}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], limit: int = HISTORY_LIMIT) -> 'SaveHistory':
+        history = cls(limit)
+        if data and data.get("base") is not None:
+            history.base = data["base"]
+            history.deltas = list(data.get("deltas", []))
+            history.labels = list(data.get("labels", []))
+            state = history.base
+            for delta in history.deltas:
+                state = apply_delta(state, delta)
+            history._last = state
+        return history
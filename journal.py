@@ -0,0 +1,129 @@
+
+import os
+import random
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+# Больше ответов после контрольной точки не запоминаем: повтор был бы долгим
+MAX_ANSWERS = 200
+
+# Модули сюжета, которые бросают кости через random
+STORY_MODULES = ("battle", "core", "enemies", "heroes", "locations")
+
+_local = threading.local()
+
+
+class SessionRandom:
+    """Подставляется вместо модуля random в модулях сюжета.
+
+    Пока в потоке идёт шаг сессии (active), кости бросает генератор
+    журнала её менеджера (менеджер меняется при возврате по коду),
+    иначе — общий random. Консольная игра и прогоны по сценарию с --seed
+    поэтому ведут себя как прежде.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        session = getattr(_local, "session", None)
+        source = session.manager.journal.rng if session is not None else random
+        return getattr(source, name)
+
+
+SESSION_RANDOM = SessionRandom()
+
+
+def install() -> None:
+    """Бросать кости сюжета генераторами сессий (для сервера)."""
+    import importlib
+    for name in STORY_MODULES:
+        importlib.import_module(name).random = SESSION_RANDOM
+
+
+def new_seed() -> int:
+    return int.from_bytes(os.urandom(8), 'big') >> 1
+
+
+@contextmanager
+def active(session: Any):
+    """Шаг сессии в этом потоке: кости бросает её генератор."""
+    previous = getattr(_local, "session", None)
+    _local.session = session
+    try:
+        yield
+    finally:
+        _local.session = previous
+
+
+class Journal:
+    """Контрольная точка потока игры и ответы после неё.
+
+    Точка ставится у входа в локацию и в главном меню: оттуда поток
+    можно начать заново по состоянию игры. Вместе с зерном генератора
+    и ответами это возвращает поток к тому же приглашению — так
+    выгруженная сессия поднимается посреди локации. После действий,
+    которые меняют аккаунт (меню, конец игры), повторять нельзя:
+    журнал пуст до следующей точки.
+    """
+
+    def __init__(self):
+        # Есть ли точка, с которой поток можно повторить
+        self.ready = False
+        # Состояние игры в точке; None — главное меню
+        self.state: Optional[Dict[str, Any]] = None
+        self.seed = 0
+        self.answers: List[str] = []
+        # Приглашение, на котором сессия была выгружена
+        self.pending = ""
+        self.rng = random.Random()
+        self._replaying = False
+
+    def mark(self, state: Optional[Dict[str, Any]]) -> None:
+        """Контрольная точка с состоянием игры (None — главное меню)."""
+        if self._replaying:
+            # Повтор начинается с этой же точки: зерно из журнала
+            self.rng.seed(self.seed)
+            return
+        self.ready = True
+        self.state = state
+        self.seed = new_seed()
+        self.answers = []
+        self.rng.seed(self.seed)
+
+    def taint(self) -> None:
+        """Сессия изменила аккаунт: повторять поток до новой точки нельзя."""
+        self.ready = False
+        self.state = None
+        self.answers = []
+
+    def record(self, answer: str) -> None:
+        if not self.ready:
+            return
+        if len(self.answers) >= MAX_ANSWERS:
+            self.taint()
+            return
+        self.answers.append(answer)
+
+    @contextmanager
+    def replaying(self):
+        """Повтор ответов: точка в начале потока не сбрасывает журнал."""
+        self._replaying = True
+        try:
+            yield
+        finally:
+            self._replaying = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "state": self.state, "seed": self.seed,
+                "answers": list(self.answers), "pending": self.pending}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> 'Journal':
+        journal = cls()
+        if data:
+            journal.ready = bool(data.get("ready"))
+            journal.state = data.get("state")
+            journal.seed = data.get("seed", 0)
+            journal.answers = list(data.get("answers") or [])
+            journal.pending = data.get("pending", "")
+        return journal
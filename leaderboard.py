@@ -0,0 +1,169 @@
+
+import os
+import json
+import heapq
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import storage
+from account_index import AccountIndex, safe_name
+from autosave import save_writer, BACKGROUND_SAVES
+
+
+# Файл агрегированной статистики в каталоге сохранений
+STATS_FILE = "global_stats.json"
+
+# Сколько лучших аккаунтов хранится в таблице лидеров
+TOP_KEEP = 100
+
+
+def empty_aggregate() -> Dict[str, Any]:
+    return {
+        "total_games": 0,
+        "victories": 0,
+        "defeats": 0,
+        # Попытки и победы: класс → {...}, путь → {...}
+        "classes": {},
+        "paths": {},
+        # [очки, побед, имя] по убыванию
+        "top": []
+    }
+
+
+def account_score(stats: Dict[str, Any]) -> Tuple[int, int]:
+    """Место в таблице: (пройденных пар класс+путь, всего побед).
+
+    Оба числа только растут, поэтому таблицу можно вести без пересчёта.
+    """
+    unique = sum(len(paths) for paths in stats.get("victories", {}).values())
+    wins = stats.get("total_games", 0) - stats.get("defeats", 0)
+    return unique, wins
+
+
+def _put_top(data: Dict[str, Any], name: str, score: Tuple[int, int]) -> None:
+    top = [entry for entry in data["top"] if entry[2] != name]
+    top.append([score[0], score[1], name])
+    data["top"] = heapq.nlargest(TOP_KEEP, top)
+
+
+def _apply_event(data: Dict[str, Any], event: Tuple) -> None:
+    name, class_id, path, victory, score = event
+    data["total_games"] += 1
+    data["victories" if victory else "defeats"] += 1
+    for group, key in (("classes", class_id), ("paths", path)):
+        if key:
+            counters = data[group].setdefault(key, {"games": 0, "victories": 0})
+            counters["games"] += 1
+            counters["victories"] += int(victory)
+    _put_top(data, name, score)
+
+
+class Leaderboard:
+    """Общая статистика всех аккаунтов, обновляемая по мере игр.
+
+    События копятся в памяти и дописываются в STATS_FILE пачкой
+    под межпроцессной блокировкой.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events: List[Tuple] = []
+
+    @staticmethod
+    def path() -> str:
+        return os.path.join(storage.SAVE_DIR, STATS_FILE)
+
+    def record(self, name: str, class_id: str, path_taken: str,
+               victory: bool, stats: Dict[str, Any]) -> None:
+        """Учесть завершённую игру. stats — статистика аккаунта после неё."""
+        # В таблице имя как в файлах аккаунтов — так же её строит rebuild()
+        name = safe_name(name)
+        with self._lock:
+            self._events.append((name, class_id, path_taken, victory, account_score(stats)))
+        if not BACKGROUND_SAVES:
+            self._write_pending()
+        else:
+            save_writer.submit(self, self._write_pending)
+
+    def _write_pending(self) -> bool:
+        with self._lock:
+            events, self._events = self._events, []
+        if not events:
+            return True
+
+        try:
+            with storage.file_lock(self.path() + ".lock"):
+                data = self.load()
+                for event in events:
+                    _apply_event(data, event)
+                self._write(data)
+            return True
+        except IOError:
+            # Не потеряем события: попробуем со следующей игрой
+            with self._lock:
+                self._events[:0] = events
+            return False
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        encoded = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        storage.write_atomic(self.path(), encoded)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return save_writer.flush(self, timeout)
+
+    def load(self) -> Dict[str, Any]:
+        data = empty_aggregate()
+        try:
+            with open(self.path(), 'r', encoding='utf-8') as f:
+                data.update(json.load(f))
+        except (IOError, ValueError):
+            pass
+        return data
+
+    def top(self, k: int = 10) -> List[Tuple[str, int, int]]:
+        """Лучшие k аккаунтов: (имя, пройдено, побед)."""
+        return [(name, unique, wins) for unique, wins, name in self.load()["top"][:k]]
+
+    def rebuild(self, index: AccountIndex, workers: int = storage.SCAN_WORKERS) -> Dict[str, Any]:
+        """Пересчитать таблицу лидеров и итоги полным обходом аккаунтов.
+
+        Попытки по классам и путям в файлах аккаунтов не хранятся —
+        они переносятся из текущего файла как есть. Обход идёт без
+        блокировки файла статистики, чтобы игры в это время записывались;
+        очки, выросшие за время обхода, берутся из файла.
+        """
+        names = storage.list_accounts()
+        data = empty_aggregate()
+        scores: Dict[str, Tuple[int, int]] = {}
+        for name, entry in zip(names, storage.parallel_map(index.read, names, workers)):
+            if entry is None or not entry.stats:
+                continue
+            games = entry.stats.get("total_games", 0)
+            defeats = entry.stats.get("defeats", 0)
+            data["total_games"] += games
+            data["defeats"] += defeats
+            data["victories"] += games - defeats
+            scores[name] = account_score(entry.stats)
+
+        with storage.file_lock(self.path() + ".lock"):
+            old = self.load()
+            data["classes"] = old["classes"]
+            data["paths"] = old["paths"]
+            for unique, wins, name in old["top"]:
+                name = safe_name(name)
+                # Очки только растут: запись новее обхода не уступает ему
+                if name in scores and (unique, wins) > scores[name]:
+                    scores[name] = (unique, wins)
+            data["top"] = heapq.nlargest(TOP_KEEP, [[unique, wins, name]
+                                                    for name, (unique, wins) in scores.items()])
+            self._write(data)
+        return data
+
+
+leaderboard = Leaderboard()
+
+
+if __name__ == "__main__":
+    # Полный пересчёт — только для восстановления после сбоев
+    result = leaderboard.rebuild(AccountIndex(storage.locate))
+    print(f"  ✅ Пересчитано: игр {result['total_games']}, в таблице {len(result['top'])}")
@@ -0,0 +1,301 @@
+
+import os
+import re
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import storage
+from flow import Prompt, CHOICE, BATTLE, MENU, PAUSE, TEXT, NAME, PASSWORD
+
+
+DEFAULT_BOTS = 100
+DEFAULT_STEPS = 200
+
+# Доля сюжетных выборов, на которых бот открывает меню (0)
+MENU_RATE = 0.05
+
+# Сколько ждать ответа сервера по сети
+RESPONSE_TIMEOUT = 30.0
+
+# Пункты меню, которые бот не выбирает: он уходит сам, когда кончатся шаги
+EXIT_WORDS = ("Выход", "Выйти")
+
+_OPTION = re.compile(r"^\s*(\d+)\.\s*(.*)$", re.M)
+_RANGE = re.compile(r"\((\d+)-(\d+)\)")
+# Приглашение закончено: «...: », «[Enter — ...]» или пустое приглашение y/n
+_PROMPT_END = re.compile(r"(: |\]|\n  )$")
+_TELNET = re.compile(rb"\xff[\xfb-\xfe].|\xff\xfa.*?\xff\xf0|\xff[\xf0-\xf9]", re.S)
+
+
+def menu_options(screen: str) -> List[int]:
+    """Номера пунктов меню на экране, кроме выхода."""
+    options = dict((int(num), label) for num, label in _OPTION.findall(screen))
+    allowed = [num for num, label in options.items() if not any(word in label for word in EXIT_WORDS)]
+    return allowed or list(options)
+
+
+def classify(screen: str) -> Prompt:
+    """Восстановить приглашение по тексту экрана (для игры по сети)."""
+    lines = screen.rstrip("\n").split("\n")
+    text = lines[-1] if lines else ""
+    found = _RANGE.search(text)
+    valid_range = range(int(found.group(1)), int(found.group(2)) + 1) if found else None
+
+    if "[Enter" in text:
+        kind = PAUSE
+    elif "Пароль" in text or "пароль" in text:
+        kind = PASSWORD
+    elif "Имя" in text:
+        kind = NAME
+    elif "Действие" in text or "способность" in text or "предмет" in text:
+        kind = BATTLE
+    elif "Выберите" in text or "Номер" in text:
+        kind = MENU
+    elif valid_range is not None or "(0 — меню)" in screen:
+        # Выбор в сюжете: «Выбор: », «Направление (1-4)»
+        kind = CHOICE
+    else:
+        kind = TEXT
+    return Prompt(text, kind, valid_range)
+
+
+class Bot:
+    """Игрок-бот: создаёт аккаунт, выбирает класс, ходит по локациям.
+
+    policy: "random" — случайный допустимый ответ,
+    "first" — всегда первый вариант (основная линия сюжета).
+    """
+
+    def __init__(self, name: str, policy: str = "random", menu_rate: float = MENU_RATE,
+                 seed: Optional[int] = None):
+        self.name = name
+        self.password = "bot-" + name
+        self.policy = policy
+        self.menu_rate = menu_rate
+        self.rng = random.Random(seed)
+        self.registered = False
+
+    def _pick(self, options) -> int:
+        options = list(options)
+        if not options:
+            return 1
+        return options[0] if self.policy == "first" else self.rng.choice(options)
+
+    def answer(self, prompt: Prompt, screen: str) -> str:
+        kind = prompt.kind
+        if kind == PAUSE:
+            return ""
+        if kind == NAME:
+            return self.name
+        if kind == PASSWORD:
+            if "Повторите" in prompt.text:
+                self.registered = True
+            return self.password
+        if kind == TEXT:
+            if "(y/n)" in screen[-200:]:
+                return self.rng.choice("yn")
+            return self.name
+
+        if "Создать новый аккаунт" in screen:
+            if "уже существует" in screen[-200:]:
+                self.registered = True
+            return "1" if self.registered else "2"
+        if kind == CHOICE and self.rng.random() < self.menu_rate:
+            return "0"
+        if prompt.valid_range is not None and kind != MENU:
+            options = [n for n in prompt.valid_range if n != 0] or list(prompt.valid_range)
+        else:
+            options = menu_options(screen)
+        return str(self._pick(options))
+
+
+class LatencyStats:
+    """Задержки ответов по видам приглашений и пропускная способность."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors = 0
+        self.sessions = 0
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    def record(self, kind: str, seconds: float) -> None:
+        self.samples[kind].append(seconds)
+
+    @staticmethod
+    def percentile(values: List[float], p: float) -> float:
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+    def report(self) -> str:
+        elapsed = max(1e-9, self.finished - self.started)
+        total = sum(len(v) for v in self.samples.values())
+        lines = [
+            f"  Сессий: {self.sessions}, ответов: {total} за {elapsed:.1f} с"
+            f" — {total / elapsed:.0f} ответов/с, ошибок: {self.errors}",
+            "",
+            f"  {'вид':<10}{'кол-во':>9}{'p50 мс':>10}{'p90 мс':>10}{'p99 мс':>10}{'макс мс':>10}",
+        ]
+        everything: List[float] = []
+        for kind in sorted(self.samples):
+            values = sorted(self.samples[kind])
+            everything.extend(values)
+            lines.append(self._row(kind, values))
+        lines.append(self._row("всего", sorted(everything)))
+        return "\n".join(lines)
+
+    def _row(self, kind: str, values: List[float]) -> str:
+        ms = [self.percentile(values, p) * 1000 for p in (50, 90, 99, 100)]
+        return f"  {kind:<10}{len(values):>9}" + "".join(f"{v:>10.2f}" for v in ms)
+
+
+async def _think(bot: Bot, think: float) -> None:
+    if think > 0:
+        await asyncio.sleep(bot.rng.expovariate(1 / think))
+
+
+async def run_local_bot(bot: Bot, steps: int, think: float, stats: LatencyStats,
+                        pool: ThreadPoolExecutor) -> None:
+    """Бот в этом же процессе: шаги потока игры на общем пуле, как в server.py."""
+    from channels import InputSource, IOChannel, NullWriter
+    from session import Session
+    from server import finish_session, step
+    import main as game
+
+    loop = asyncio.get_running_loop()
+    io = IOChannel(InputSource(), out=NullWriter())
+    session = Session(io=io)
+    flow = game.play(session)
+    stats.sessions += 1
+    answer, kind = None, None
+    try:
+        for _ in range(steps):
+            started = time.perf_counter()
+            prompt = await step(pool, flow, answer)
+            if kind is not None:
+                stats.record(kind, time.perf_counter() - started)
+            if prompt is None:
+                break
+            io.write(prompt.text)
+            screen = io.flush()
+            await _think(bot, think)
+            answer, kind = bot.answer(prompt, screen), prompt.kind
+    except (EOFError, SystemExit):
+        pass
+    except Exception:
+        stats.errors += 1
+    finally:
+        flow.close()
+        await loop.run_in_executor(pool, finish_session, session)
+
+
+async def _read_screen(reader: asyncio.StreamReader) -> Optional[str]:
+    data = b""
+    while True:
+        chunk = await asyncio.wait_for(reader.read(65536), RESPONSE_TIMEOUT)
+        if not chunk:
+            return None
+        data += chunk
+        text = _TELNET.sub(b"", data).decode('utf-8', errors='replace').replace("\r\n", "\n")
+        if _PROMPT_END.search(text):
+            return text
+
+
+async def run_tcp_bot(bot: Bot, host: str, port: int, steps: int, think: float,
+                      stats: LatencyStats) -> None:
+    """Бот по сети: приглашения распознаются по тексту экрана."""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        stats.errors += 1
+        return
+    stats.sessions += 1
+    kind = None
+    started = time.perf_counter()
+    try:
+        for _ in range(steps):
+            screen = await _read_screen(reader)
+            if kind is not None:
+                stats.record(kind, time.perf_counter() - started)
+            if screen is None:
+                break
+            prompt = classify(screen)
+            await _think(bot, think)
+            answer, kind = bot.answer(prompt, screen), prompt.kind
+            writer.write(answer.encode('utf-8') + b"\r\n")
+            started = time.perf_counter()
+            await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        stats.errors += 1
+    finally:
+        writer.close()
+
+
+async def run(bots: int, steps: int, policy: str, think: float, ramp: float,
+              menu_rate: float, seed: int, connect: Optional[Tuple[str, int]],
+              workers: int) -> LatencyStats:
+    stats = LatencyStats()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bot-step")
+    run_id = f"{seed:x}"
+
+    async def one(i: int) -> None:
+        if ramp > 0:
+            await asyncio.sleep(ramp * i / bots)
+        bot = Bot(f"bot{run_id}_{i}", policy, menu_rate, seed * 100003 + i)
+        if connect is None:
+            await run_local_bot(bot, steps, think, stats, pool)
+        else:
+            await run_tcp_bot(bot, connect[0], connect[1], steps, think, stats)
+
+    await asyncio.gather(*(one(i) for i in range(bots)))
+    stats.finished = time.perf_counter()
+    pool.shutdown(wait=True)
+    return stats
+
+
+def main(argv=None) -> int:
+    from server import STEP_WORKERS
+
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон: боты играют одновременно")
+    parser.add_argument("--bots", type=int, default=DEFAULT_BOTS)
+    parser.add_argument("--steps", type=int, default=DEFAULT_STEPS, help="ответов на бота")
+    parser.add_argument("--policy", choices=("random", "first"), default="random")
+    parser.add_argument("--think", type=float, default=0.0, help="средняя пауза бота, с")
+    parser.add_argument("--ramp", type=float, default=0.0, help="за сколько секунд подключить всех")
+    parser.add_argument("--menu-rate", type=float, default=MENU_RATE)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--connect", metavar="HOST:PORT",
+                        help="играть с сервером по сети вместо этого процесса")
+    parser.add_argument("--workers", type=int, default=STEP_WORKERS,
+                        help="потоков для шагов игры (без --connect)")
+    parser.add_argument("--save-dir", help="каталог сохранений (без --connect; по умолчанию временный)")
+    args = parser.parse_args(argv)
+
+    connect = None
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        connect = (host or "127.0.0.1", int(port))
+    else:
+        # Не засоряем настоящие сохранения аккаунтами ботов
+        storage.SAVE_DIR = args.save_dir or tempfile.mkdtemp(prefix="tajna-load-")
+        print(f"  📁 Сохранения: {storage.SAVE_DIR}", file=sys.stderr)
+
+    seed = args.seed if args.seed is not None else random.randrange(1 << 24)
+    stats = asyncio.run(run(args.bots, args.steps, args.policy, args.think, args.ramp,
+                            args.menu_rate, seed, connect, args.workers))
+    print(stats.report())
+    return 0 if stats.errors == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,8 @@ from enemies import (
     Vodyanoy, SoloveyRazboynik, BabaYaga, Leshy, ShadowKoschei, Upyr
 )
 from battle import battle, boss_battle
-from game_state import game_manager, get_input_with_menu
+from session import Session, get_input_with_menu
+from flow import Flow, Prompt, PAUSE
 
 
 @dataclass
@@ -21,40 +22,40 @@ class LocationResult:
     reload_location: bool = False  # Перезагрузить текущую локацию
 
 
-def show_choice(text: str, options: List[str], max_choice: int = None) -> int:
+def show_choice(session: Session, text: str, options: List[str], max_choice: int = None) -> Flow[int]:
     """Показать выбор и получить ответ. Поддерживает меню (0)."""
     if max_choice is None:
         max_choice = len(options)
     
     # Показываем текст и опции
     if text:
-        print(text)
+        session.print(text)
     
     options_list = []
     for opt in options:
-        print(opt)
+        session.print(opt)
         options_list.append(opt)
     
-    return get_input_with_menu(
+    return (yield from get_input_with_menu(session, 
         f"\n  Выбор (1-{max_choice}): ", 
         range(1, max_choice + 1),
         text,
         options_list
-    )
+    ))
 
 
-def show_navigation(current: str, available: List[Tuple[str, str, str]]) -> str:
+def show_navigation(session: Session, current: str, available: List[Tuple[str, str, str]]) -> Flow[str]:
     """Показать выбор направления. Возвращает ID следующей локации."""
     header = "\n  🧭 КУДА НАПРАВИТЬСЯ?"
-    print(header)
+    session.print(header)
     
     options = []
     for i, (loc_id, name, desc) in enumerate(available, 1):
         opt_text = f"\n  {i}. {name}\n     {desc}"
-        print(opt_text)
+        session.print(opt_text)
         options.append(opt_text)
     
-    choice = get_input_with_menu(
+    choice = yield from get_input_with_menu(session, 
         f"\n  Направление (1-{len(available)}): ",
         range(1, len(available) + 1),
         header,
@@ -79,18 +80,23 @@ class Location:
             return self.revisit_desc
         return self.first_visit_desc
     
-    def enter(self, hero: Hero) -> LocationResult:
+    def enter(self, session: Session) -> Flow[LocationResult]:
+        hero = session.hero
         # СНАЧАЛА получаем описание (до отметки о посещении!)
         description = self.get_description(hero)
         
         # ПОТОМ отмечаем посещение
         hero.visit_location(self.id)
         
-        print(f"\n{'═' * 60}")
-        print(f"\n  📍 {self.name}")
-        print(f"\n{'═' * 60}")
-        print(description)
+        session.print(f"\n{'═' * 60}")
+        session.print(f"\n  📍 {self.name}")
+        session.print(f"\n{'═' * 60}")
+        session.print(description)
         
+        # Приглашений здесь нет, но это поток, как enter() наследников:
+        # вызывается через yield from
+        if False:
+            yield
         return LocationResult()
 
 
@@ -126,57 +132,58 @@ class Opushka(Location):
 """
         )
     
-    def enter(self, hero: Hero) -> LocationResult:
+    def enter(self, session: Session) -> Flow[LocationResult]:
+        hero = session.hero
         # Проверяем до вызова super() который отметит посещение
         first_time = not hero.has_visited(self.id)
-        result = super().enter(hero)
+        result = yield from super().enter(session)
         
         # Осмотр местности
         if first_time:
-            print("\n  👁️ Ты замечаешь:")
-            print("    • Слева слышен плеск воды")
-            print("    • Прямо виден дымок над деревьями")
-            print("    • Справа лес становится гуще и темнее")
+            session.print("\n  👁️ Ты замечаешь:")
+            session.print("    • Слева слышен плеск воды")
+            session.print("    • Прямо виден дымок над деревьями")
+            session.print("    • Справа лес становится гуще и темнее")
             
             if isinstance(hero, Sluga):
-                print("    • В тенях мерцает что-то знакомое...")
+                session.print("    • В тенях мерцает что-то знакомое...")
         
         # Взаимодействие с объектами
-        print("\n  ❓ Что делать?")
+        session.print("\n  ❓ Что делать?")
         options = [
             "\n  1. 🔍 Осмотреть блеск у корней",
             "  2. 📖 Прочитать камень внимательнее", 
             "  3. 🚶 Идти дальше"
         ]
         
-        choice = show_choice("", options, 3)
+        choice = yield from show_choice(session, "", options, 3)
         
         if choice == 1:
             if not hero.get_flag("opushka_searched"):
                 hero.set_flag("opushka_searched", True)
-                print("\n  Ты раздвигаешь траву у корней...")
-                print("  Находишь старую монету! Бесполезная, но красивая.")
-                print("  Под листьями — грибы. Может пригодятся?")
+                session.print("\n  Ты раздвигаешь траву у корней...")
+                session.print("  Находишь старую монету! Бесполезная, но красивая.")
+                session.print("  Под листьями — грибы. Может пригодятся?")
                 
                 # Небольшая награда за исследование
                 if random.random() < 0.5:
                     hero.add_item(Item("🍄 Лесные грибы", "Можно съесть для небольшого лечения", "heal", hp_restore=15))
-                    print("\n" + hero.inventory[-1].name + " добавлены в инвентарь!")
+                    session.print("\n" + hero.inventory[-1].name + " добавлены в инвентарь!")
             else:
-                print("\n  Ты уже осматривал здесь. Ничего нового.")
+                session.print("\n  Ты уже осматривал здесь. Ничего нового.")
         
         elif choice == 2:
-            print("\n  Ты внимательно изучаешь камень...")
-            print("  Под основной надписью — ещё строки, почти стёртые:")
-            print("  «...а кто хитёр да смел, тот и тайный путь одолел»")
+            session.print("\n  Ты внимательно изучаешь камень...")
+            session.print("  Под основной надписью — ещё строки, почти стёртые:")
+            session.print("  «...а кто хитёр да смел, тот и тайный путь одолел»")
             
             if isinstance(hero, Sluga):
-                print("\n  💍 Перстень на пальце холодеет.")
-                print("  Ты знаешь этот путь. Кощей водил тебя им.")
+                session.print("\n  💍 Перстень на пальце холодеет.")
+                session.print("  Ты знаешь этот путь. Кощей водил тебя им.")
         
         # Выбор пути
-        print("\n" + "─" * 50)
-        print("\n  🧭 ВЫБОР ПУТИ:")
+        session.print("\n" + "─" * 50)
+        session.print("\n  🧭 ВЫБОР ПУТИ:")
         
         paths = [
             ("omut", "💧 Налево — к Тёмному омуту", "Там живёт Водяной, хранитель золотого ключа"),
@@ -187,14 +194,14 @@ class Opushka(Location):
         if isinstance(hero, Sluga):
             paths.append(("temnaya_tropa", "🕳️ В тени — Тайная тропа", "Путь слуг Кощея, опасный, но короткий"))
         
-        result.next_location = show_navigation("opushka", paths)
+        result.next_location = yield from show_navigation(session, "opushka", paths)
         
         # Устанавливаем путь
         path_map = {"omut": "вода", "izbushka": "дым", "chasha": "тьма", "temnaya_tropa": "тайный"}
         if not hero.path_taken:
             hero.path_taken = path_map.get(result.next_location, "")
         
-        game_manager.sync_from_hero(hero)
+        session.manager.sync_from_hero(hero)
         return result
 
 
@@ -224,31 +231,32 @@ class Omut(Location):
 """
         )
     
-    def enter(self, hero: Hero) -> LocationResult:
-        result = super().enter(hero)
+    def enter(self, session: Session) -> Flow[LocationResult]:
+        hero = session.hero
+        result = yield from super().enter(session)
         
         # Водяной уже повержен/договорились
         if hero.is_boss_defeated("водяной"):
             relation = hero.get_npc_relation("водяной")
             
             if relation == "мирно":
-                print("\n  Из воды показывается знакомая фигура.")
-                print("  «А, это ты... Проходи, коли надо.»")
-                print("  Водяной машет рукой и скрывается в глубине.")
+                session.print("\n  Из воды показывается знакомая фигура.")
+                session.print("  «А, это ты... Проходи, коли надо.»")
+                session.print("  Водяной машет рукой и скрывается в глубине.")
             elif relation == "враждебно":
-                print("\n  Омут пуст. Только круги на воде")
-                print("  напоминают о прошедшей битве.")
+                session.print("\n  Омут пуст. Только круги на воде")
+                session.print("  напоминают о прошедшей битве.")
             else:
-                print("\n  Водяной не показывается.")
-                print("  Вы разошлись мирно — он помнит.")
+                session.print("\n  Водяной не показывается.")
+                session.print("  Вы разошлись мирно — он помнит.")
             
-            return self._show_navigation(hero, result)
+            return (yield from self._show_navigation(session, result))
         
         # Первая встреча с Водяным
         vodyanoy = Vodyanoy()
         
-        print("\n  🌊 ВОДЯНОЙ преграждает путь!")
-        print(f"  (HP: {vodyanoy.hp}, Сила: {vodyanoy.strength})")
+        session.print("\n  🌊 ВОДЯНОЙ преграждает путь!")
+        session.print(f"  (HP: {vodyanoy.hp}, Сила: {vodyanoy.strength})")
         
         # Варианты действий зависят от класса
         options = ["\n  1. ⚔️ «Прочь с дороги, нечисть!» (бой)"]
@@ -268,114 +276,115 @@ class Omut(Location):
             options.append("  2. 💍 Показать перстень Кощея")
             max_choice = 2
         
-        choice = show_choice("", options, max_choice)
+        choice = yield from show_choice(session, "", options, max_choice)
         
         if choice == 1:
             # Бой
-            victory, battle_result = boss_battle(hero, vodyanoy, "  Водяной взревел!")
+            victory, battle_result = yield from boss_battle(session.io, hero, vodyanoy, "  Водяной взревел!")
             
             if not victory:
                 if battle_result == "побег":
-                    print("\n  Ты сбегаешь от Водяного...")
+                    session.print("\n  Ты сбегаешь от Водяного...")
                     result.next_location = "opushka"
                     return result
                 return LocationResult(game_over=True, victory=False)
             
-            print("\n  🏆 Водяной повержен!")
+            session.print("\n  🏆 Водяной повержен!")
             hero.set_npc_relation("водяной", "враждебно")
             
             # Награды
-            print(hero.add_artifact("zolotoy_kluch"))
+            session.print(hero.add_artifact("zolotoy_kluch"))
             if random.random() < 0.5:
-                print(hero.add_artifact("klubok"))
+                session.print(hero.add_artifact("klubok"))
         
         elif choice == 2:
             if isinstance(hero, Ivan):
-                print("\n  «Вежливый...» — удивляется Водяной.")
-                print("  «Давно ко мне с добром не приходили.»")
-                print("\n  «Отгадай загадку — пропущу.»")
-                print("  «Без рук, без ног, а бежит. Что это?»")
+                session.print("\n  «Вежливый...» — удивляется Водяной.")
+                session.print("  «Давно ко мне с добром не приходили.»")
+                session.print("\n  «Отгадай загадку — пропущу.»")
+                session.print("  «Без рук, без ног, а бежит. Что это?»")
                 
-                print("\n  1. Вода")
-                print("  2. Ветер")
-                print("  3. Время")
+                session.print("\n  1. Вода")
+                session.print("  2. Ветер")
+                session.print("  3. Время")
                 
-                ans = get_input_with_menu("\n  Ответ: ", range(1, 4), 
+                ans = yield from get_input_with_menu(session, "\n  Ответ: ", range(1, 4), 
                     "«Без рук, без ног, а бежит. Что это?»",
                     ["  1. Вода", "  2. Ветер", "  3. Время"])
                 
                 if ans == 1:
-                    print("\n  «Верно! Вода я и есть...»")
-                    print("  Водяной кивает с уважением.")
-                    print(hero.add_artifact("zolotoy_kluch"))
+                    session.print("\n  «Верно! Вода я и есть...»")
+                    session.print("  Водяной кивает с уважением.")
+                    session.print(hero.add_artifact("zolotoy_kluch"))
                     hero.set_npc_relation("водяной", "мирно")
                     hero.defeat_boss("водяной")
                 else:
-                    print("\n  «Неверно! А я думал, ты умнее...»")
-                    victory, _ = boss_battle(hero, vodyanoy)
+                    session.print("\n  «Неверно! А я думал, ты умнее...»")
+                    victory, _ = yield from boss_battle(session.io, hero, vodyanoy)
                     if not victory:
                         return LocationResult(game_over=True, victory=False)
-                    print(hero.add_artifact("zolotoy_kluch"))
+                    session.print(hero.add_artifact("zolotoy_kluch"))
                     hero.set_npc_relation("водяной", "враждебно")
             
             elif isinstance(hero, Vasilisa):
-                print("\n  Ты произносишь слова древнего заклинания...")
-                print("  «Колдунья?» — Водяной настораживается.")
-                print("  «Знаю я вашу породу. Кощеевы штучки!»")
+                session.print("\n  Ты произносишь слова древнего заклинания...")
+                session.print("  «Колдунья?» — Водяной настораживается.")
+                session.print("  «Знаю я вашу породу. Кощеевы штучки!»")
                 
-                print("\n  «Но... если ты дочь того колдуна...»")
-                print("  «Я помню его. Он был... справедлив.»")
-                print("  «Бери ключ и уходи. Но если обманешь...»")
+                session.print("\n  «Но... если ты дочь того колдуна...»")
+                session.print("  «Я помню его. Он был... справедлив.»")
+                session.print("  «Бери ключ и уходи. Но если обманешь...»")
                 
-                print(hero.add_artifact("zolotoy_kluch"))
+                session.print(hero.add_artifact("zolotoy_kluch"))
                 hero.set_npc_relation("водяной", "нейтрально")
                 hero.defeat_boss("водяной")
             
             else:  # Слуга
-                print("\n  Ты показываешь перстень.")
-                print("  Водяной отшатывается!")
-                print("\n  «К-кощеев слуга?! Чего тебе надо?»")
-                print("  «Ключ? Забирай... только убирайся!»")
+                session.print("\n  Ты показываешь перстень.")
+                session.print("  Водяной отшатывается!")
+                session.print("\n  «К-кощеев слуга?! Чего тебе надо?»")
+                session.print("  «Ключ? Забирай... только убирайся!»")
                 
-                print(hero.add_artifact("zolotoy_kluch"))
+                session.print(hero.add_artifact("zolotoy_kluch"))
                 hero.set_npc_relation("водяной", "враждебно")
                 hero.defeat_boss("водяной")
         
         elif choice == 3:
             if isinstance(hero, Ivan):
                 # Хлеб
-                print("\n  Ты достаёшь краюху хлеба.")
-                print("  «Матушка дала. Возьми, дедушка.»")
-                print("\n  Водяной замирает. Тянется к хлебу.")
-                print("  «Хлеб... Сколько веков не видел...»")
-                print("\n  Он берёт краюху бережно, как сокровище.")
-                print("  «Добрый ты, человек. Редкость нынче.»")
+                session.print("\n  Ты достаёшь краюху хлеба.")
+                session.print("  «Матушка дала. Возьми, дедушка.»")
+                session.print("\n  Водяной замирает. Тянется к хлебу.")
+                session.print("  «Хлеб... Сколько веков не видел...»")
+                session.print("\n  Он берёт краюху бережно, как сокровище.")
+                session.print("  «Добрый ты, человек. Редкость нынче.»")
                 
                 bread = hero.find_item("Краюха хлеба")
                 if bread:
                     hero.remove_item(bread)
                 
-                print(hero.add_artifact("zolotoy_kluch"))
-                print(hero.add_artifact("klubok"))
-                print(hero.add_artifact("voda_zhizni"))
+                session.print(hero.add_artifact("zolotoy_kluch"))
+                session.print(hero.add_artifact("klubok"))
+                session.print(hero.add_artifact("voda_zhizni"))
                 hero.set_npc_relation("водяной", "мирно")
                 hero.defeat_boss("водяной")
             
             else:  # Василиса - зеркальце
-                print("\n  Ты достаёшь зеркальце и направляешь на Водяного.")
-                print("  В отражении видно: он боится огня!")
-                print("\n  «Убери! Убери эту дрянь!» — шипит Водяной.")
-                print("  «Ладно, ладно... Бери ключ, только уходи!»")
+                session.print("\n  Ты достаёшь зеркальце и направляешь на Водяного.")
+                session.print("  В отражении видно: он боится огня!")
+                session.print("\n  «Убери! Убери эту дрянь!» — шипит Водяной.")
+                session.print("  «Ладно, ладно... Бери ключ, только уходи!»")
                 
-                print(hero.add_artifact("zolotoy_kluch"))
+                session.print(hero.add_artifact("zolotoy_kluch"))
                 hero.set_npc_relation("водяной", "нейтрально")
                 hero.defeat_boss("водяной")
         
-        return self._show_navigation(hero, result)
+        return (yield from self._show_navigation(session, result))
     
-    def _show_navigation(self, hero: Hero, result: LocationResult) -> LocationResult:
+    def _show_navigation(self, session: Session, result: LocationResult) -> Flow[LocationResult]:
         """Показать навигацию после событий."""
-        print("\n" + "─" * 50)
+        hero = session.hero
+        session.print("\n" + "─" * 50)
         
         paths = [
             ("opushka", "🌲 Вернуться к развилке", "Можно выбрать другой путь"),
@@ -386,8 +395,8 @@ class Omut(Location):
         if hero.has_artifact("klubok"):
             paths.append(("izbushka", "🧶 Следовать за клубком", "Клубок ведёт к избушке"))
         
-        result.next_location = show_navigation("omut", paths)
-        game_manager.sync_from_hero(hero)
+        result.next_location = yield from show_navigation(session, "omut", paths)
+        session.manager.sync_from_hero(hero)
         return result
 
 
@@ -419,24 +428,25 @@ class Izbushka(Location):
 """
         )
     
-    def enter(self, hero: Hero) -> LocationResult:
-        result = super().enter(hero)
+    def enter(self, session: Session) -> Flow[LocationResult]:
+        hero = session.hero
+        result = yield from super().enter(session)
         
         # Яга уже встречена
         if hero.is_boss_defeated("яга"):
             relation = hero.get_npc_relation("яга")
             
             if relation == "мирно":
-                print("\n  Дверь открывается.")
-                print("  «А, это ты! Заходи, чаю налью.»")
-                print("  Яга машет метлой приветственно.")
+                session.print("\n  Дверь открывается.")
+                session.print("  «А, это ты! Заходи, чаю налью.»")
+                session.print("  Яга машет метлой приветственно.")
                 
                 # Можно попросить помощь/совет
-                print("\n  «Чего надо-то?»")
-                print("\n  1. «Спасибо, просто проходил мимо»")
-                print("  2. «Есть ли зелья какие?»")
+                session.print("\n  «Чего надо-то?»")
+                session.print("\n  1. «Спасибо, просто проходил мимо»")
+                session.print("  2. «Есть ли зелья какие?»")
                 
-                choice = get_input_with_menu("\n  Выбор: ", range(1, 3))
+                choice = yield from get_input_with_menu(session, "\n  Выбор: ", range(1, 3))
                 
                 if choice == 2:
                     if not hero.get_flag("yaga_potion_given"):
@@ -445,158 +455,159 @@ class Izbushka(Location):
                         
                         # Разные реплики для разных персонажей
                         if isinstance(hero, Ivan):
-                            print("\n  «На, держи. Заработал честно.»")
+                            session.print("\n  «На, держи. Заработал честно.»")
                         elif isinstance(hero, Vasilisa):
-                            print("\n  «На, внученька. Береги себя.»")
+                            session.print("\n  «На, внученька. Береги себя.»")
                         else:
-                            print("\n  «На, держи. Только не говори никому.»")
+                            session.print("\n  «На, держи. Только не говори никому.»")
                     else:
-                        print("\n  «Уже давала! Не жадничай!»")
+                        session.print("\n  «Уже давала! Не жадничай!»")
             
             elif relation == "враждебно":
-                print("\n  Избушка отворачивается от тебя!")
-                print("  Яга не хочет тебя видеть после драки.")
+                session.print("\n  Избушка отворачивается от тебя!")
+                session.print("  Яга не хочет тебя видеть после драки.")
             else:
-                print("\n  Яга выглядывает в окно, но не выходит.")
+                session.print("\n  Яга выглядывает в окно, но не выходит.")
             
-            return self._show_navigation(hero, result)
+            return (yield from self._show_navigation(session, result))
         
         # Первая встреча
         yaga = BabaYaga()
         
         if isinstance(hero, Vasilisa):
-            print("\n  Яга прищуривается...")
-            print("  «Погоди-ка... Это ж дочка колдуна!»")
-            print("  «Знала я твоего отца. Хороший был человек.»")
-            print("  «Заходи, внученька. Чаю попьём.»")
+            session.print("\n  Яга прищуривается...")
+            session.print("  «Погоди-ка... Это ж дочка колдуна!»")
+            session.print("  «Знала я твоего отца. Хороший был человек.»")
+            session.print("  «Заходи, внученька. Чаю попьём.»")
             
             hero.set_npc_relation("яга", "мирно")
             hero.defeat_boss("яга")
             
-            print("\n  За столом Яга рассказывает:")
-            print("  «Кощей проклял твоего отца из зависти.»")
-            print("  «Свиток Освобождения — в сундуке в Сердце леса.»")
-            print("  «Вот тебе ключик. И зелье на дорожку.»")
+            session.print("\n  За столом Яга рассказывает:")
+            session.print("  «Кощей проклял твоего отца из зависти.»")
+            session.print("  «Свиток Освобождения — в сундуке в Сердце леса.»")
+            session.print("  «Вот тебе ключик. И зелье на дорожку.»")
             
-            print(hero.add_artifact("serebryany_kluch"))
+            session.print(hero.add_artifact("serebryany_kluch"))
             hero.add_item(Item("💧 Зелье маны", "Восстанавливает 40 MP", "mana", mp_restore=40))
-            print("  🎁 Получено: 💧 Зелье маны (+40 MP)")
+            session.print("  🎁 Получено: 💧 Зелье маны (+40 MP)")
         
         elif isinstance(hero, Ivan):
-            print("\n  «Эка невидаль — дурачок деревенский!»")
-            print("  «Ну, раз пришёл — работать будешь!»")
-            print("\n  «Баню истопи, избу подмети,")
-            print("  а там посмотрим, съесть тебя или нет.»")
+            session.print("\n  «Эка невидаль — дурачок деревенский!»")
+            session.print("  «Ну, раз пришёл — работать будешь!»")
+            session.print("\n  «Баню истопи, избу подмети,")
+            session.print("  а там посмотрим, съесть тебя или нет.»")
             
-            print("\n  1. 💪 Взяться за работу")
-            print("  2. 🍀 «Авось само сделается!»")
-            print("  3. ⚔️ «Не буду! Дерись!»")
+            session.print("\n  1. 💪 Взяться за работу")
+            session.print("  2. 🍀 «Авось само сделается!»")
+            session.print("  3. ⚔️ «Не буду! Дерись!»")
             
-            choice = get_input_with_menu("\n  Выбор: ", range(1, 4))
+            choice = yield from get_input_with_menu(session, "\n  Выбор: ", range(1, 4))
             
             if choice == 1:
-                print("\n  Ты берёшься за веник, потом за дрова...")
-                print("  Работаешь честно, хоть и трудно.")
-                print("  Яга наблюдает, кивает.")
-                print("\n  «Молодец! Не ленивый, не злой.»")
-                print("  «Держи ключик, заслужил.»")
+                session.print("\n  Ты берёшься за веник, потом за дрова...")
+                session.print("  Работаешь честно, хоть и трудно.")
+                session.print("  Яга наблюдает, кивает.")
+                session.print("\n  «Молодец! Не ленивый, не злой.»")
+                session.print("  «Держи ключик, заслужил.»")
                 
-                print(hero.add_artifact("serebryany_kluch"))
+                session.print(hero.add_artifact("serebryany_kluch"))
                 hero.set_npc_relation("яга", "мирно")
                 hero.defeat_boss("яга")
             
             elif choice == 2:
                 if random.random() < 0.6:
-                    print("\n  Ты садишься на лавку и ждёшь.")
-                    print("  Вдруг веник сам начинает мести!")
-                    print("  Дрова сами прыгают в печь!")
-                    print("\n  Яга выпучивает глаза.")
-                    print("  «Вот те на! Ты, никак, везучий?»")
-                    print("  «Такого я ещё не видала!»")
-                    print("  «На, держи ключ! И убирайся!»")
+                    session.print("\n  Ты садишься на лавку и ждёшь.")
+                    session.print("  Вдруг веник сам начинает мести!")
+                    session.print("  Дрова сами прыгают в печь!")
+                    session.print("\n  Яга выпучивает глаза.")
+                    session.print("  «Вот те на! Ты, никак, везучий?»")
+                    session.print("  «Такого я ещё не видала!»")
+                    session.print("  «На, держи ключ! И убирайся!»")
                     
-                    print(hero.add_artifact("serebryany_kluch"))
+                    session.print(hero.add_artifact("serebryany_kluch"))
                     hero.set_npc_relation("яга", "нейтрально")
                     hero.defeat_boss("яга")
                 else:
-                    print("\n  Ничего не происходит.")
-                    print("  «Обленился! Сейчас съем!»")
-                    victory, _ = boss_battle(hero, yaga)
+                    session.print("\n  Ничего не происходит.")
+                    session.print("  «Обленился! Сейчас съем!»")
+                    victory, _ = yield from boss_battle(session.io, hero, yaga)
                     if not victory:
                         return LocationResult(game_over=True, victory=False)
-                    print(hero.add_artifact("serebryany_kluch"))
+                    session.print(hero.add_artifact("serebryany_kluch"))
                     hero.set_npc_relation("яга", "враждебно")
             
             else:  # Бой
-                print("\n  «Ах ты наглец!»")
-                victory, _ = boss_battle(hero, yaga, "  Яга хватает метлу!")
+                session.print("\n  «Ах ты наглец!»")
+                victory, _ = yield from boss_battle(session.io, hero, yaga, "  Яга хватает метлу!")
                 if not victory:
                     return LocationResult(game_over=True, victory=False)
-                print(hero.add_artifact("serebryany_kluch"))
+                session.print(hero.add_artifact("serebryany_kluch"))
                 hero.set_npc_relation("яга", "враждебно")
         
         else:  # Слуга
-            print("\n  Яга принюхивается...")
-            print("  «Тьфу! Кощеем от тебя разит!»")
-            print("  «Предатель! Слуга переметнулся!»")
-            print("\n  «Не будет тебе моей помощи!»")
+            session.print("\n  Яга принюхивается...")
+            session.print("  «Тьфу! Кощеем от тебя разит!»")
+            session.print("  «Предатель! Слуга переметнулся!»")
+            session.print("\n  «Не будет тебе моей помощи!»")
             
-            print("\n  1. ⚔️ «Тогда силой возьму!»")
-            print("  2. 🗣️ «Я больше не служу ему»")
-            print("  3. 💍 Показать перстень")
+            session.print("\n  1. ⚔️ «Тогда силой возьму!»")
+            session.print("  2. 🗣️ «Я больше не служу ему»")
+            session.print("  3. 💍 Показать перстень")
             
-            choice = get_input_with_menu("\n  Выбор: ", range(1, 4))
+            choice = yield from get_input_with_menu(session, "\n  Выбор: ", range(1, 4))
             
             if choice == 1:
-                victory, _ = boss_battle(hero, yaga, "  Яга шипит от злости!")
+                victory, _ = yield from boss_battle(session.io, hero, yaga, "  Яга шипит от злости!")
                 if not victory:
                     return LocationResult(game_over=True, victory=False)
-                print(hero.add_artifact("serebryany_kluch"))
+                session.print(hero.add_artifact("serebryany_kluch"))
                 hero.set_npc_relation("яга", "враждебно")
             
             elif choice == 2:
-                print("\n  «Не служишь? Докажи!»")
-                print("  «Сними перстень и брось в огонь!»")
+                session.print("\n  «Не служишь? Докажи!»")
+                session.print("  «Сними перстень и брось в огонь!»")
                 
-                print("\n  1. Бросить перстень")
-                print("  2. «Нет, он мне нужен»")
+                session.print("\n  1. Бросить перстень")
+                session.print("  2. «Нет, он мне нужен»")
                 
-                c2 = get_input_with_menu("\n  Выбор: ", range(1, 3))
+                c2 = yield from get_input_with_menu(session, "\n  Выбор: ", range(1, 3))
                 
                 if c2 == 1:
-                    print("\n  Ты срываешь перстень...")
-                    print("  Он жжёт пальцы! Но ты бросаешь его в печь.")
-                    print("  Перстень плавится с воем.")
-                    print("\n  Яга кивает.")
-                    print("  «Верю теперь. Свободен ты.»")
-                    print("  «Вот ключ. И запомни — Кощей тебя не простит.»")
+                    session.print("\n  Ты срываешь перстень...")
+                    session.print("  Он жжёт пальцы! Но ты бросаешь его в печь.")
+                    session.print("  Перстень плавится с воем.")
+                    session.print("\n  Яга кивает.")
+                    session.print("  «Верю теперь. Свободен ты.»")
+                    session.print("  «Вот ключ. И запомни — Кощей тебя не простит.»")
                     
                     # Теряем артефакт перстня
                     hero.artifacts = [a for a in hero.artifacts if a.id != "persten"]
-                    print(hero.add_artifact("serebryany_kluch"))
+                    session.print(hero.add_artifact("serebryany_kluch"))
                     hero.set_npc_relation("яга", "нейтрально")
                     hero.defeat_boss("яга")
                 else:
-                    print("\n  «Тогда прочь из моего дома!»")
-                    print("  Яга выгоняет тебя метлой.")
+                    session.print("\n  «Тогда прочь из моего дома!»")
+                    session.print("  Яга выгоняет тебя метлой.")
                     result.next_location = "opushka"
                     return result
             
             else:  # Перстень
-                print("\n  Ты показываешь перстень.")
-                print("  Яга шипит и отшатывается!")
-                print("  «Убери эту гадость!»")
-                print("\n  «Ладно, ладно... Бери ключ и уходи!»")
-                print("  «Только помни — я тебе ничего не давала!»")
+                session.print("\n  Ты показываешь перстень.")
+                session.print("  Яга шипит и отшатывается!")
+                session.print("  «Убери эту гадость!»")
+                session.print("\n  «Ладно, ладно... Бери ключ и уходи!»")
+                session.print("  «Только помни — я тебе ничего не давала!»")
                 
-                print(hero.add_artifact("serebryany_kluch"))
+                session.print(hero.add_artifact("serebryany_kluch"))
                 hero.set_npc_relation("яга", "враждебно")
                 hero.defeat_boss("яга")
         
-        return self._show_navigation(hero, result)
+        return (yield from self._show_navigation(session, result))
     
-    def _show_navigation(self, hero: Hero, result: LocationResult) -> LocationResult:
-        print("\n" + "─" * 50)
+    def _show_navigation(self, session: Session, result: LocationResult) -> Flow[LocationResult]:
+        hero = session.hero
+        session.print("\n" + "─" * 50)
         
         paths = [
             ("opushka", "🌲 Вернуться к развилке", "Выбрать другой путь"),
@@ -604,8 +615,8 @@ class Izbushka(Location):
             ("serdce", "💎 К Сердцу леса", f"Там сундук (ключей: {hero.count_keys()}/3)"),
         ]
         
-        result.next_location = show_navigation("izbushka", paths)
-        game_manager.sync_from_hero(hero)
+        result.next_location = yield from show_navigation(session, "izbushka", paths)
+        session.manager.sync_from_hero(hero)
         return result
 
 
@@ -634,24 +645,25 @@ class Ovrag(Location):
 """
         )
     
-    def enter(self, hero: Hero) -> LocationResult:
-        result = super().enter(hero)
+    def enter(self, session: Session) -> Flow[LocationResult]:
+        hero = session.hero
+        result = yield from super().enter(session)
         
         if hero.is_boss_defeated("соловей"):
             relation = hero.get_npc_relation("соловей")
             
             if relation == "мирно":
-                print("\n  Соловей машет с ветки.")
-                print("  «Здорово! Проходи, не трону.»")
+                session.print("\n  Соловей машет с ветки.")
+                session.print("  «Здорово! Проходи, не трону.»")
             else:
-                print("\n  Соловья нет. Овраг пуст.")
+                session.print("\n  Соловья нет. Овраг пуст.")
             
-            return self._show_navigation(hero, result)
+            return (yield from self._show_navigation(session, result))
         
         solovey = SoloveyRazboynik()
         
-        print(f"\n  🎵 СОЛОВЕЙ-РАЗБОЙНИК!")
-        print(f"  (HP: {solovey.hp}, Сила: {solovey.strength})")
+        session.print(f"\n  🎵 СОЛОВЕЙ-РАЗБОЙНИК!")
+        session.print(f"  (HP: {solovey.hp}, Сила: {solovey.strength})")
         
         # ВАЖНО: нельзя отдавать ключи!
         has_keys = hero.count_keys() > 0
@@ -669,19 +681,19 @@ class Ovrag(Location):
             options.append(f"  {len(options) + 1}. 😊 «Хочешь, песню спою?»")
         
         max_c = len(options)
-        choice = show_choice("", options, max_c)
+        choice = yield from show_choice(session, "", options, max_c)
         
         if choice == 1:
-            victory, _ = boss_battle(hero, solovey, "  Соловей свистит оглушительно!")
+            victory, _ = yield from boss_battle(session.io, hero, solovey, "  Соловей свистит оглушительно!")
             if not victory:
                 return LocationResult(game_over=True, victory=False)
             
-            print(hero.add_artifact("yayco"))
+            session.print(hero.add_artifact("yayco"))
             hero.set_npc_relation("соловей", "враждебно")
         
         elif choice == 2 and has_keys:
-            print("\n  Соловей потирает руки.")
-            print("  «Дань? Давай! Что у тебя есть?»")
+            session.print("\n  Соловей потирает руки.")
+            session.print("  «Дань? Давай! Что у тебя есть?»")
             
             # Показываем что можно отдать (НЕ ключи!)
             tribute_items = [i for i in hero.inventory if i.item_type != "key"]
@@ -689,65 +701,66 @@ class Ovrag(Location):
                                if a.id not in ("zolotoy_kluch", "serebryany_kluch", "kostyanoy_kluch")]
             
             if not tribute_items and not tribute_artifacts:
-                print("\n  «Ха! У тебя только ключи? Не-е-ет!»")
-                print("  «Ключи мне не нужны! ДЕРИСЬ!»")
-                victory, _ = boss_battle(hero, solovey)
+                session.print("\n  «Ха! У тебя только ключи? Не-е-ет!»")
+                session.print("  «Ключи мне не нужны! ДЕРИСЬ!»")
+                victory, _ = yield from boss_battle(session.io, hero, solovey)
                 if not victory:
                     return LocationResult(game_over=True, victory=False)
-                print(hero.add_artifact("yayco"))
+                session.print(hero.add_artifact("yayco"))
                 hero.set_npc_relation("соловей", "враждебно")
             else:
-                print("\n  ⚠️ НЕЛЬЗЯ ОТДАВАТЬ КЛЮЧИ!")
-                print("  Соловей забирает что-то из твоих вещей...\n")
+                session.print("\n  ⚠️ НЕЛЬЗЯ ОТДАВАТЬ КЛЮЧИ!")
+                session.print("  Соловей забирает что-то из твоих вещей...\n")
                 
                 if tribute_artifacts:
                     lost = tribute_artifacts[0]
                     hero.artifacts = [a for a in hero.artifacts if a.id != lost.id]
-                    print(f"  Соловей забрал: {lost.name}")
+                    session.print(f"  Соловей забрал: {lost.name}")
                 elif tribute_items:
                     lost = tribute_items[0]
                     hero.remove_item(lost)
-                    print(f"  Соловей забрал: {lost.name}")
+                    session.print(f"  Соловей забрал: {lost.name}")
                 
-                print("\n  «Хе-хе! Давай ещё!»")
-                print("  «Ладно, ладно, проходи...»")
+                session.print("\n  «Хе-хе! Давай ещё!»")
+                session.print("  «Ладно, ладно, проходи...»")
                 hero.set_npc_relation("соловей", "нейтрально")
                 hero.defeat_boss("соловей")
         
         else:
             # Классовые способы
             if isinstance(hero, Sluga):
-                print("\n  Ты показываешь перстень.")
-                print("  Соловей бледнеет!")
-                print("  «К-кощеев?! П-прости, хозяин!»")
-                print("  «Вот, возьми — только не говори ему!»")
+                session.print("\n  Ты показываешь перстень.")
+                session.print("  Соловей бледнеет!")
+                session.print("  «К-кощеев?! П-прости, хозяин!»")
+                session.print("  «Вот, возьми — только не говори ему!»")
                 
-                print(hero.add_artifact("dudochka"))
+                session.print(hero.add_artifact("dudochka"))
                 hero.set_npc_relation("соловей", "мирно")
                 hero.defeat_boss("соловей")
             
             elif isinstance(hero, Vasilisa):
-                print("\n  Ты шепчешь заклинание...")
-                print("  Твоё тело становится прозрачным!")
-                print("  Соловей вертит головой: «Куда делась?!»")
-                print("\n  Ты тихо обходишь его стороной...")
+                session.print("\n  Ты шепчешь заклинание...")
+                session.print("  Твоё тело становится прозрачным!")
+                session.print("  Соловей вертит головой: «Куда делась?!»")
+                session.print("\n  Ты тихо обходишь его стороной...")
                 hero.set_npc_relation("соловей", "нейтрально")
                 hero.defeat_boss("соловей")
             
             elif isinstance(hero, Ivan):
-                print("\n  «Песню? — Соловей удивлён. — Ну давай!»")
-                print("  Ты затягиваешь матушкину колыбельную...")
-                print("\n  Соловей слушает, клюв приоткрыт.")
-                print("  «Красиво...» — он вытирает слезу.")
-                print("  «Ладно, проходи. Хороший ты человек.»")
+                session.print("\n  «Песню? — Соловей удивлён. — Ну давай!»")
+                session.print("  Ты затягиваешь матушкину колыбельную...")
+                session.print("\n  Соловей слушает, клюв приоткрыт.")
+                session.print("  «Красиво...» — он вытирает слезу.")
+                session.print("  «Ладно, проходи. Хороший ты человек.»")
                 
                 hero.set_npc_relation("соловей", "мирно")
                 hero.defeat_boss("соловей")
         
-        return self._show_navigation(hero, result)
+        return (yield from self._show_navigation(session, result))
     
-    def _show_navigation(self, hero: Hero, result: LocationResult) -> LocationResult:
-        print("\n" + "─" * 50)
+    def _show_navigation(self, session: Session, result: LocationResult) -> Flow[LocationResult]:
+        hero = session.hero
+        session.print("\n" + "─" * 50)
         
         paths = [
             ("izbushka", "🏚️ К избушке", "Вернуться к Бабе-Яге"),
@@ -755,8 +768,8 @@ class Ovrag(Location):
             ("serdce", "💎 К Сердцу леса", f"Там сундук (ключей: {hero.count_keys()}/3)"),
         ]
         
-        result.next_location = show_navigation("ovrag", paths)
-        game_manager.sync_from_hero(hero)
+        result.next_location = yield from show_navigation(session, "ovrag", paths)
+        session.manager.sync_from_hero(hero)
         return result
 
 
@@ -788,27 +801,28 @@ class Chasha(Location):
 """
         )
     
-    def enter(self, hero: Hero) -> LocationResult:
-        result = super().enter(hero)
+    def enter(self, session: Session) -> Flow[LocationResult]:
+        hero = session.hero
+        result = yield from super().enter(session)
         
         if hero.is_boss_defeated("леший"):
             relation = hero.get_npc_relation("леший")
             
             if relation == "мирно":
-                print("\n  Деревья шелестят приветственно.")
-                print("  Леший появляется из тумана.")
-                print("  «Здравствуй, путник. Лес помнит тебя.»")
+                session.print("\n  Деревья шелестят приветственно.")
+                session.print("  Леший появляется из тумана.")
+                session.print("  «Здравствуй, путник. Лес помнит тебя.»")
             else:
-                print("\n  Лес молчит. Леший не показывается.")
+                session.print("\n  Лес молчит. Леший не показывается.")
             
-            return self._show_navigation(hero, result)
+            return (yield from self._show_navigation(session, result))
         
         leshy = Leshy()
         
-        print(f"\n  🌲 ЛЕШИЙ — хозяин чащи!")
-        print(f"  (HP: {leshy.hp}, Сила: {leshy.strength})")
+        session.print(f"\n  🌲 ЛЕШИЙ — хозяин чащи!")
+        session.print(f"  (HP: {leshy.hp}, Сила: {leshy.strength})")
         
-        print("\n  «Зачем пришёл в мой лес, человече?»")
+        session.print("\n  «Зачем пришёл в мой лес, человече?»")
         
         options = [
             "\n  1. 🗣️ «Ищу сокровище, что в сердце леса»",
@@ -816,93 +830,94 @@ class Chasha(Location):
             "  3. 🙏 «Прошу помощи, хозяин леса»"
         ]
         
-        choice = show_choice("", options, 3)
+        choice = yield from show_choice(session, "", options, 3)
         
         if choice == 1:
-            print("\n  «Сокровище? — Леший усмехается. —")
-            print("  Многие искали. Никто не нашёл.»")
-            print("\n  «Докажи, что достоин. Загадки отгадай!»")
+            session.print("\n  «Сокровище? — Леший усмехается. —")
+            session.print("  Многие искали. Никто не нашёл.»")
+            session.print("\n  «Докажи, что достоин. Загадки отгадай!»")
             
-            correct = self._riddles(hero)
+            correct = yield from self._riddles(session)
             
             if correct >= 2:
-                print("\n  Леший кивает.")
-                print("  «Умён ты, путник. Или хитёр.»")
-                print("  «Вот тебе ключ. Иди с миром.»")
+                session.print("\n  Леший кивает.")
+                session.print("  «Умён ты, путник. Или хитёр.»")
+                session.print("  «Вот тебе ключ. Иди с миром.»")
                 
-                print(hero.add_artifact("kostyanoy_kluch"))
+                session.print(hero.add_artifact("kostyanoy_kluch"))
                 hero.set_npc_relation("леший", "мирно")
                 hero.defeat_boss("леший")
             else:
-                print("\n  «Глуп! — гремит Леший. — Лес не любит глупцов!»")
-                victory, _ = boss_battle(hero, leshy)
+                session.print("\n  «Глуп! — гремит Леший. — Лес не любит глупцов!»")
+                victory, _ = yield from boss_battle(session.io, hero, leshy)
                 if not victory:
                     return LocationResult(game_over=True, victory=False)
-                print(hero.add_artifact("kostyanoy_kluch"))
+                session.print(hero.add_artifact("kostyanoy_kluch"))
                 hero.set_npc_relation("леший", "враждебно")
         
         elif choice == 2:
-            print("\n  «Нечисть?! — Леший ревёт. —")
-            print("  Я — ДУХ ЛЕСА! Я — САМА ПРИРОДА!»")
-            print("  «Умри, невежда!»")
+            session.print("\n  «Нечисть?! — Леший ревёт. —")
+            session.print("  Я — ДУХ ЛЕСА! Я — САМА ПРИРОДА!»")
+            session.print("  «Умри, невежда!»")
             
-            victory, _ = boss_battle(hero, leshy)
+            victory, _ = yield from boss_battle(session.io, hero, leshy)
             if not victory:
                 return LocationResult(game_over=True, victory=False)
-            print(hero.add_artifact("kostyanoy_kluch"))
+            session.print(hero.add_artifact("kostyanoy_kluch"))
             hero.set_npc_relation("леший", "враждебно")
         
         else:  # Прошу помощи
-            print("\n  Леший смотрит внимательно...")
+            session.print("\n  Леший смотрит внимательно...")
             
             if isinstance(hero, Ivan):
-                print("  «Вижу — сердце доброе. Редкость.»")
-                print("  «Идёшь за сокровищем, но не для себя.»")
-                print("  «Помогу тебе, добрый человек.»")
+                session.print("  «Вижу — сердце доброе. Редкость.»")
+                session.print("  «Идёшь за сокровищем, но не для себя.»")
+                session.print("  «Помогу тебе, добрый человек.»")
                 
-                print(hero.add_artifact("kostyanoy_kluch"))
-                print(hero.add_artifact("dudochka"))
+                session.print(hero.add_artifact("kostyanoy_kluch"))
+                session.print(hero.add_artifact("dudochka"))
                 hero.set_npc_relation("леший", "мирно")
                 hero.defeat_boss("леший")
                 
             elif isinstance(hero, Vasilisa):
-                print("  «Колдунья... Но не злая.»")
-                print("  «Отца ищешь спасти? Знаю я эту историю.»")
-                print("  «Помогу. Но сначала — загадки!»")
+                session.print("  «Колдунья... Но не злая.»")
+                session.print("  «Отца ищешь спасти? Знаю я эту историю.»")
+                session.print("  «Помогу. Но сначала — загадки!»")
                 
-                correct = self._riddles(hero)
+                correct = yield from self._riddles(session)
                 if correct >= 1:  # Легче для Василисы
-                    print(hero.add_artifact("kostyanoy_kluch"))
+                    session.print(hero.add_artifact("kostyanoy_kluch"))
                     hero.set_npc_relation("леший", "мирно")
                     hero.defeat_boss("леший")
                 else:
-                    victory, _ = boss_battle(hero, leshy)
+                    victory, _ = yield from boss_battle(session.io, hero, leshy)
                     if not victory:
                         return LocationResult(game_over=True, victory=False)
-                    print(hero.add_artifact("kostyanoy_kluch"))
+                    session.print(hero.add_artifact("kostyanoy_kluch"))
                     hero.set_npc_relation("леший", "враждебно")
             
             else:  # Слуга
-                print("  «Кощеев слуга просит помощи?»")
-                print("  «Хм... Чую, ты изменился.»")
-                print("  «Но загадки всё равно отгадай!»")
+                session.print("  «Кощеев слуга просит помощи?»")
+                session.print("  «Хм... Чую, ты изменился.»")
+                session.print("  «Но загадки всё равно отгадай!»")
                 
-                correct = self._riddles(hero)
+                correct = yield from self._riddles(session)
                 if correct >= 2:
-                    print(hero.add_artifact("kostyanoy_kluch"))
+                    session.print(hero.add_artifact("kostyanoy_kluch"))
                     hero.set_npc_relation("леший", "нейтрально")
                     hero.defeat_boss("леший")
                 else:
-                    victory, _ = boss_battle(hero, leshy)
+                    victory, _ = yield from boss_battle(session.io, hero, leshy)
                     if not victory:
                         return LocationResult(game_over=True, victory=False)
-                    print(hero.add_artifact("kostyanoy_kluch"))
+                    session.print(hero.add_artifact("kostyanoy_kluch"))
                     hero.set_npc_relation("леший", "враждебно")
         
-        return self._show_navigation(hero, result)
+        return (yield from self._show_navigation(session, result))
     
-    def _riddles(self, hero: Hero) -> int:
+    def _riddles(self, session: Session) -> Flow[int]:
         """Загадки Лешего. Возвращает количество правильных ответов."""
+        hero = session.hero
         correct = 0
         
         riddles = [
@@ -912,37 +927,38 @@ class Chasha(Location):
         ]
         
         for question, answer, options in riddles:
-            print(f"\n  {question}")
+            session.print(f"\n  {question}")
             for i, opt in enumerate(options, 1):
-                print(f"  {i}. {opt}")
+                session.print(f"  {i}. {opt}")
             
             if isinstance(hero, Vasilisa):
-                print(f"\n  ✨ Василиса знает ответ: {options[answer-1]}")
+                session.print(f"\n  ✨ Василиса знает ответ: {options[answer-1]}")
                 correct += 1
             else:
-                ans = get_input_with_menu(
+                ans = yield from get_input_with_menu(session, 
                     "  Ответ: ", range(1, 4),
                     question, [f"  {i}. {o}" for i, o in enumerate(options, 1)]
                 )
                 if ans == answer:
-                    print("  ✅ Верно!")
+                    session.print("  ✅ Верно!")
                     correct += 1
                 else:
-                    print(f"  ❌ Неверно... Правильный ответ: {options[answer-1]}")
+                    session.print(f"  ❌ Неверно... Правильный ответ: {options[answer-1]}")
         
-        print(f"\n  Правильных ответов: {correct}/3")
+        session.print(f"\n  Правильных ответов: {correct}/3")
         return correct
     
-    def _show_navigation(self, hero: Hero, result: LocationResult) -> LocationResult:
-        print("\n" + "─" * 50)
+    def _show_navigation(self, session: Session, result: LocationResult) -> Flow[LocationResult]:
+        hero = session.hero
+        session.print("\n" + "─" * 50)
         
         paths = [
             ("opushka", "🌲 К развилке", "Вернуться к началу"),
             ("serdce", "💎 К Сердцу леса", f"Там сундук (ключей: {hero.count_keys()}/3)"),
         ]
         
-        result.next_location = show_navigation("chasha", paths)
-        game_manager.sync_from_hero(hero)
+        result.next_location = yield from show_navigation(session, "chasha", paths)
+        session.manager.sync_from_hero(hero)
         return result
 
 
@@ -968,56 +984,57 @@ class TemnayaTropa(Location):
 """
         )
     
-    def enter(self, hero: Hero) -> LocationResult:
-        result = super().enter(hero)
+    def enter(self, session: Session) -> Flow[LocationResult]:
+        hero = session.hero
+        result = yield from super().enter(session)
         
         if not isinstance(hero, Sluga):
-            print("\n  ⚠️ Тени отбрасывают тебя назад!")
-            print("  Этот путь не для тебя...")
+            session.print("\n  ⚠️ Тени отбрасывают тебя назад!")
+            session.print("  Этот путь не для тебя...")
             result.next_location = "opushka"
             return result
         
-        print("\n  Перстень пульсирует, указывая путь.")
-        print("  Ты идёшь сквозь тени...")
+        session.print("\n  Перстень пульсирует, указывая путь.")
+        session.print("  Ты идёшь сквозь тени...")
         
         if not hero.is_boss_defeated("упырь"):
-            print("\n  Внезапно из темноты выскакивает УПЫРЬ!")
-            print("  Он голоден и безумен!")
+            session.print("\n  Внезапно из темноты выскакивает УПЫРЬ!")
+            session.print("  Он голоден и безумен!")
             
             upyr = Upyr()
-            victory, _ = battle(hero, upyr, can_flee=False)
+            victory, _ = yield from battle(session.io, hero, upyr, can_flee=False)
             
             if not victory:
                 return LocationResult(game_over=True, victory=False)
             
-            print("\n  Упырь рассыпается в прах.")
+            session.print("\n  Упырь рассыпается в прах.")
         else:
-            print("\n  Там, где был упырь — только пыль.")
+            session.print("\n  Там, где был упырь — только пыль.")
         
         # Тайник Кощея
-        print("\n  В конце тропы — тайник!")
-        print("  Здесь Кощей хранил запасные ключи...")
-        print("  И кое-что ещё.")
+        session.print("\n  В конце тропы — тайник!")
+        session.print("  Здесь Кощей хранил запасные ключи...")
+        session.print("  И кое-что ещё.")
         
         if not hero.has_artifact("zolotoy_kluch"):
-            print(hero.add_artifact("zolotoy_kluch"))
+            session.print(hero.add_artifact("zolotoy_kluch"))
         if not hero.has_artifact("serebryany_kluch"):
-            print(hero.add_artifact("serebryany_kluch"))
+            session.print(hero.add_artifact("serebryany_kluch"))
         if not hero.has_artifact("kostyanoy_kluch"):
-            print(hero.add_artifact("kostyanoy_kluch"))
+            session.print(hero.add_artifact("kostyanoy_kluch"))
         if not hero.has_artifact("mech"):
-            print(hero.add_artifact("mech"))
+            session.print(hero.add_artifact("mech"))
         
         # Бонус к силе от меча
         hero.strength += 5
-        print("  ⚔️ Меч-кладенец даёт +5 к силе!")
+        session.print("  ⚔️ Меч-кладенец даёт +5 к силе!")
         
-        print("\n" + "─" * 50)
-        print("\n  Тайная тропа ведёт прямо к Сердцу леса.")
+        session.print("\n" + "─" * 50)
+        session.print("\n  Тайная тропа ведёт прямо к Сердцу леса.")
         
-        input("\n  [Enter — продолжить]")
+        yield Prompt("\n  [Enter — продолжить]", PAUSE)
         result.next_location = "serdce"
-        game_manager.sync_from_hero(hero)
+        session.manager.sync_from_hero(hero)
         return result
 
 
@@ -1045,90 +1062,91 @@ class Serdce(Location):
 """
         )
     
-    def enter(self, hero: Hero) -> LocationResult:
-        result = super().enter(hero)
+    def enter(self, session: Session) -> Flow[LocationResult]:
+        hero = session.hero
+        result = yield from super().enter(session)
         
         # Проверка ключей
         keys_count = hero.count_keys()
-        print(f"\n  🔑 У тебя ключей: {keys_count}/3")
+        session.print(f"\n  🔑 У тебя ключей: {keys_count}/3")
         
         if hero.has_artifact("zolotoy_kluch"):
-            print("    ✅ Золотой ключ")
+            session.print("    ✅ Золотой ключ")
         else:
-            print("    ❌ Золотой ключ (нет)")
+            session.print("    ❌ Золотой ключ (нет)")
         
         if hero.has_artifact("serebryany_kluch"):
-            print("    ✅ Серебряный ключ")
+            session.print("    ✅ Серебряный ключ")
         else:
-            print("    ❌ Серебряный ключ (нет)")
+            session.print("    ❌ Серебряный ключ (нет)")
         
         if hero.has_artifact("kostyanoy_kluch"):
-            print("    ✅ Костяной ключ")
+            session.print("    ✅ Костяной ключ")
         else:
-            print("    ❌ Костяной ключ (нет)")
+            session.print("    ❌ Костяной ключ (нет)")
         
         if keys_count < 3:
-            print("\n  ⚠️ Не хватает ключей!")
-            print("  Сундук не открыть...")
+            session.print("\n  ⚠️ Не хватает ключей!")
+            session.print("  Сундук не открыть...")
             
             # Иван может попробовать удачу
             if isinstance(hero, Ivan) and hero.can_use_ability():
-                print("\n  🍀 Может, авось поможет?")
-                print("\n  1. Попробовать удачу (использует способность)")
-                print("  2. Вернуться за ключами")
+                session.print("\n  🍀 Может, авось поможет?")
+                session.print("\n  1. Попробовать удачу (использует способность)")
+                session.print("  2. Вернуться за ключами")
                 
-                choice = get_input_with_menu("\n  Выбор: ", range(1, 3))
+                choice = yield from get_input_with_menu(session, "\n  Выбор: ", range(1, 3))
                 
                 if choice == 1:
-                    print(hero.use_ability(2))  # Авось
+                    session.print(hero.use_ability(2))  # Авось
                     if random.random() < 0.3:
-                        print("\n  🍀 НЕВЕРОЯТНО!")
-                        print("  Замки щёлкают сами собой!")
+                        session.print("\n  🍀 НЕВЕРОЯТНО!")
+                        session.print("  Замки щёлкают сами собой!")
                         # Продолжаем к боссу
                     else:
-                        print("\n  😔 Не сработало...")
-                        return self._show_navigation_back(hero, result)
+                        session.print("\n  😔 Не сработало...")
+                        return (yield from self._show_navigation_back(session, result))
                 else:
-                    return self._show_navigation_back(hero, result)
+                    return (yield from self._show_navigation_back(session, result))
             else:
-                return self._show_navigation_back(hero, result)
+                return (yield from self._show_navigation_back(session, result))
         
         # Открываем сундук
-        print("\n  Ты вставляешь ключи один за другим...")
-        print("  ЩЁЛК! ЩЁЛК! ЩЁЛК!")
-        print("\n  Крышка начинает подниматься...")
+        session.print("\n  Ты вставляешь ключи один за другим...")
+        session.print("  ЩЁЛК! ЩЁЛК! ЩЁЛК!")
+        session.print("\n  Крышка начинает подниматься...")
         
         # ФИНАЛЬНЫЙ БОСС
-        print("\n  💀 ЗЕМЛЯ СОДРОГАЕТСЯ!")
-        print("\n  Из сундука вырывается тьма!")
-        print("  Она сгущается в человеческую фигуру...")
-        print("\n  «НИКТО! НЕ ТРОНЕТ! МОЁ СОКРОВИЩЕ!»")
-        print("\n  ТЕНЬ КОЩЕЯ восстаёт!")
+        session.print("\n  💀 ЗЕМЛЯ СОДРОГАЕТСЯ!")
+        session.print("\n  Из сундука вырывается тьма!")
+        session.print("  Она сгущается в человеческую фигуру...")
+        session.print("\n  «НИКТО! НЕ ТРОНЕТ! МОЁ СОКРОВИЩЕ!»")
+        session.print("\n  ТЕНЬ КОЩЕЯ восстаёт!")
         
         shadow = ShadowKoschei()
         
         # Применяем бонусы от артефактов
-        print("\n  📜 БОНУСЫ ОТ АРТЕФАКТОВ:")
+        session.print("\n  📜 БОНУСЫ ОТ АРТЕФАКТОВ:")
         
         if hero.has_artifact("mech"):
-            print("  ⚔️ Меч-кладенец сияет праведным светом!")
+            session.print("  ⚔️ Меч-кладенец сияет праведным светом!")
             hero.strength += 7  # Ещё +7 против тени
         
         if hero.has_artifact("yayco"):
-            print("  🥚 Яйцо Соловья ослабляет тень!")
+            session.print("  🥚 Яйцо Соловья ослабляет тень!")
             shadow.hp -= 25
             shadow.strength -= 3
         
         if hero.has_artifact("dudochka"):
-            print("  🎵 Дудочка призывает духов леса!")
+            session.print("  🎵 Дудочка призывает духов леса!")
             shadow.hp -= 20
         
         if hero.has_artifact("zerkalce"):
-            print("  🪞 Зеркальце показывает слабости тени!")
+            session.print("  🪞 Зеркальце показывает слабости тени!")
             shadow.agility -= 8
         
         if hero.has_artifact("voda_zhizni"):
-            print("  💧 Живая вода восстанавливает все силы!")
+            session.print("  💧 Живая вода восстанавливает все силы!")
             hero.hp = hero.max_hp
             if hasattr(hero, 'mp'):
                 hero.mp = hero.max_mp
@@ -1138,17 +1156,17 @@ class Serdce(Location):
             heal = hero.max_hp - hero.hp
             if heal > 0:
                 hero.hp = hero.max_hp
-                print(f"\n  💚 Силы леса помогают: +{heal} HP")
+                session.print(f"\n  💚 Силы леса помогают: +{heal} HP")
             if hasattr(hero, 'mp'):
                 hero.mp = hero.max_mp
-                print(f"  💙 Магия восстановлена!")
+                session.print(f"  💙 Магия восстановлена!")
         
-        print(f"\n  👤 Тень Кощея (HP: {shadow.hp}, Сила: {shadow.strength})")
+        session.print(f"\n  👤 Тень Кощея (HP: {shadow.hp}, Сила: {shadow.strength})")
         
-        input("\n  [Enter — начать финальный бой!]")
+        yield Prompt("\n  [Enter — начать финальный бой!]", PAUSE)
         
         # ФИНАЛЬНЫЙ БОЙ
-        victory, _ = boss_battle(hero, shadow, "\n  ⚔️ ФИНАЛЬНАЯ БИТВА!")
+        victory, _ = yield from boss_battle(session.io, hero, shadow, "\n  ⚔️ ФИНАЛЬНАЯ БИТВА!")
         
         if not victory:
             result.game_over = True
@@ -1156,13 +1174,14 @@ class Serdce(Location):
             return result
         
         # ПОБЕДА!
-        self._victory_ending(hero, result)
+        self._victory_ending(session, result)
         return result
     
-    def _show_navigation_back(self, hero: Hero, result: LocationResult) -> LocationResult:
+    def _show_navigation_back(self, session: Session, result: LocationResult) -> Flow[LocationResult]:
         """Навигация назад за ключами."""
-        print("\n" + "─" * 50)
-        print("\n  Нужно найти недостающие ключи!")
+        hero = session.hero
+        session.print("\n" + "─" * 50)
+        session.print("\n  Нужно найти недостающие ключи!")
         
         paths = []
         
@@ -1177,26 +1196,27 @@ class Serdce(Location):
         
         paths.append(("opushka", "🌲 К развилке", "Выбрать путь"))
         
-        result.next_location = show_navigation("serdce", paths)
-        game_manager.sync_from_hero(hero)
+        result.next_location = yield from show_navigation(session, "serdce", paths)
+        session.manager.sync_from_hero(hero)
         return result
     
-    def _victory_ending(self, hero: Hero, result: LocationResult):
+    def _victory_ending(self, session: Session, result: LocationResult):
         """Концовка победы."""
+        hero = session.hero
         result.game_over = True
         result.victory = True
         result.path_taken = hero.path_taken
         
-        print("\n" + "🏆" * 30)
-        print("\n  ТЕНЬ РАССЕИВАЕТСЯ С ВОЕМ!")
-        print("\n" + "🏆" * 30)
+        session.print("\n" + "🏆" * 30)
+        session.print("\n  ТЕНЬ РАССЕИВАЕТСЯ С ВОЕМ!")
+        session.print("\n" + "🏆" * 30)
         
-        print("\n  Сундук наконец открыт.")
-        print("  Внутри — горы золота, драгоценные камни...")
-        print("  И нечто большее.")
+        session.print("\n  Сундук наконец открыт.")
+        session.print("  Внутри — горы золота, драгоценные камни...")
+        session.print("  И нечто большее.")
         
         if isinstance(hero, Ivan):
-            print("""
+            session.print("""
     ══════════════════════════════════════════════════
     
     🤪 КОНЦОВКА ИВАНА-ДУРАКА
@@ -1221,7 +1241,7 @@ class Serdce(Location):
 """)
         
         elif isinstance(hero, Vasilisa):
-            print("""
+            session.print("""
     ══════════════════════════════════════════════════
     
     ✨ КОНЦОВКА ВАСИЛИСЫ ПРЕМУДРОЙ
@@ -1249,7 +1269,7 @@ class Serdce(Location):
 """)
         
         else:  # Слуга
-            print("""
+            session.print("""
     ══════════════════════════════════════════════════
     
     🗡️ КОНЦОВКА КОЩЕЕВА СЛУГИ
@@ -1273,9 +1293,9 @@ class Serdce(Location):
     ══════════════════════════════════════════════════
 """)
         
-        print(f"\n  🎮 ИГРА ПРОЙДЕНА!")
-        print(f"  📊 Путь: {hero.path_taken}")
-        print(f"  🏆 Артефакты собрано: {len(hero.artifacts)}")
+        session.print(f"\n  🎮 ИГРА ПРОЙДЕНА!")
+        session.print(f"  📊 Путь: {hero.path_taken}")
+        session.print(f"  🏆 Артефакты собрано: {len(hero.artifacts)}")
 
 
 # Реестр локаций
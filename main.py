@@ -1,21 +1,35 @@
 import sys
 import os
+import random
+import argparse
+from typing import Optional
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from heroes import create_hero, get_class_description, Ivan, Vasilisa
 from locations import get_location
-from game_state import game_manager
+from game_state import CLASS_NAMES, PATH_NAMES, GameState
+from session import Session
+from channels import ConsoleIO
+from leaderboard import leaderboard
+from resume import resume_cache, token_name
+from flow import Flow, Prompt, run_flow, MENU, NAME, PASSWORD, PAUSE
+from metrics import LOGINS, LOCATION_ENTRIES
+import tracing
 
 
-def clear_screen():
+# Файл свёрнутых стеков для --profile
+PROFILE_FILE = "profile.folded"
+
+
+def clear_screen(session: Session):
     """Очистка экрана."""
-    os.system('cls' if os.name == 'nt' else 'clear')
+    session.io.clear()
 
 
-def show_title():
+def show_title(session: Session):
     """Заставка игры."""
-    print("""
+    session.print("""
 ╔══════════════════════════════════════════════════════════════╗
 ║                                                              ║
 ║      🌲🌲🌲   ТАЙНА ЗАПОВЕДНОГО ЛЕСА   🌲🌲🌲                ║
@@ -37,77 +51,110 @@ def show_title():
 """)
 
 
-def login_menu() -> bool:
+def show_resume_token(session: Session):
+    """Показать код для быстрого возврата после разрыва связи."""
+    token = session.manager.issue_resume_token()
+    session.print(f"  🔑 Код возврата (действует {resume_cache.ttl // 60} мин): {token}")
+
+
+def ask_name(session: Session, prompt: str) -> Flow[str]:
+    """Имя аккаунта. Если соединение закреплено за аккаунтом — не спрашиваем."""
+    if session.account:
+        session.print(f"{prompt}{session.account}")
+        return session.account
+    return (yield Prompt(prompt, NAME)).strip()
+
+
+def login_menu(session: Session) -> Flow[bool]:
     """Меню входа в систему."""
     
-    print("\n  👤 ВХОД В ИГРУ")
-    print("═" * 50)
-    print("\n  1. Войти в существующий аккаунт")
-    print("  2. Создать новый аккаунт")
-    print("  3. Выход из игры")
+    session.print("\n  👤 ВХОД В ИГРУ")
+    session.print("═" * 50)
+    session.print("\n  1. Войти в существующий аккаунт")
+    session.print("  2. Создать новый аккаунт")
+    session.print("  3. Вернуться по коду")
+    session.print("  4. Выход из игры")
     
     while True:
         try:
-            choice = int(input("\n  Выберите: "))
+            choice = int((yield Prompt("\n  Выберите: ", MENU)))
             
             if choice == 1:
-                name = input("\n  Имя пользователя: ").strip()
+                name = yield from ask_name(session, "\n  Имя пользователя: ")
                 if not name:
-                    print("  ⚠️ Введите имя!")
+                    session.print("  ⚠️ Введите имя!")
                     continue
                 
-                password = input("  Пароль: ").strip()
+                password = (yield Prompt("  Пароль: ", PASSWORD)).strip()
                 
-                if game_manager.login(name, password):
-                    print(f"\n  ✅ Добро пожаловать, {name}!")
+                if (yield from session.manager.login(name, password)):
+                    LOGINS.inc("password", "ok")
+                    session.print(f"\n  ✅ Добро пожаловать, {name}!")
+                    show_resume_token(session)
                     return True
                 else:
-                    print("  ❌ Неверное имя или пароль!")
+                    LOGINS.inc("password", "fail")
+                    session.print("  ❌ Неверное имя или пароль!")
             
             elif choice == 2:
-                print("\n  📝 СОЗДАНИЕ АККАУНТА")
-                name = input("  Имя (латиница, без пробелов): ").strip()
+                session.print("\n  📝 СОЗДАНИЕ АККАУНТА")
+                name = yield from ask_name(session, "  Имя (латиница, без пробелов): ")
                 if not name:
-                    print("  ⚠️ Введите имя!")
+                    session.print("  ⚠️ Введите имя!")
                     continue
                 
-                if game_manager.account_exists(name):
-                    print("  ⚠️ Такой аккаунт уже существует!")
+                if session.manager.account_exists(name):
+                    session.print("  ⚠️ Такой аккаунт уже существует!")
                     continue
                 
-                password = input("  Пароль (минимум 3 символа): ").strip()
+                password = (yield Prompt("  Пароль (минимум 3 символа): ", PASSWORD)).strip()
                 if len(password) < 3:
-                    print("  ⚠️ Пароль слишком короткий!")
+                    session.print("  ⚠️ Пароль слишком короткий!")
                     continue
                 
-                password2 = input("  Повторите пароль: ").strip()
+                password2 = (yield Prompt("  Повторите пароль: ", PASSWORD)).strip()
                 if password != password2:
-                    print("  ⚠️ Пароли не совпадают!")
+                    session.print("  ⚠️ Пароли не совпадают!")
                     continue
                 
-                if game_manager.create_account(name, password):
-                    print(f"\n  ✅ Аккаунт «{name}» успешно создан!")
+                if (yield from session.manager.create_account(name, password)):
+                    LOGINS.inc("create", "ok")
+                    session.print(f"\n  ✅ Аккаунт «{name}» успешно создан!")
+                    show_resume_token(session)
                     return True
                 else:
-                    print("  ❌ Ошибка создания аккаунта!")
+                    LOGINS.inc("create", "fail")
+                    session.print("  ❌ Ошибка создания аккаунта!")
             
             elif choice == 3:
+                token = (yield Prompt("\n  Код возврата: ")).strip()
+                if session.account and token_name(token) != session.account:
+                    session.print("  ❌ Код выдан другому аккаунту!")
+                elif session.resume(token):
+                    LOGINS.inc("resume", "ok")
+                    session.print(f"\n  ✅ С возвращением, {session.manager.account_name}!")
+                    return True
+                else:
+                    LOGINS.inc("resume", "fail")
+                    session.print("  ❌ Код недействителен или устарел!")
+            
+            elif choice == 4:
                 return False
             
             else:
-                print("  ⚠️ Выберите 1, 2 или 3")
+                session.print("  ⚠️ Выберите 1, 2, 3 или 4")
         
         except ValueError:
-            print("  ⚠️ Введите число!")
+            session.print("  ⚠️ Введите число!")
 
 
-def main_menu() -> str:
+def main_menu(session: Session) -> Flow[str]:
     """Главное меню игры."""
     
-    print("\n" + "═" * 50)
-    print(f"  🏠 ГЛАВНОЕ МЕНЮ")
-    print(f"  Игрок: {game_manager.account_name}")
-    print("═" * 50)
+    session.print("\n" + "═" * 50)
+    session.print(f"  🏠 ГЛАВНОЕ МЕНЮ")
+    session.print(f"  Игрок: {session.manager.account_name}")
+    session.print("═" * 50)
     
     options = []
     actions = []
@@ -115,13 +162,16 @@ def main_menu() -> str:
     options.append("🎮 Новая игра")
     actions.append("new")
     
-    if game_manager.has_saved_game():
+    if session.manager.has_saved_game():
         options.append("📂 Продолжить сохранённую игру")
         actions.append("continue")
     
     options.append("📊 Статистика прохождений")
     actions.append("stats")
     
+    options.append("🏅 Таблица лидеров")
+    actions.append("leaders")
+    
     options.append("❓ Как играть")
     actions.append("help")
     
@@ -129,23 +179,23 @@ def main_menu() -> str:
     actions.append("quit")
     
     for i, opt in enumerate(options, 1):
-        print(f"\n  {i}. {opt}")
+        session.print(f"\n  {i}. {opt}")
     
-    print("\n" + "═" * 50)
+    session.print("\n" + "═" * 50)
     
     while True:
         try:
-            choice = int(input("\n  Выберите: "))
+            choice = int((yield Prompt("\n  Выберите: ", MENU)))
             if 1 <= choice <= len(options):
                 return actions[choice - 1]
-            print(f"  ⚠️ Выберите от 1 до {len(options)}")
+            session.print(f"  ⚠️ Выберите от 1 до {len(options)}")
         except ValueError:
-            print("  ⚠️ Введите число!")
+            session.print("  ⚠️ Введите число!")
 
 
-def show_help():
+def show_help(session: Session) -> Flow[None]:
     """Справка по игре."""
-    print("""
+    session.print("""
 ╔══════════════════════════════════════════════════════════════╗
 ║                      📖 КАК ИГРАТЬ                           ║
 ╠══════════════════════════════════════════════════════════════╣
@@ -182,39 +232,73 @@ def show_help():
 ║                                                              ║
 ╚══════════════════════════════════════════════════════════════╝
 """)
-    input("\n  [Enter — вернуться в меню]")
+    yield Prompt("\n  [Enter — вернуться в меню]", PAUSE)
+
+
+def show_leaderboard(session: Session) -> Flow[None]:
+    """Таблица лидеров и общая статистика всех игроков."""
+    # Только что законченная игра может ещё ждать фоновой записи
+    leaderboard.flush()
+    data = leaderboard.load()
+    
+    session.print("\n" + "═" * 50)
+    session.print("  🏅 ТАБЛИЦА ЛИДЕРОВ")
+    session.print("═" * 50)
+    
+    top = leaderboard.top(10)
+    if not top:
+        session.print("\n  Пока никто не завершил ни одной игры.")
+    for place, (name, unique, wins) in enumerate(top, 1):
+        session.print(f"\n  {place:>2}. {name} — пройдено: {unique}, побед: {wins}")
+    
+    def rate(counters):
+        games = counters.get("games", 0)
+        return f"{counters.get('victories', 0) * 100 // games}% из {games}" if games else "—"
+    
+    session.print("\n  📈 ПРОХОЖДЕНИЯ ПО КЛАССАМ:")
+    for class_id, class_name in CLASS_NAMES.items():
+        session.print(f"    {class_name}: {rate(data['classes'].get(class_id, {}))}")
+    
+    session.print("\n  🧭 ПРОХОЖДЕНИЯ ПО ПУТЯМ:")
+    for path, path_name in PATH_NAMES.items():
+        session.print(f"    {path_name}: {rate(data['paths'].get(path, {}))}")
+    
+    session.print(f"\n  🎮 Всего игр: {data['total_games']}, побед: {data['victories']}, "
+          f"поражений: {data['defeats']}")
+    session.print("═" * 50)
+    yield Prompt("\n  [Enter — вернуться в меню]", PAUSE)
 
 
-def select_class() -> str:
+def select_class(session: Session) -> Flow[str]:
     """Выбор класса персонажа."""
     
-    print("\n" + "═" * 60)
-    print("  🎭 ВЫБОР ПЕРСОНАЖА")
-    print("═" * 60)
+    session.print("\n" + "═" * 60)
+    session.print("  🎭 ВЫБОР ПЕРСОНАЖА")
+    session.print("═" * 60)
     
-    print("""
+    session.print("""
     Три героя. Три судьбы. Три пути к сокровищу.
     Кем ты станешь?
 """)
     
-    print("  1. 🤪 ИВАН-ДУРАК")
-    print("     Младший сын. Удача и доброта — его оружие.")
-    print("     HP: 120 | Сила: 14 | Ловкость: 18")
+    session.print("  1. 🤪 ИВАН-ДУРАК")
+    session.print("     Младший сын. Удача и доброта — его оружие.")
+    session.print("     HP: 120 | Сила: 14 | Ловкость: 18")
     
-    print("\n  2. ✨ ВАСИЛИСА ПРЕМУДРАЯ")
-    print("     Дочь колдуна. Ищет способ спасти отца.")
-    print("     HP: 100 | MP: 80 | Интеллект: 25")
+    session.print("\n  2. ✨ ВАСИЛИСА ПРЕМУДРАЯ")
+    session.print("     Дочь колдуна. Ищет способ спасти отца.")
+    session.print("     HP: 100 | MP: 80 | Интеллект: 25")
     
-    print("\n  3. 🗡️ КОЩЕЕВ СЛУГА")
-    print("     Бывший раб. Знает тайные пути к свободе.")
-    print("     HP: 110 | Сила: 18 | Ловкость: 15")
+    session.print("\n  3. 🗡️ КОЩЕЕВ СЛУГА")
+    session.print("     Бывший раб. Знает тайные пути к свободе.")
+    session.print("     HP: 110 | Сила: 18 | Ловкость: 15")
     
-    print("\n  4. 📖 Подробное описание классов")
-    print("  5. ↩️ Вернуться в главное меню")
+    session.print("\n  4. 📖 Подробное описание классов")
+    session.print("  5. ↩️ Вернуться в главное меню")
     
     while True:
         try:
-            choice = int(input("\n  Выберите персонажа (1-5): "))
+            choice = int((yield Prompt("\n  Выберите персонажа (1-5): ", MENU, range(1, 6))))
             
             if choice == 1:
                 return "иван"
@@ -223,25 +307,25 @@ def select_class() -> str:
             elif choice == 3:
                 return "слуга"
             elif choice == 4:
-                print(get_class_description("иван"))
-                input("\n  [Enter — далее]")
-                print(get_class_description("василиса"))
-                input("\n  [Enter — далее]")
-                print(get_class_description("слуга"))
-                input("\n  [Enter — вернуться к выбору]")
+                session.print(get_class_description("иван"))
+                yield Prompt("\n  [Enter — далее]", PAUSE)
+                session.print(get_class_description("василиса"))
+                yield Prompt("\n  [Enter — далее]", PAUSE)
+                session.print(get_class_description("слуга"))
+                yield Prompt("\n  [Enter — вернуться к выбору]", PAUSE)
             elif choice == 5:
                 return ""
             else:
-                print("  ⚠️ Выберите от 1 до 5")
+                session.print("  ⚠️ Выберите от 1 до 5")
         except ValueError:
-            print("  ⚠️ Введите число!")
+            session.print("  ⚠️ Введите число!")
 
 
-def show_intro(hero):
+def show_intro(session: Session, hero) -> Flow[None]:
     """Вступительная история для персонажа."""
     
     if isinstance(hero, Ivan):
-        print("""
+        session.print("""
 ╔══════════════════════════════════════════════════════════════╗
 ║                                                              ║
 ║               🤪 ИСТОРИЯ ИВАНА-ДУРАКА                        ║
@@ -267,7 +351,7 @@ def show_intro(hero):
 """)
     
     elif isinstance(hero, Vasilisa):
-        print("""
+        session.print("""
 ╔══════════════════════════════════════════════════════════════╗
 ║                                                              ║
 ║             ✨ ИСТОРИЯ ВАСИЛИСЫ ПРЕМУДРОЙ                    ║
@@ -291,7 +375,7 @@ def show_intro(hero):
 """)
     
     else:  # Слуга
-        print("""
+        session.print("""
 ╔══════════════════════════════════════════════════════════════╗
 ║                                                              ║
 ║               🗡️ ИСТОРИЯ КОЩЕЕВА СЛУГИ                       ║
@@ -316,49 +400,54 @@ def show_intro(hero):
 ╚══════════════════════════════════════════════════════════════╝
 """)
     
-    input("\n  [Enter — начать приключение]")
+    yield Prompt("\n  [Enter — начать приключение]", PAUSE)
 
 
-def game_loop(hero) -> str:
+def game_loop(session: Session, hero) -> Flow[str]:
     """
     Основной игровой цикл.
     Возвращает: "new_game", "main_menu", "quit", "continue"
     """
     
-    game_manager.hero = hero
-    game_manager.sync_from_hero(hero)
+    session.hero = hero
+    session.manager.sync_from_hero(hero)
     
     # Начальная или сохранённая локация
-    current_location = game_manager.current_state.current_location or "opushka"
+    current_location = session.manager.current_state.current_location or "opushka"
     
     while True:
         try:
             # Получаем локацию
             location = get_location(current_location)
             if not location:
-                print(f"  ⚠️ Ошибка: локация «{current_location}» не найдена!")
+                session.print(f"  ⚠️ Ошибка: локация «{current_location}» не найдена!")
                 current_location = "opushka"
                 continue
             
             # Обновляем текущую локацию в состоянии
-            game_manager.current_state.current_location = current_location
-            game_manager.sync_from_hero(hero)
+            session.manager.current_state.current_location = current_location
+            session.manager.sync_from_hero(hero)
+            session.manager.push_history(f"{location.name} (HP: {hero.hp}/{hero.max_hp})")
+            session.checkpoint()
             
             # Входим в локацию
-            result = location.enter(hero)
+            LOCATION_ENTRIES.inc(location.id)
+            result = yield from tracing.trace_flow(f"{type(location).__name__}.enter",
+                                                   location.enter(session))
             
             # Синхронизируем состояние после событий в локации
-            game_manager.sync_from_hero(hero)
+            session.manager.sync_from_hero(hero)
             
             # Проверяем результат
             if result.game_over:
-                # Победа или поражение
-                action = game_manager.game_over_menu(result.victory, result.path_taken)
+                # Победа или поражение; итог пишется в аккаунт
+                session.manager.journal.taint()
+                action = yield from session.manager.game_over_menu(result.victory, result.path_taken)
                 
                 if action == "continue":
                     # Загрузили сохранение — перезапускаем цикл
-                    current_location = game_manager.current_state.current_location
-                    game_manager.sync_to_hero(hero)
+                    current_location = session.manager.current_state.current_location
+                    session.manager.sync_to_hero(hero)
                     continue
                 elif action == "new_game":
                     return "new_game"
@@ -369,8 +458,8 @@ def game_loop(hero) -> str:
             
             # Перезагрузка текущей локации (после загрузки)
             if result.reload_location:
-                current_location = game_manager.current_state.current_location
-                game_manager.sync_to_hero(hero)
+                current_location = session.manager.current_state.current_location
+                session.manager.sync_to_hero(hero)
                 continue
             
             # Переход к следующей локации
@@ -387,54 +476,54 @@ def game_loop(hero) -> str:
             raise
         
         except KeyboardInterrupt:
-            print("\n\n  ⚠️ Игра прервана!")
-            if game_manager.can_save():
-                print("  💾 Сохранить прогресс? (y/n)")
+            session.print("\n\n  ⚠️ Игра прервана!")
+            if session.manager.can_save():
+                session.print("  💾 Сохранить прогресс? (y/n)")
                 try:
-                    if input("  ").lower() == 'y':
-                        game_manager.save_game()
-                        print("  ✅ Игра сохранена!")
+                    if (yield Prompt("  ")).lower() == 'y':
+                        session.manager.save_game()
+                        session.print("  ✅ Игра сохранена!")
                 except (KeyboardInterrupt, EOFError):
                     pass
             return "main_menu"
 
 
-def continue_game() -> str:
+def continue_game(session: Session) -> Flow[str]:
     """Продолжить сохранённую игру."""
     
-    if not game_manager.load_game():
-        print("  ❌ Ошибка загрузки сохранения!")
-        input("\n  [Enter — вернуться]")
+    if not session.manager.load_game():
+        session.print("  ❌ Ошибка загрузки сохранения!")
+        yield Prompt("\n  [Enter — вернуться]", PAUSE)
         return "main_menu"
     
-    state = game_manager.current_state
+    state = session.manager.current_state
     if not state or not state.class_id:
-        print("  ❌ Сохранение повреждено!")
-        input("\n  [Enter — вернуться]")
+        session.print("  ❌ Сохранение повреждено!")
+        yield Prompt("\n  [Enter — вернуться]", PAUSE)
         return "main_menu"
     
     # Создаём героя нужного класса
     hero = create_hero(state.class_id)
     # Загружаем в него сохранённое состояние
-    game_manager.sync_to_hero(hero)
+    session.manager.sync_to_hero(hero)
     
-    print(f"\n  ✅ Игра загружена!")
-    print(f"\n  {hero.CLASS_ICON} {hero.name}")
-    print(f"  ❤️ HP: {hero.hp}/{hero.max_hp}")
+    session.print(f"\n  ✅ Игра загружена!")
+    session.print(f"\n  {hero.CLASS_ICON} {hero.name}")
+    session.print(f"  ❤️ HP: {hero.hp}/{hero.max_hp}")
     if hasattr(hero, 'mp'):
-        print(f"  💙 MP: {hero.mp}/{hero.max_mp}")
-    print(f"  📍 Локация: {state.current_location}")
-    print(f"  🔑 Ключей: {hero.count_keys()}/3")
+        session.print(f"  💙 MP: {hero.mp}/{hero.max_mp}")
+    session.print(f"  📍 Локация: {state.current_location}")
+    session.print(f"  🔑 Ключей: {hero.count_keys()}/3")
     
-    input("\n  [Enter — продолжить приключение]")
+    yield Prompt("\n  [Enter — продолжить приключение]", PAUSE)
     
-    return game_loop(hero)
+    return (yield from game_loop(session, hero))
 
 
-def new_game() -> str:
+def new_game(session: Session) -> Flow[str]:
     """Начать новую игру."""
     
-    class_id = select_class()
+    class_id = yield from select_class(session)
     if not class_id:
         return "main_menu"
     
@@ -442,65 +531,190 @@ def new_game() -> str:
     hero = create_hero(class_id)
     
     # Инициализируем состояние игры
-    game_manager.new_game(class_id)
-    game_manager.sync_from_hero(hero)
+    session.manager.new_game(class_id)
+    session.manager.sync_from_hero(hero)
     
     # Показываем вступление
-    show_intro(hero)
+    yield from show_intro(session, hero)
     
     # Запускаем игровой цикл
-    return game_loop(hero)
+    return (yield from game_loop(session, hero))
 
 
-def main():
-    """Главная функция — точка входа."""
+def resume_game(session: Session) -> Flow[str]:
+    """Вернуться по коду в игру, прерванную разрывом связи.
+    
+    Поток игры не сохраняется — локация, в которой был герой,
+    начинается заново с его нынешним состоянием.
+    """
+    hero = session.hero
+    session.print(f"\n  ↩️ Игра продолжается: {hero.CLASS_ICON} {hero.name}, "
+                  f"HP {hero.hp}/{hero.max_hp}")
+    yield Prompt("\n  [Enter — продолжить приключение]", PAUSE)
+    return (yield from game_loop(session, hero))
+
+
+def play(session: Session) -> Flow[None]:
+    """Игра одной сессии: вход, главное меню, выход."""
     
-    clear_screen()
-    show_title()
+    clear_screen(session)
+    show_title(session)
     
     # Вход в систему
-    if not login_menu():
-        print("\n  👋 До свидания!")
+    if not (yield from login_menu(session)):
+        session.print("\n  👋 До свидания!")
         return
     
+    # Возврат по коду посреди игры — сразу в игру, а не в меню
+    yield from main_loop(session, resume=True)
+
+
+def rejoin(session: Session) -> Flow[None]:
+    """Поток сессии, поднятой из снимка: с контрольной точки журнала.
+    
+    Ответы из журнала подаёт вызывающий — они приводят поток к тому же
+    приглашению, на котором сессию выгрузили.
+    """
+    mgr = session.manager
+    checkpoint = mgr.journal.state
+    if checkpoint is not None:
+        mgr.current_state = GameState.from_dict(checkpoint)
+        mgr.sync_to_hero(create_hero(mgr.current_state.class_id))
+    else:
+        session.hero = None
+    yield from main_loop(session, resume=False)
+
+
+def main_loop(session: Session, resume: bool) -> Flow[None]:
+    """Игра после входа: прерванная игра (если есть), главное меню, выход.
+    
+    resume — вернуть в игру с напоминанием, где остановились; без него
+    игра идёт сразу с локации (повтор по журналу).
+    """
+    result = ""
+    if session.hero is not None:
+        if resume:
+            result = yield from resume_game(session)
+        else:
+            result = yield from game_loop(session, session.hero)
+        # Игра окончена — героя больше нет, возвращаться некуда
+        session.hero = None
+    
     # Главный цикл меню
-    while True:
-        action = main_menu()
+    while result != "quit":
+        session.checkpoint()
+        action = yield from main_menu(session)
         
         if action == "new":
-            result = new_game()
+            result = yield from new_game(session)
+            session.hero = None
             if result == "quit":
                 break
             # Если "new_game" — продолжаем цикл меню
             # Если "main_menu" — тоже продолжаем
         
         elif action == "continue":
-            result = continue_game()
+            result = yield from continue_game(session)
+            session.hero = None
             if result == "quit":
                 break
         
         elif action == "stats":
-            game_manager.show_stats()
-            input("\n  [Enter — вернуться]")
+            session.manager.show_stats()
+            yield Prompt("\n  [Enter — вернуться]", PAUSE)
+        
+        elif action == "leaders":
+            yield from show_leaderboard(session)
         
         elif action == "help":
-            show_help()
+            yield from show_help(session)
         
         elif action == "quit":
             break
     
     # Предложение сохраниться перед выходом
-    if game_manager.can_save():
-        print("\n  💾 Сохранить игру перед выходом? (y/n)")
+    if session.manager.can_save():
+        session.print("\n  💾 Сохранить игру перед выходом? (y/n)")
         try:
-            if input("  ").lower() == 'y':
-                game_manager.save_game()
-                print("  ✅ Сохранено!")
+            if (yield Prompt("  ")).lower() == 'y':
+                session.manager.save_game()
+                if session.manager.flush_saves():
+                    session.print("  ✅ Сохранено!")
+                else:
+                    session.print("  ❌ Ошибка сохранения!")
         except (KeyboardInterrupt, EOFError):
             pass
     
-    print("\n  👋 Спасибо за игру! До новых встреч!")
+    # Дожидаемся фоновой записи статистики
+    session.manager.flush_saves()
+    
+    session.print("\n  👋 Спасибо за игру! До новых встреч!")
+
+
+def main(session: Optional[Session] = None, argv=None):
+    """Главная функция — точка входа."""
+    
+    parser = argparse.ArgumentParser(description="Тайна Заповедного Леса")
+    parser.add_argument("--profile", nargs="?", const=PROFILE_FILE, metavar="FILE",
+                        help="замерить участки игры и записать стеки для flame graph")
+    parser.add_argument("--seed", type=int, help="зерно случайных событий")
+    parser.add_argument("--script", metavar="FILE",
+                        help="сыграть по записанным ответам без пауз и очистки экрана")
+    parser.add_argument("--golden", metavar="FILE", help="сверить вывод сценария с эталоном")
+    parser.add_argument("--update-golden", action="store_true", help="перезаписать эталон")
+    parser.add_argument("--record", metavar="FILE", help="записать ответы игрока в сценарий")
+    args = parser.parse_args(argv or [])
+    
+    if args.profile:
+        tracing.enable()
+    try:
+        if args.script:
+            return run_script_mode(args)
+        
+        if args.seed is not None:
+            random.seed(args.seed)
+        if session is None:
+            # Консоль процесса — только для игры из терминала
+            session = Session(io=ConsoleIO())
+        flow = play(session)
+        answers = []
+        if args.record:
+            from replay import record_answers
+            flow = record_answers(flow, answers)
+        try:
+            run_flow(session.io, tracing.trace_flow("play", flow))
+        finally:
+            # Вывод после последнего ввода ещё в буфере канала
+            session.io.close()
+            if args.record:
+                from replay import write_script
+                meta = {"seed": args.seed} if args.seed is not None else {}
+                write_script(args.record, answers, meta)
+        return 0
+    finally:
+        if args.profile:
+            tracing.dump(args.profile)
+
+
+def run_script_mode(args) -> int:
+    """--script: прогон по сценарию, при --golden — сверка с эталоном."""
+    from replay import read_script, run_script, check_golden
+    
+    script = read_script(args.script)
+    seed = args.seed if args.seed is not None else script.seed
+    transcript = run_script(script.answers, seed)
+    
+    if not args.golden:
+        sys.stdout.write(transcript)
+        return 0
+    report = check_golden(transcript, args.golden, args.update_golden)
+    if report:
+        print(f"  ❌ {args.script}: вывод не совпал с {args.golden}")
+        print(report)
+        return 1
+    print(f"  ✅ {args.script}: {'эталон записан' if args.update_golden else 'совпадает с эталоном'}")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main(argv=sys.argv[1:]))
@@ -0,0 +1,113 @@
+
+import os
+import hmac
+import base64
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+
+# Параметры scrypt. Изменение параметров не ломает старые хэши:
+# они проверяются со своими параметрами и пересчитываются при входе.
+SCRYPT_N = int(os.environ.get("TAJNA_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.environ.get("TAJNA_SCRYPT_R", "8"))
+SCRYPT_P = int(os.environ.get("TAJNA_SCRYPT_P", "1"))
+SALT_SIZE = 16
+HASH_SIZE = 32
+
+# Потоки для хэширования и длина очереди к ним
+HASH_WORKERS = int(os.environ.get("TAJNA_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE = int(os.environ.get("TAJNA_HASH_QUEUE", "64"))
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p, dklen=HASH_SIZE)
+
+
+def hash_password(password: str) -> str:
+    """Хэш в формате scrypt$n$r$p$соль$хэш. Медленный — вызывать через пул."""
+    salt = os.urandom(SALT_SIZE)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password: str, stored: str) -> Tuple[bool, bool]:
+    """Проверить пароль. Возвращает (верен, нужно пересчитать хэш)."""
+    if stored.startswith("scrypt$"):
+        try:
+            _, n, r, p, salt, digest = stored.split("$")
+            n, r, p = int(n), int(r), int(p)
+            expected = _unb64(digest)
+            actual = _scrypt(password, _unb64(salt), n, r, p)
+        except ValueError:
+            return False, False
+        ok = hmac.compare_digest(actual, expected)
+        return ok, ok and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+    # Старый формат: несолёный SHA-256 в hex
+    legacy = hashlib.sha256(password.encode('utf-8')).hexdigest()
+    ok = hmac.compare_digest(legacy, stored)
+    return ok, ok
+
+
+class PasswordHasher:
+    """Пул потоков для хэширования паролей с ограниченной очередью.
+
+    hashlib.scrypt отпускает GIL, поэтому вход других игроков
+    не ждёт, пока считается чужой пароль. Если очередь заполнена,
+    отправитель ждёт свободного места.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_size: int = HASH_QUEUE):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pid = 0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            # После fork() потоки пула в дочернем процессе не существуют
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix="password-hasher")
+                self._pid = os.getpid()
+            return self._pool
+
+    def submit(self, fn, *args) -> Future:
+        self._slots.acquire()
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash_async(self, password: str) -> Future:
+        """Future с хэшем. В потоке игры — yield from flow.wait(...)."""
+        return self.submit(hash_password, password)
+
+    def verify_async(self, password: str, stored: str) -> Future:
+        """Future с (верен, нужно пересчитать хэш)."""
+        return self.submit(verify_password, password, stored)
+
+    def hash(self, password: str) -> str:
+        """Блокирующий вариант — для консольных инструментов."""
+        return self.hash_async(password).result()
+
+    def verify(self, password: str, stored: str) -> Tuple[bool, bool]:
+        return self.verify_async(password, stored).result()
+
+
+password_hasher = PasswordHasher()
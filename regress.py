@@ -0,0 +1,171 @@
+
+import os
+import sys
+import glob
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from game_state import CLASS_NAMES, PATH_NAMES
+
+
+# Каталог корпуса: сценарии NAME.script и эталоны NAME.golden рядом с ними
+CORPUS_DIR = os.environ.get("TAJNA_REGRESS_DIR", "regress")
+SCRIPT_EXT = ".script"
+GOLDEN_EXT = ".golden"
+
+# Пути, доступные классу: тайная тропа открыта только слуге Кощея
+CLASS_PATHS = {
+    "иван": ("вода", "дым", "тьма"),
+    "василиса": ("вода", "дым", "тьма"),
+    "слуга": ("вода", "дым", "тьма", "тайный"),
+}
+
+
+@dataclass
+class CaseResult:
+    """Итог одного сценария корпуса."""
+
+    name: str
+    ok: bool
+    report: str = ""
+    seconds: float = 0.0
+    # Пройденные концовки: (класс, путь)
+    victories: List[Tuple[str, str]] = field(default_factory=list)
+    defeats: int = 0
+
+
+def golden_path(script_path: str) -> str:
+    return os.path.splitext(script_path)[0] + GOLDEN_EXT
+
+
+def find_scripts(paths: List[str]) -> List[str]:
+    """Сценарии из файлов и каталогов (с подкаталогами)."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(glob.glob(os.path.join(path, "**", "*" + SCRIPT_EXT), recursive=True))
+        else:
+            found.append(path)
+    return sorted(set(found))
+
+
+def run_case(script_path: str, update: bool = False) -> CaseResult:
+    """Прогнать сценарий и сверить с эталоном. Выполняется в процессе пула."""
+    from replay import read_script, play_script, check_golden
+
+    started = time.perf_counter()
+    try:
+        script = read_script(script_path)
+        transcript, session = play_script(script.answers, script.seed)
+        report = check_golden(transcript, golden_path(script_path), update) or ""
+    except Exception as e:
+        return CaseResult(script_path, False, f"  💥 {type(e).__name__}: {e}",
+                          time.perf_counter() - started)
+
+    stats = session.manager.stats
+    victories = [(class_id, path) for class_id, paths in stats["victories"].items() for path in paths]
+    return CaseResult(script_path, not report, report, time.perf_counter() - started,
+                      victories, stats["defeats"])
+
+
+def _cost(script_path: str) -> int:
+    """Примерная длительность сценария — число строк."""
+    try:
+        with open(script_path, 'rb') as f:
+            return f.read().count(b"\n")
+    except IOError:
+        return 0
+
+
+def run_corpus(scripts: List[str], jobs: int, update: bool = False,
+               fail_fast: bool = False) -> List[CaseResult]:
+    """Прогнать сценарии на пуле процессов, длинные — первыми."""
+    order = sorted(scripts, key=_cost, reverse=True)
+    results: List[CaseResult] = []
+    if jobs <= 1:
+        for path in order:
+            results.append(run_case(path, update))
+            if fail_fast and not results[-1].ok:
+                break
+        return results
+
+    # spawn: у каждого процесса свои кэши и каталог сохранений
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context) as pool:
+        futures = [pool.submit(run_case, path, update) for path in order]
+        for future in as_completed(futures):
+            results.append(future.result())
+            if fail_fast and not results[-1].ok:
+                for other in futures:
+                    other.cancel()
+                break
+    return results
+
+
+def coverage(results: List[CaseResult]) -> Dict[Tuple[str, str], int]:
+    """Сколько сценариев дошли до победы для каждой пары класс+путь."""
+    counts = {(class_id, path): 0 for class_id, paths in CLASS_PATHS.items() for path in paths}
+    for result in results:
+        for pair in set(result.victories):
+            if pair in counts:
+                counts[pair] += 1
+    return counts
+
+
+def report(results: List[CaseResult], elapsed: float, out=None) -> None:
+    out = out or sys.stdout
+    results = sorted(results, key=lambda r: r.name)
+    failed = [r for r in results if not r.ok]
+    for result in failed:
+        out.write(f"\n  ❌ {result.name}\n{result.report}\n")
+
+    out.write("\n  🗺️ Покрытие концовок (сценариев с победой):\n")
+    counts = coverage(results)
+    for class_id, paths in CLASS_PATHS.items():
+        cells = []
+        for path in paths:
+            count = counts[(class_id, path)]
+            cells.append(f"{PATH_NAMES[path]}: {count if count else '—'}")
+        out.write(f"    {CLASS_NAMES[class_id]:<26}" + "  ".join(cells) + "\n")
+
+    busy = sum(r.seconds for r in results)
+    out.write(f"\n  Сценариев: {len(results)}, расхождений: {len(failed)},"
+              f" {elapsed:.1f} с (последовательно было бы {busy:.1f} с)\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Сверка сценариев корпуса с эталонными выводами")
+    parser.add_argument("paths", nargs="*", default=[CORPUS_DIR],
+                        help=f"сценарии *{SCRIPT_EXT} или каталоги с ними")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="процессов")
+    parser.add_argument("-x", "--fail-fast", action="store_true", help="остановиться на первом расхождении")
+    parser.add_argument("--update", action="store_true", help="перезаписать эталоны")
+    parser.add_argument("--require-coverage", action="store_true",
+                        help="ошибка, если какая-то пара класс+путь не пройдена")
+    args = parser.parse_args(argv)
+
+    scripts = find_scripts(args.paths)
+    if not scripts:
+        print(f"  Нет сценариев *{SCRIPT_EXT} в {', '.join(args.paths)}", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    results = run_corpus(scripts, args.jobs, args.update, args.fail_fast)
+    report(results, time.perf_counter() - started)
+
+    if any(not r.ok for r in results):
+        return 1
+    if args.require_coverage and not all(coverage(results).values()):
+        print("  ⚠️ Не все концовки покрыты сценариями", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
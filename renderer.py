@@ -0,0 +1,120 @@
+
+import os
+import sys
+from typing import List, Optional
+
+
+# Строка состояния вверху экрана (0 — выключить, экран как раньше)
+STATUS_BAR = os.environ.get("TAJNA_STATUS_BAR", "1") != "0"
+
+# Ширина поля строки состояния: у каждого поля свой столбец
+FIELD_WIDTH = 16
+
+ESC = "\033"
+SAVE_CURSOR = ESC + "7"
+RESTORE_CURSOR = ESC + "8"
+CLEAR_SCREEN = ESC + "[2J" + ESC + "[H"
+RESET_REGION = ESC + "[r"
+CLEAR_LINE = ESC + "[2K"
+REVERSE = ESC + "[7m"
+NORMAL = ESC + "[0m"
+
+
+def move(row: int, column: int = 1) -> str:
+    return f"{ESC}[{row};{column}H"
+
+
+def hero_status(hero) -> List[str]:
+    """Поля строки состояния для героя: имя, HP, MP (если есть), ключи."""
+    fields = [hero.name, f"HP {hero.hp}/{hero.max_hp}"]
+    if hasattr(hero, 'mp'):
+        fields.append(f"MP {hero.mp}/{hero.max_mp}")
+    fields.append(f"Ключи {hero.count_keys()}/3")
+    return fields
+
+
+class Renderer:
+    """Экран терминала по ANSI: очистка без внешней команды и строка
+    состояния в первой строке.
+
+    Текст игры прокручивается ниже строки состояния (область прокрутки
+    со второй строки), поэтому строка остаётся на месте. Перерисовываются
+    только изменившиеся поля: каждое занимает свои FIELD_WIDTH столбцов.
+    """
+
+    def __init__(self, status_bar: bool = STATUS_BAR):
+        self.status_bar = status_bar
+        # Показанные поля; None — строку надо нарисовать целиком
+        self._shown: Optional[List[str]] = None
+        # Область прокрутки задана (после первой очистки экрана)
+        self._active = False
+
+    def clear(self) -> str:
+        """Очистить экран и подготовить строку состояния."""
+        if not self.status_bar:
+            return CLEAR_SCREEN
+        self._shown = None
+        self._active = True
+        # Область прокрутки — со второй строки до конца экрана
+        return RESET_REGION + CLEAR_SCREEN + ESC + "[2r" + move(2)
+
+    def update(self, fields: Optional[List[str]]) -> str:
+        """Управляющие последовательности, обновляющие строку состояния."""
+        if not self._active:
+            return ""
+        fields = fields or []
+        if fields == self._shown:
+            return ""
+
+        parts = [SAVE_CURSOR]
+        if self._shown is None or len(fields) != len(self._shown):
+            parts.append(move(1) + CLEAR_LINE)
+            changed = range(len(fields))
+        else:
+            changed = [i for i, (old, new) in enumerate(zip(self._shown, fields)) if old != new]
+        for i in changed:
+            parts.append(move(1, 1 + i * FIELD_WIDTH) + REVERSE + self._cell(fields[i]) + NORMAL)
+        parts.append(RESTORE_CURSOR)
+        self._shown = list(fields)
+        return "".join(parts)
+
+    @staticmethod
+    def _cell(text: str) -> str:
+        text = f" {text}"
+        return text[:FIELD_WIDTH - 1].ljust(FIELD_WIDTH - 1) + " "
+
+    def reset(self) -> str:
+        """Вернуть терминал в обычный режим (при выходе из игры)."""
+        if not self._active:
+            return ""
+        self._active = False
+        self._shown = None
+        # Сброс области прокрутки переводит курсор в начало — возвращаем его
+        return SAVE_CURSOR + move(1) + CLEAR_LINE + RESET_REGION + RESTORE_CURSOR
+
+
+def enable_ansi() -> bool:
+    """Включить ANSI в консоли Windows. На остальных системах уже есть."""
+    if os.name != 'nt':
+        return True
+    try:
+        import ctypes
+        kernel = ctypes.windll.kernel32
+        handle = kernel.GetStdHandle(-11)
+        mode = ctypes.c_uint32()
+        if not kernel.GetConsoleMode(handle, ctypes.byref(mode)):
+            return False
+        # ENABLE_VIRTUAL_TERMINAL_PROCESSING
+        return bool(kernel.SetConsoleMode(handle, mode.value | 0x0004))
+    except (AttributeError, OSError):
+        return False
+
+
+def terminal_renderer() -> Optional[Renderer]:
+    """Renderer для терминала процесса или None, если вывод не в терминал."""
+    try:
+        if not sys.stdout.isatty():
+            return None
+    except (AttributeError, ValueError):
+        return None
+    return Renderer() if enable_ansi() else None
@@ -0,0 +1,158 @@
+
+import os
+import io
+import random
+import shutil
+import tempfile
+from typing import Dict, Generator, List, Optional, Tuple
+
+import storage
+import main as game
+from channels import HeadlessIO, ScriptSource
+from session import Session
+from flow import Flow, PAUSE, WAIT, run_flow
+from game_state import account_index
+from resume import resume_cache
+from leaderboard import leaderboard
+
+
+# Постоянные секрет и время кодов возврата: вывод не зависит от запуска
+SCRIPT_SECRET = b"tajna-script"
+SCRIPT_EPOCH = 1_700_000_000
+
+
+class Script:
+    """Записанные ответы игрока и заголовок (# ключ: значение)."""
+
+    def __init__(self, answers: List[str], meta: Optional[Dict[str, str]] = None, path: str = ""):
+        self.answers = answers
+        self.meta = meta or {}
+        self.path = path
+
+    @property
+    def seed(self) -> int:
+        return int(self.meta.get("seed", 0))
+
+
+def read_script(path: str) -> Script:
+    """Прочитать сценарий: по ответу в строке, строки с # — заголовок."""
+    answers: List[str] = []
+    meta: Dict[str, str] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if line.startswith("#"):
+                key, sep, value = line[1:].partition(":")
+                if sep:
+                    meta[key.strip()] = value.strip()
+                continue
+            answers.append(line)
+    return Script(answers, meta, path)
+
+
+def write_script(path: str, answers: List[str], meta: Optional[Dict[str, str]] = None) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        for key, value in (meta or {}).items():
+            f.write(f"# {key}: {value}\n")
+        for answer in answers:
+            f.write(answer + "\n")
+
+
+def record_answers(flow: Flow, answers: List[str]) -> Generator:
+    """Обернуть поток: ответы на всё, кроме пауз, дописываются в answers."""
+    try:
+        prompt = next(flow)
+        while True:
+            try:
+                answer = yield prompt
+            except GeneratorExit:
+                flow.close()
+                raise
+            except BaseException as e:
+                prompt = flow.throw(e)
+                continue
+            if prompt.kind not in (PAUSE, WAIT):
+                answers.append(answer)
+            prompt = flow.send(answer)
+    except StopIteration as stop:
+        return stop.value
+
+
+def run_script(answers: List[str], seed: int = 0, save_dir: Optional[str] = None) -> str:
+    """Сыграть по ответам на полной скорости и вернуть весь вывод.
+
+    Паузы [Enter] пропускаются, экран не очищается. Без save_dir игра
+    идёт во временном каталоге сохранений, который затем удаляется.
+    """
+    return play_script(answers, seed, save_dir)[0]
+
+
+def play_script(answers: List[str], seed: int = 0,
+                save_dir: Optional[str] = None) -> Tuple[str, Session]:
+    """Как run_script, но вместе с сессией — по ней видны итоги игры."""
+    out = io.StringIO()
+    channel = HeadlessIO(ScriptSource(answers), out=out)
+    session = Session(io=channel)
+
+    saved_dir = storage.SAVE_DIR
+    storage.SAVE_DIR = save_dir or tempfile.mkdtemp(prefix="tajna-script-")
+    account_index.invalidate()
+    resume_cache.pin(SCRIPT_SECRET, SCRIPT_EPOCH)
+    random.seed(seed)
+    try:
+        run_flow(channel, game.play(session), skip=(PAUSE,))
+    except EOFError:
+        # Сценарий кончился раньше игры
+        pass
+    finally:
+        channel.flush()
+        session.manager.flush_saves()
+        leaderboard.flush()
+        if session.manager.resume_token:
+            resume_cache.revoke(session.manager.resume_token)
+        account_index.invalidate()
+        if save_dir is None:
+            shutil.rmtree(storage.SAVE_DIR, ignore_errors=True)
+        storage.SAVE_DIR = saved_dir
+    return out.getvalue(), session
+
+
+def first_divergence(expected: str, actual: str) -> Optional[Tuple[int, str, str]]:
+    """Первая несовпадающая строка: (номер с 1, ожидалось, получено) или None."""
+    if expected == actual:
+        return None
+    old, new = expected.split("\n"), actual.split("\n")
+    for number in range(max(len(old), len(new))):
+        a = old[number] if number < len(old) else "<конец>"
+        b = new[number] if number < len(new) else "<конец>"
+        if a != b:
+            return number + 1, a, b
+    return None
+
+
+def describe_divergence(expected: str, actual: str, context: int = 3) -> str:
+    """Текстовый отчёт о первом расхождении с несколькими строками до него."""
+    found = first_divergence(expected, actual)
+    if found is None:
+        return ""
+    number, a, b = found
+    lines = expected.split("\n")
+    report = [f"  Расхождение в строке {number}:"]
+    for i in range(max(0, number - 1 - context), number - 1):
+        report.append(f"    {i + 1:>5}  {lines[i]}")
+    report.append(f"  - {number:>5}  {a}")
+    report.append(f"  + {number:>5}  {b}")
+    return "\n".join(report)
+
+
+def check_golden(transcript: str, golden_path: str, update: bool = False) -> Optional[str]:
+    """Сверить вывод с эталоном. Возвращает отчёт о расхождении или None."""
+    if update:
+        with open(golden_path, 'w', encoding='utf-8') as f:
+            f.write(transcript)
+        return None
+    if not os.path.exists(golden_path):
+        return f"  Нет эталона {golden_path} — запишите его с --update-golden"
+    with open(golden_path, 'r', encoding='utf-8') as f:
+        expected = f.read()
+    return describe_divergence(expected, transcript) or None
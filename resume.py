@@ -0,0 +1,114 @@
+
+import os
+import hmac
+import time
+import base64
+import hashlib
+from typing import Any, Optional, Tuple
+
+from hibernate import SessionStore
+
+
+# Сколько секунд действует код возврата
+RESUME_TTL = int(os.environ.get("TAJNA_RESUME_TTL", "900"))
+
+# Сколько недавних сессий держать в памяти
+RESUME_CACHE_SIZE = 256
+
+# Длина подписи в байтах (до base64)
+SIGNATURE_SIZE = 12
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def token_name(token: str) -> Optional[str]:
+    """Имя из кода без проверки подписи — только чтобы выбрать процесс."""
+    try:
+        return _unb64(token.strip().split(".")[0]).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class ResumeCache:
+    """Подписанные коды возврата и кэш недавних сессий.
+
+    Код — имя.срок.подпись (HMAC-SHA256). Пока сессия в кэше, возврат
+    не проверяет пароль и не читает аккаунт; после вытеснения
+    действительный код всё ещё позволяет войти без пароля.
+    """
+
+    def __init__(self, ttl: int = RESUME_TTL, size: int = RESUME_CACHE_SIZE,
+                 secret: Optional[bytes] = None):
+        self.ttl = ttl
+        env_secret = os.environ.get("TAJNA_RESUME_SECRET")
+        # Без общего секрета коды действуют только в этом процессе
+        self._secret = secret or (env_secret.encode('utf-8') if env_secret else os.urandom(32))
+        # Простаивающие сессии выгружаются на диск и поднимаются при возврате
+        self.sessions = SessionStore(size)
+        self.clock = time.time
+
+    def use_secret(self, secret: bytes) -> None:
+        """Общий секрет процессов сервера: код одного принимают все."""
+        self._secret = secret
+
+    def pin(self, secret: bytes, now: float) -> None:
+        """Постоянные секрет и время: одинаковые коды в прогонах по сценарию."""
+        self._secret = secret
+        self.clock = lambda: now
+
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(self._secret, payload.encode('utf-8'), hashlib.sha256).digest()
+        return _b64(digest[:SIGNATURE_SIZE])
+
+    def issue(self, name: str, session: Any) -> str:
+        """Выдать код возврата и запомнить сессию."""
+        expires = int(self.clock()) + self.ttl
+        payload = f"{_b64(name.encode('utf-8'))}.{expires}"
+        token = f"{payload}.{self._sign(payload)}"
+        self.attach(token, session)
+        return token
+
+    def attach(self, token: str, session: Any) -> None:
+        self.sessions.put(token, session)
+
+    def touch(self, token: str) -> None:
+        """Сессия активна: отодвинуть её в конец очереди вытеснения."""
+        self.sessions.touch(token)
+
+    def detach(self, token: str, session: Any) -> None:
+        """Соединение сессии закрыто: её можно выгрузить до возврата по коду."""
+        self.sessions.detach(token, session)
+
+    def lookup(self, token: str) -> Optional[Tuple[str, Any]]:
+        """Проверить код. Возвращает (имя, сессия или None) либо None.
+
+        Сессия отдаётся, только если её отпустило прежнее соединение.
+        """
+        token = token.strip()
+        # Код выдаётся в ASCII; другое набрано с ошибкой или подделано
+        if not token.isascii():
+            return None
+        try:
+            encoded_name, expires, signature = token.split(".")
+            if int(expires) < self.clock():
+                self.revoke(token)
+                return None
+            expected = self._sign(f"{encoded_name}.{expires}")
+            if not hmac.compare_digest(signature.encode('ascii'), expected.encode('ascii')):
+                return None
+            name = _unb64(encoded_name).decode('utf-8')
+        except (ValueError, TypeError, UnicodeDecodeError):
+            return None
+        return name, self.sessions.claim(token)
+
+    def revoke(self, token: str) -> None:
+        self.sessions.discard(token)
+
+
+resume_cache = ResumeCache()
@@ -0,0 +1,340 @@
+
+import os
+import json
+import struct
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Формат записи аккаунта: "binary" (компактный) или "json" (для отладки)
+SAVE_FORMAT = os.environ.get("TAJNA_SAVE_FORMAT", "binary")
+
+BINARY_EXT = ".sav"
+JSON_EXT = ".json"
+
+MAGIC = b"TLSV"
+FORMAT_VERSION = 1
+
+# Теги значений
+_T_NONE = 0
+_T_FALSE = 1
+_T_TRUE = 2
+_T_INT = 3
+_T_STR = 4
+_T_LIST = 5
+_T_DICT = 6
+_T_FLOAT = 7
+
+_DOUBLE = struct.Struct("<d")
+
+
+class SaveFormatError(ValueError):
+    """Повреждённый или неподдерживаемый файл сохранения."""
+
+
+def extension(fmt: Optional[str] = None) -> str:
+    """Расширение файла для формата."""
+    return JSON_EXT if (fmt or SAVE_FORMAT) == "json" else BINARY_EXT
+
+
+# ─── varint ────────────────────────────────────────────────
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf: memoryview, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise SaveFormatError("Обрезанный varint")
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+# ─── секция ───────────────────────────────────────────────
+
+class _SectionEncoder:
+    """Кодирует одно значение со своей таблицей строк и форм словарей."""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.string_ids: Dict[str, int] = {}
+        self.shapes: List[Tuple[int, ...]] = []
+        self.shape_ids: Dict[Tuple[int, ...], int] = {}
+        self.body = bytearray()
+
+    def _intern(self, text: str) -> int:
+        idx = self.string_ids.get(text)
+        if idx is None:
+            idx = len(self.strings)
+            self.strings.append(text)
+            self.string_ids[text] = idx
+        return idx
+
+    def _shape(self, keys: Iterable[str]) -> int:
+        shape = tuple(self._intern(k) for k in keys)
+        idx = self.shape_ids.get(shape)
+        if idx is None:
+            idx = len(self.shapes)
+            self.shapes.append(shape)
+            self.shape_ids[shape] = idx
+        return idx
+
+    def encode(self, value: Any) -> None:
+        out = self.body
+        if value is None:
+            out.append(_T_NONE)
+        elif value is True:
+            out.append(_T_TRUE)
+        elif value is False:
+            out.append(_T_FALSE)
+        elif isinstance(value, int):
+            out.append(_T_INT)
+            _write_varint(out, _zigzag(value))
+        elif isinstance(value, float):
+            out.append(_T_FLOAT)
+            out += _DOUBLE.pack(value)
+        elif isinstance(value, str):
+            out.append(_T_STR)
+            _write_varint(out, self._intern(value))
+        elif isinstance(value, (list, tuple)):
+            out.append(_T_LIST)
+            _write_varint(out, len(value))
+            for item in value:
+                self.encode(item)
+        elif isinstance(value, dict):
+            # Словари одной формы (предметы инвентаря) делят список ключей
+            out.append(_T_DICT)
+            _write_varint(out, self._shape(str(k) for k in value))
+            for item in value.values():
+                self.encode(item)
+        else:
+            raise TypeError(f"Неподдерживаемый тип в сохранении: {type(value).__name__}")
+
+    def finish(self) -> bytes:
+        out = bytearray()
+        _write_varint(out, len(self.strings))
+        for text in self.strings:
+            raw = text.encode("utf-8")
+            _write_varint(out, len(raw))
+            out += raw
+        _write_varint(out, len(self.shapes))
+        for shape in self.shapes:
+            _write_varint(out, len(shape))
+            for idx in shape:
+                _write_varint(out, idx)
+        out += self.body
+        return bytes(out)
+
+
+def _encode_section(value: Any) -> bytes:
+    encoder = _SectionEncoder()
+    encoder.encode(value)
+    return encoder.finish()
+
+
+def _decode_section(buf: memoryview) -> Any:
+    try:
+        return _decode_section_body(buf)
+    except (IndexError, UnicodeDecodeError, struct.error, RecursionError) as e:
+        # Любая ошибка разбора — повреждённый файл, а не сбой игры
+        raise SaveFormatError(f"Повреждённая секция: {e}")
+
+
+def _decode_section_body(buf: memoryview) -> Any:
+    pos = 0
+    count, pos = _read_varint(buf, pos)
+    strings: List[str] = []
+    for _ in range(count):
+        length, pos = _read_varint(buf, pos)
+        if pos + length > len(buf):
+            raise SaveFormatError("Обрезанная таблица строк")
+        strings.append(bytes(buf[pos:pos + length]).decode("utf-8"))
+        pos += length
+    count, pos = _read_varint(buf, pos)
+    shapes: List[List[str]] = []
+    for _ in range(count):
+        length, pos = _read_varint(buf, pos)
+        keys = []
+        for _ in range(length):
+            idx, pos = _read_varint(buf, pos)
+            keys.append(strings[idx])
+        shapes.append(keys)
+
+    def read(p: int) -> Tuple[Any, int]:
+        tag = buf[p]
+        p += 1
+        if tag == _T_NONE:
+            return None, p
+        if tag == _T_TRUE:
+            return True, p
+        if tag == _T_FALSE:
+            return False, p
+        if tag == _T_INT:
+            raw, p = _read_varint(buf, p)
+            return _unzigzag(raw), p
+        if tag == _T_FLOAT:
+            return _DOUBLE.unpack_from(buf, p)[0], p + _DOUBLE.size
+        if tag == _T_STR:
+            idx, p = _read_varint(buf, p)
+            return strings[idx], p
+        if tag == _T_LIST:
+            length, p = _read_varint(buf, p)
+            items = []
+            for _ in range(length):
+                item, p = read(p)
+                items.append(item)
+            return items, p
+        if tag == _T_DICT:
+            idx, p = _read_varint(buf, p)
+            result = {}
+            for key in shapes[idx]:
+                result[key], p = read(p)
+            return result, p
+        raise SaveFormatError(f"Неизвестный тег {tag}")
+
+    value, _ = read(pos)
+    return value
+
+
+class LazySection:
+    """Секция, которая декодируется только при первом обращении."""
+
+    __slots__ = ("_raw", "_value", "_loaded")
+
+    def __init__(self, raw: Optional[bytes] = None, value: Any = None):
+        self._raw = raw
+        self._value = value
+        self._loaded = raw is None
+
+    @property
+    def raw(self) -> Optional[bytes]:
+        """Исходные байты секции (если ещё есть)."""
+        return self._raw
+
+    def load(self) -> Any:
+        if not self._loaded:
+            self._value = _decode_section(memoryview(self._raw))
+            self._loaded = True
+        return self._value
+
+
+def _payload_digest(payload: bytes) -> bytes:
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def section_digest(value: Any) -> Optional[bytes]:
+    """Отпечаток содержимого секции, не зависящий от формата файла.
+
+    None — секции нет.
+    """
+    if value is None:
+        return None
+    if isinstance(value, LazySection):
+        if value.raw is not None:
+            return _payload_digest(value.raw)
+        value = value.load()
+    return _payload_digest(_encode_section(value))
+
+
+# ─── запись целиком ───────────────────────────────────────
+
+def encode_record(record: Dict[str, Any], fmt: Optional[str] = None,
+                  digests: Optional[Dict[str, Optional[bytes]]] = None) -> bytes:
+    """Закодировать запись аккаунта. None-секции не записываются.
+
+    digests — словарь, в который записываются отпечатки секций
+    (section_digest) с этими именами.
+    """
+    fmt = fmt or SAVE_FORMAT
+
+    if fmt == "json":
+        if digests is not None:
+            for name in digests:
+                digests[name] = section_digest(record.get(name))
+        data = {k: (v.load() if isinstance(v, LazySection) else v) for k, v in record.items()}
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+    if digests is not None:
+        for name in digests:
+            digests[name] = None
+    out = bytearray(MAGIC)
+    _write_varint(out, FORMAT_VERSION)
+    sections = [(k, v) for k, v in record.items() if v is not None]
+    _write_varint(out, len(sections))
+    for name, value in sections:
+        if isinstance(value, LazySection):
+            # Нетронутая секция переписывается без декодирования
+            payload = value.raw if value.raw is not None else _encode_section(value.load())
+        else:
+            payload = _encode_section(value)
+        if digests is not None and name in digests:
+            digests[name] = _payload_digest(payload)
+        raw_name = name.encode("utf-8")
+        _write_varint(out, len(raw_name))
+        out += raw_name
+        _write_varint(out, len(payload))
+        out += payload
+    return bytes(out)
+
+
+def decode_record(data: bytes, lazy: Iterable[str] = ()) -> Dict[str, Any]:
+    """Декодировать запись. Секции из lazy возвращаются как LazySection."""
+    lazy = set(lazy)
+
+    if not data.startswith(MAGIC):
+        try:
+            record = json.loads(data.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise SaveFormatError(f"Не удалось прочитать JSON: {e}")
+        if not isinstance(record, dict):
+            raise SaveFormatError("Запись аккаунта должна быть объектом")
+        for name in lazy:
+            if record.get(name) is not None:
+                record[name] = LazySection(value=record[name])
+        return record
+
+    buf = memoryview(data)
+    pos = len(MAGIC)
+    version, pos = _read_varint(buf, pos)
+    if version > FORMAT_VERSION:
+        raise SaveFormatError(f"Версия формата {version} новее поддерживаемой")
+
+    record: Dict[str, Any] = {}
+    count, pos = _read_varint(buf, pos)
+    for _ in range(count):
+        length, pos = _read_varint(buf, pos)
+        if pos + length > len(buf):
+            raise SaveFormatError("Обрезанное имя секции")
+        try:
+            name = bytes(buf[pos:pos + length]).decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise SaveFormatError(f"Повреждённое имя секции: {e}")
+        pos += length
+        length, pos = _read_varint(buf, pos)
+        if pos + length > len(buf):
+            raise SaveFormatError(f"Обрезанная секция «{name}»")
+        section = buf[pos:pos + length]
+        pos += length
+        if name in lazy:
+            record[name] = LazySection(bytes(section))
+        else:
+            record[name] = _decode_section(section)
+    return record
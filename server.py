@@ -0,0 +1,554 @@
+
+import os
+import sys
+import json
+import signal
+import socket
+import asyncio
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Set, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from channels import InputSource, IOChannel
+from renderer import Renderer
+from session import Session
+from game_state import GameManager
+from flow import PASSWORD, WAIT, Prompt, advance
+from autosave import save_writer
+from leaderboard import leaderboard
+from resume import resume_cache
+from hibernate import HIBERNATE_AFTER, remove_stale_snapshots, write_snapshot, read_snapshot
+import journal
+from metrics import SESSIONS, METRICS_PORT, start_http_server
+import main as game
+
+
+DEFAULT_HOST = os.environ.get("TAJNA_HOST", "0.0.0.0")
+DEFAULT_PORT = int(os.environ.get("TAJNA_PORT", "4000"))
+
+# Через сколько секунд без ввода соединение закрывается
+IDLE_TIMEOUT = float(os.environ.get("TAJNA_IDLE_TIMEOUT", "900"))
+
+# Потоки, в которых выполняются шаги игры между вводами.
+# Шаг может ждать хэширования пароля или диска — цикл событий при этом не стоит.
+STEP_WORKERS = int(os.environ.get("TAJNA_STEP_WORKERS", "8"))
+
+# Сколько ждать завершения сессий и записи сохранений при остановке
+SHUTDOWN_TIMEOUT = 10.0
+
+# Самая длинная принимаемая строка ввода
+MAX_LINE = 1024
+READ_CHUNK = 4096
+
+# Наибольший размер сообщения о переданном соединении
+HANDOFF_SIZE = 16 * 1024
+
+# Команды и опции telnet (RFC 854, 856, 857, 858, 2066)
+IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+BINARY, ECHO, SGA, CHARSET = 0, 1, 3, 42
+CHARSET_REQUEST = 1
+
+# Опции, которые сервер включает у себя и просит включить у клиента
+OUR_OPTIONS = {BINARY, SGA, CHARSET}
+THEIR_OPTIONS = {BINARY, SGA}
+
+
+class TelnetConnection:
+    """Соединение с игроком: разбор telnet, строки ввода, вывод.
+
+    Вывод всегда в UTF-8. Клиенту предлагаются BINARY и CHARSET UTF-8,
+    но и клиент без поддержки telnet (nc) получает читаемый текст.
+    Объект служит выходом IOChannel и может писаться из потока шага.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 loop: asyncio.AbstractEventLoop):
+        self.reader = reader
+        self.writer = writer
+        self.loop = loop
+        self.telnet = False
+        self._thread = threading.get_ident()
+        self._pending = bytearray()
+        self._lines = []
+        self._state = None
+        self._command = 0
+        self._last = 0
+        self._eof = False
+
+    @property
+    def peer(self) -> str:
+        peer = self.writer.get_extra_info("peername")
+        return f"{peer[0]}:{peer[1]}" if peer else "?"
+
+    # Вывод
+
+    def _send(self, data: bytes) -> None:
+        if self.writer.is_closing():
+            return
+        if threading.get_ident() == self._thread:
+            self.writer.write(data)
+        else:
+            self.loop.call_soon_threadsafe(self._send, data)
+
+    def write(self, text: str) -> None:
+        self._send(text.replace("\n", "\r\n").encode('utf-8'))
+
+    def flush(self) -> None:
+        pass
+
+    def command(self, *codes: int) -> None:
+        self._send(bytes((IAC,) + codes))
+
+    def negotiate(self) -> None:
+        for option in OUR_OPTIONS:
+            self.command(WILL, option)
+        for option in THEIR_OPTIONS:
+            self.command(DO, option)
+
+    def hide_input(self, hidden: bool) -> None:
+        """Не показывать ввод (пароль): эхо берёт на себя сервер и молчит."""
+        if self.telnet:
+            self.command(WILL if hidden else WONT, ECHO)
+            if not hidden:
+                self.write("\n")
+
+    # Ввод
+
+    def _option(self, command: int, option: int) -> None:
+        self.telnet = True
+        if command == DO:
+            if option == CHARSET:
+                self._send(bytes((IAC, SB, CHARSET, CHARSET_REQUEST)) + b";UTF-8" + bytes((IAC, SE)))
+            elif option not in OUR_OPTIONS and option != ECHO:
+                self.command(WONT, option)
+        elif command == WILL and option not in THEIR_OPTIONS:
+            self.command(DONT, option)
+
+    def _feed(self, data: bytes) -> None:
+        line = self._pending
+        for byte in data:
+            state = self._state
+            if state is None:
+                if byte == IAC:
+                    self._state = IAC
+                    continue
+                # CR LF, CR NUL и одиночный LF — конец строки
+                if byte == 13 or (byte == 10 and self._last != 13):
+                    self._lines.append(line.decode('utf-8', errors='replace'))
+                    line.clear()
+                elif byte not in (0, 10) and len(line) < MAX_LINE:
+                    line.append(byte)
+                self._last = byte
+            elif state == IAC:
+                if byte == IAC:
+                    line.append(IAC)
+                    self._state = None
+                elif byte in (DO, DONT, WILL, WONT):
+                    self._command = byte
+                    self._state = "option"
+                elif byte == SB:
+                    self._state = SB
+                else:
+                    self._state = None
+            elif state == "option":
+                self._option(self._command, byte)
+                self._state = None
+            elif state == SB:
+                # Ответы клиента на подопции не нужны — пропускаем до IAC SE
+                if byte == IAC:
+                    self._state = "sb-iac"
+            elif state == "sb-iac":
+                self._state = None if byte == SE else SB
+
+    async def readline(self, timeout: Optional[float] = None) -> str:
+        """Следующая строка ввода. EOFError — соединение закрыто."""
+        await self.writer.drain()
+        while not self._lines:
+            if self._eof:
+                raise EOFError
+            data = await asyncio.wait_for(self.reader.read(READ_CHUNK), timeout)
+            if not data:
+                self._eof = True
+            self._feed(data)
+        return self._lines.pop(0)
+
+    def handoff(self) -> Dict[str, Any]:
+        """Перестать читать сокет и отдать состояние разбора для передачи
+        соединения другому процессу — вместе с байтами, которые уже
+        прочитаны из сокета, но ещё не разобраны."""
+        self.writer.transport.pause_reading()
+        # У StreamReader нет способа забрать буфер без ожидания
+        unread = bytes(self.reader._buffer)
+        self.reader._buffer.clear()
+        return {"telnet": self.telnet, "lines": list(self._lines),
+                "pending": self._pending.decode('latin-1'),
+                "parser": (self._state, self._command, self._last),
+                "unread": unread.decode('latin-1')}
+
+    def adopt(self, state: Dict[str, Any]) -> None:
+        """Продолжить соединение, начатое другим процессом."""
+        self.telnet = state.get("telnet", False)
+        self._lines.extend(state.get("lines", []))
+        self._pending.extend(state.get("pending", "").encode('latin-1'))
+        self._state, self._command, self._last = state.get("parser", (None, 0, 0))
+        self._feed(state.get("unread", "").encode('latin-1'))
+
+    def close_input(self) -> None:
+        """Прервать ожидание ввода, как при разрыве связи."""
+        self.reader.feed_eof()
+
+    async def close(self) -> None:
+        try:
+            await self.writer.drain()
+            self.writer.close()
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+def advance_session(session: Optional[Session], flow, answer: Optional[str] = None,
+                    error: Optional[BaseException] = None) -> Optional[Prompt]:
+    """advance() с костями сюжета из журнала сессии."""
+    with journal.active(session):
+        return advance(flow, answer, error)
+
+
+async def step(pool: ThreadPoolExecutor, flow, answer: Optional[str] = None,
+               error: Optional[BaseException] = None,
+               session: Optional[Session] = None) -> Optional[Prompt]:
+    """Продвинуть поток игры в пуле до приглашения ввода. Ожидания
+    (WAIT — например, хэш пароля) проходят в цикле событий: поток шага
+    на это время свободен."""
+    loop = asyncio.get_running_loop()
+    while True:
+        prompt = await loop.run_in_executor(pool, advance_session, session, flow, answer, error)
+        if prompt is None or prompt.kind != WAIT:
+            return prompt
+        answer, error = None, None
+        try:
+            answer = await asyncio.wrap_future(prompt.future)
+        except Exception as e:
+            error = e
+
+
+def hibernate_session(session: Session, flow, prompt: Prompt, key: str) -> Optional[str]:
+    """Выгрузить сессию, ждущую ввода, на диск и закрыть её поток.
+
+    Возвращает путь снимка; None — выгрузить не удалось, сессия живёт дальше.
+    """
+    mgr = session.manager
+    mgr.journal.pending = prompt.text
+    try:
+        path = write_snapshot(key, mgr.snapshot())
+    except IOError:
+        return None
+    flow.close()
+    if mgr.resume_token:
+        # Иначе менеджер остался бы в памяти в кэше кодов; код действует
+        # и дальше, при пробуждении сессия возвращается в кэш
+        resume_cache.revoke(mgr.resume_token)
+    return path
+
+
+def _replay(session: Session, flow) -> Optional[Prompt]:
+    """Подать потоку ответы журнала; ожидания WAIT — прямо в этом потоке."""
+    def settle(prompt):
+        while prompt is not None and prompt.kind == WAIT:
+            try:
+                value = prompt.future.result()
+            except Exception as e:
+                prompt = advance(flow, None, e)
+            else:
+                prompt = advance(flow, value)
+        return prompt
+
+    prompt = settle(advance(flow))
+    for answer in session.manager.journal.answers:
+        if prompt is None:
+            break
+        prompt = settle(advance(flow, answer))
+    return prompt
+
+
+def wake_session(io: IOChannel, path: str) -> Tuple[Session, Any, bool]:
+    """Поднять выгруженную сессию: (сессия, поток, продолжена ли).
+
+    Поток начинается с контрольной точки журнала и без вывода проходит
+    записанные ответы до приглашения, на котором сессию выгрузили;
+    тогда ответ игрока идёт ему. Если повтор разошёлся, поток
+    начинается как при возврате по коду — с начала локации.
+    """
+    data = read_snapshot(path)
+    manager = GameManager.from_snapshot(data)
+    record = manager.journal
+    session = Session(io=io, manager=manager)
+    flow = game.rejoin(session)
+    try:
+        with io.muted(), journal.active(session), record.replaying():
+            prompt = _replay(session, flow)
+        resumed = prompt is not None and prompt.text == record.pending
+    except Exception:
+        traceback.print_exc()
+        resumed = False
+
+    if not resumed:
+        flow.close()
+        manager = GameManager.from_snapshot(data)
+        session = Session(io=io, manager=manager)
+        flow = game.main_loop(session, resume=True)
+    if manager.resume_token:
+        resume_cache.attach(manager.resume_token, manager)
+    return session, flow, resumed
+
+
+def restore_session(io: IOChannel, path: str) -> Session:
+    """Поднять выгруженную сессию без потока — чтобы её отпустить."""
+    manager = GameManager.from_snapshot(read_snapshot(path))
+    if manager.resume_token:
+        resume_cache.attach(manager.resume_token, manager)
+    return Session(io=io, manager=manager)
+
+
+def finish_session(session: Session) -> None:
+    """Запомнить позицию героя, дождаться записи аккаунта и отпустить
+    сессию: до возврата по коду её можно выгрузить на диск."""
+    mgr = session.manager
+    if mgr.hero is not None and mgr.current_state is not None:
+        mgr.sync_from_hero(mgr.hero)
+    mgr.flush_saves(SHUTDOWN_TIMEOUT)
+    if mgr.resume_token:
+        resume_cache.detach(mgr.resume_token, mgr)
+
+
+class GameServer:
+    """Сервер игры по TCP/telnet: одна сессия на соединение.
+
+    Все сессии живут в одном цикле asyncio. Пока игрок думает,
+    его сессия — это приостановленный генератор; если он молчит дольше
+    hibernate_after, сессия уходит в снимок на диске и поднимается
+    следующей строкой ввода.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 idle_timeout: float = IDLE_TIMEOUT, workers: int = STEP_WORKERS,
+                 metrics_port: int = METRICS_PORT,
+                 hibernate_after: float = HIBERNATE_AFTER):
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.hibernate_after = hibernate_after
+        self.metrics_port = metrics_port
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="game-step")
+        self.connections: Set[TelnetConnection] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._metrics = None
+        # Соединения, чьи сессии сейчас в снимках
+        self.asleep = 0
+
+        # Кости сюжета у каждой сессии свои: по зерну журнала поток повторяется
+        journal.install()
+        # Снимки сессий процессов, завершившихся со сбоем, уже не нужны
+        remove_stale_snapshots()
+        sessions = resume_cache.sessions
+        SESSIONS.set_function(lambda: len(self.connections), "active")
+        SESSIONS.set_function(sessions.resident, "resident")
+        SESSIONS.set_function(lambda: len(sessions) - sessions.resident() + self.asleep,
+                              "hibernated")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                     account: Optional[str] = None,
+                     handoff: Optional[Dict[str, Any]] = None) -> None:
+        """Провести игру одного соединения. account — имя, за которым
+        закреплено соединение; handoff — состояние от супервизора."""
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        conn = TelnetConnection(reader, writer, loop)
+        self.connections.add(conn)
+
+        # Клиент сам чистит экран и рисует строку состояния по ANSI
+        io = IOChannel(InputSource(), out=conn, renderer=Renderer())
+        session = Session(io=io, account=account)
+        flow = game.play(session)
+        if handoff is None:
+            conn.negotiate()
+        else:
+            conn.adopt(handoff)
+
+        answer, error = None, None
+        # Снимок выгруженной сессии; пока он есть, session и flow — None
+        asleep = None
+        try:
+            while True:
+                if answer is not None:
+                    session.manager.journal.record(answer)
+                prompt = await step(self.pool, flow, answer, error, session)
+                if prompt is None:
+                    break
+                answer, error = None, None
+
+                hidden = prompt.kind == PASSWORD
+                if hidden:
+                    conn.hide_input(True)
+                io.write(prompt.text)
+                io.flush()
+                wait = self.idle_timeout
+                if wait > self.hibernate_after and session.manager.journal.ready and not hidden:
+                    wait = self.hibernate_after
+                try:
+                    try:
+                        answer = await conn.readline(wait)
+                    except asyncio.TimeoutError:
+                        if wait >= self.idle_timeout:
+                            raise
+                        asleep = await loop.run_in_executor(self.pool, hibernate_session,
+                                                            session, flow, prompt, f"conn.{id(conn)}")
+                        if asleep is not None:
+                            # Игрок думает: в памяти остаются соединение и канал
+                            session = flow = None
+                            io.status = None
+                            self.asleep += 1
+                        answer = await conn.readline(self.idle_timeout - wait)
+                        if asleep is not None:
+                            self.asleep -= 1
+                            path, asleep = asleep, None
+                            session, flow, resumed = await loop.run_in_executor(
+                                self.pool, wake_session, io, path)
+                            if not resumed:
+                                # Поток начат заново: строка была ответом на другое
+                                answer = None
+                except asyncio.TimeoutError:
+                    io.print("\n\n  ⏰ Соединение закрыто из-за бездействия.")
+                    error = EOFError()
+                except (EOFError, ConnectionError):
+                    error = EOFError()
+                if hidden:
+                    conn.hide_input(False)
+                if asleep is not None:
+                    # Связь кончилась во сне: потока, который надо завершить, нет
+                    break
+        except (EOFError, SystemExit):
+            # Разрыв связи посреди игры: выходим так же, как при конце ввода
+            pass
+        except Exception:
+            traceback.print_exc()
+        finally:
+            if flow is not None:
+                flow.close()
+            io.close()
+            if asleep is not None:
+                self.asleep -= 1
+                try:
+                    session = await loop.run_in_executor(self.pool, restore_session, io, asleep)
+                except (IOError, ValueError):
+                    session = None
+            if session is not None:
+                await loop.run_in_executor(self.pool, finish_session, session)
+            await conn.close()
+            self.connections.discard(conn)
+            self._tasks.discard(task)
+
+    def _watch_signals(self, *signals: int) -> None:
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._metrics = start_http_server(self.metrics_port)
+        for sig in signals:
+            try:
+                loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    async def serve(self) -> None:
+        """Принимать соединения до SIGINT/SIGTERM, затем остановиться."""
+        self._watch_signals(signal.SIGINT, signal.SIGTERM)
+        self._server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"  🌲 Сервер запущен: {self.host}:{self.port}", file=sys.stderr)
+        await self._stopping.wait()
+        await self.shutdown()
+
+    async def serve_handoff(self, control: socket.socket) -> None:
+        """Принимать соединения, которые передаёт супервизор через control.
+
+        Останавливается по SIGTERM или когда супервизор закрыл канал.
+        """
+        self._watch_signals(signal.SIGTERM)
+        loop = asyncio.get_running_loop()
+        control.setblocking(False)
+        loop.add_reader(control.fileno(), self._receive, control)
+        await self._stopping.wait()
+        loop.remove_reader(control.fileno())
+        await self.shutdown()
+
+    def _receive(self, control: socket.socket) -> None:
+        try:
+            message, fds, _, _ = socket.recv_fds(control, HANDOFF_SIZE, 1)
+        except BlockingIOError:
+            return
+        except OSError:
+            message, fds = b"", []
+        if not message:
+            self.stop()
+            return
+        if not fds:
+            return
+
+        sock = socket.socket(fileno=fds[0])
+        state = json.loads(message.decode('utf-8'))
+        asyncio.ensure_future(self._adopt(sock, state))
+
+    async def _adopt(self, sock: socket.socket, state: Dict[str, Any]) -> None:
+        reader, writer = await asyncio.open_connection(sock=sock)
+        await self.handle(reader, writer, state.get("account"), state)
+
+    def stop(self) -> None:
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def shutdown(self) -> None:
+        """Закрыть приём, завершить сессии и дописать сохранения."""
+        print(f"  🛑 Остановка, игроков: {len(self.connections)}", file=sys.stderr)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        for conn in list(self.connections):
+            conn.write("\n\n  🛑 Сервер останавливается. До встречи!\n")
+            conn.close_input()
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=SHUTDOWN_TIMEOUT)
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.pool, save_writer.flush, None, SHUTDOWN_TIMEOUT)
+        await loop.run_in_executor(self.pool, leaderboard.flush, SHUTDOWN_TIMEOUT)
+        if self._metrics is not None:
+            await loop.run_in_executor(self.pool, self._metrics.shutdown)
+        self.pool.shutdown(wait=False)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Сервер игры по TCP/telnet")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="секунд без ввода до отключения")
+    parser.add_argument("--workers", type=int, default=STEP_WORKERS)
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="порт страницы метрик на localhost (0 — выключена)")
+    parser.add_argument("--hibernate-after", type=float, default=HIBERNATE_AFTER,
+                        help="секунд без ввода до выгрузки сессии на диск")
+    args = parser.parse_args(argv)
+
+    server = GameServer(args.host, args.port, args.idle_timeout, args.workers, args.metrics_port,
+                        args.hibernate_after)
+    asyncio.run(server.serve())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from renderer import hero_status
+from game_state import GameManager
+from resume import resume_cache
+from flow import Flow, Prompt, CHOICE
+
+
+@dataclass
+class PromptState:
+    """Последнее приглашение — повторяется после выхода из меню."""
+    text: str = ""
+    options: List[str] = field(default_factory=list)
+    valid_range: Optional[range] = None
+    prompt: str = ""
+
+
+class Session:
+    """Игра одного игрока: менеджер, ввод-вывод и последнее приглашение.
+
+    Всё, что относится к игроку, живёт здесь, а не в модулях, поэтому
+    в одном процессе может идти сколько угодно игр. Локации из реестра
+    LOCATIONS общие для всех сессий и не хранят состояния игрока.
+    """
+
+    def __init__(self, io, manager: Optional[GameManager] = None,
+                 account: Optional[str] = None):
+        self.io = io
+        # Аккаунт, за которым закреплено соединение: другое имя не принимается
+        self.account = account
+        self.manager = manager or GameManager(io)
+        self.manager.io = io
+        self.io.status = self.status
+        self.prompt = PromptState()
+
+    @property
+    def hero(self):
+        return self.manager.hero
+
+    @hero.setter
+    def hero(self, hero) -> None:
+        self.manager.hero = hero
+
+    def resume(self, token: str) -> bool:
+        """Вернуться в игру по коду. Недавний менеджер из кэша становится
+        менеджером этой сессии — тот же объект, без копирования."""
+        found = resume_cache.lookup(token)
+        if found is None:
+            return False
+        name, manager = found
+        
+        if manager is None:
+            # Сессия вытеснена из памяти, но код действителен — читаем аккаунт
+            if not self.manager.load_account(name):
+                return False
+        elif manager is not self.manager:
+            self.manager = manager
+            manager.io = self.io
+        self.manager.resume_token = token.strip()
+        # Журнал вёл прежний поток, этот начинается заново
+        self.manager.journal.taint()
+        resume_cache.attach(self.manager.resume_token, self.manager)
+        return True
+    
+    def checkpoint(self) -> None:
+        """Контрольная точка журнала: вход в локацию или главное меню."""
+        mgr = self.manager
+        mgr.journal.mark(mgr.current_state.to_dict() if mgr.hero is not None else None)
+    
+    def status(self) -> Optional[List[str]]:
+        """Поля строки состояния (пусто, пока нет героя)."""
+        hero = self.manager.hero
+        return hero_status(hero) if hero is not None else None
+
+    def print(self, *args, sep: str = " ", end: str = "\n") -> None:
+        self.io.print(*args, sep=sep, end=end)
+
+    def input(self, prompt: str = "") -> str:
+        return self.io.input(prompt)
+
+    def set_prompt(self, text: str, options: Optional[List[str]] = None,
+                   valid_range: Optional[range] = None, prompt: str = "") -> None:
+        """Запомнить приглашение для повтора после меню."""
+        self.prompt = PromptState(text, options or [], valid_range, prompt)
+
+    def show_prompt(self) -> None:
+        """Показать последнее приглашение."""
+        if self.prompt.text:
+            self.print(self.prompt.text)
+        for opt in self.prompt.options:
+            self.print(opt)
+
+
+def get_input_with_menu(session: Session, prompt: str, valid_range: range,
+                        options_text: str = "",
+                        options_list: Optional[List[str]] = None) -> Flow[int]:
+    """Ввод с возможностью меню (0). Сохраняет и повторяет приглашение после меню."""
+    mgr = session.manager
+    
+    # Сохраняем информацию о приглашении
+    session.set_prompt(options_text, options_list or [], valid_range, prompt)
+    
+    # Показываем подсказку о меню
+    session.print(f"\n  (0 — меню)")
+    
+    while True:
+        try:
+            value = int((yield Prompt(prompt, CHOICE, valid_range)))
+            mgr.touch()
+            
+            if value == 0:
+                if mgr.hero:
+                    mgr.sync_from_hero(mgr.hero)
+                # Меню пишет аккаунт — до следующей точки поток не повторить
+                mgr.journal.taint()
+                
+                if not (yield from mgr.call_menu()):
+                    raise SystemExit("menu_exit")
+                
+                # После выхода из меню - повторяем ВСЁ приглашение
+                session.print("\n" + "─" * 50)
+                session.print("  ↩️ Возврат к выбору:")
+                session.show_prompt()
+                session.print(f"\n  (0 — меню)")
+                continue
+            
+            if value in valid_range:
+                return value
+            session.print(f"  ⚠️ Введите {valid_range.start}-{valid_range.stop - 1}")
+        except ValueError:
+            session.print("  ⚠️ Введите число!")
@@ -0,0 +1,238 @@
+
+import os
+import time
+import hashlib
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import save_format
+from account_index import safe_name
+
+
+SAVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_games")
+
+# Файл-перечень аккаунтов: по одному безопасному имени в строке
+INDEX_FILE = "accounts.idx"
+
+# Служебные файлы в корне SAVE_DIR, которые не аккаунты (leaderboard.STATS_FILE)
+SERVICE_FILES = {"global_stats.json"}
+
+# Число потоков для параллельного обхода шардов
+SCAN_WORKERS = 8
+
+# Сколько ждать блокировку аккаунта (секунды)
+LOCK_TIMEOUT = 5.0
+LOCK_POLL_INTERVAL = 0.01
+
+_EXTENSIONS = (save_format.BINARY_EXT, save_format.JSON_EXT)
+_index_lock = threading.Lock()
+
+
+def shard_dir(name: str) -> str:
+    """Двухуровневый каталог аккаунта: SAVE_DIR/ab/cd."""
+    digest = hashlib.sha1(safe_name(name).encode('utf-8')).hexdigest()
+    return os.path.join(SAVE_DIR, digest[:2], digest[2:4])
+
+
+def account_path(name: str, fmt: Optional[str] = None) -> str:
+    """Путь, по которому аккаунт записывается в текущем формате."""
+    return os.path.join(shard_dir(name), safe_name(name) + save_format.extension(fmt))
+
+
+class LockTimeout(IOError):
+    """Не удалось захватить блокировку аккаунта."""
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path: str, timeout: float = LOCK_TIMEOUT):
+    """Межпроцессная рекомендательная блокировка по файлу path."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Файл блокировки не удаляется: иначе два процесса могут запереть разные файлы
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        deadline = time.monotonic() + timeout
+        while not _try_lock(fd):
+            if time.monotonic() >= deadline:
+                raise LockTimeout(f"Файл «{os.path.basename(path)}» занят другим процессом")
+            time.sleep(LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+
+def account_lock(name: str, timeout: float = LOCK_TIMEOUT):
+    """Межпроцессная блокировка аккаунта."""
+    return file_lock(os.path.join(shard_dir(name), safe_name(name) + ".lock"), timeout)
+
+
+def locate(name: str) -> Optional[str]:
+    """Найти файл аккаунта. Файл из плоской раскладки переносится в шард."""
+    base = os.path.join(shard_dir(name), safe_name(name))
+    for ext in (save_format.extension(),) + _EXTENSIONS:
+        if os.path.exists(base + ext):
+            return base + ext
+
+    flat_base = os.path.join(SAVE_DIR, safe_name(name))
+    for ext in _EXTENSIONS:
+        if os.path.exists(flat_base + ext):
+            return _migrate(name, flat_base + ext, base + ext)
+    return None
+
+
+def _migrate(name: str, flat_path: str, shard_path: str) -> Optional[str]:
+    try:
+        os.makedirs(os.path.dirname(shard_path), exist_ok=True)
+        os.replace(flat_path, shard_path)
+    except OSError:
+        # Файл мог перенести соседний процесс
+        return shard_path if os.path.exists(shard_path) else None
+    add_to_index(name)
+    return shard_path
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Записать файл целиком: читатели видят либо старую, либо новую версию."""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def migrate_flat_layout() -> int:
+    """Перенести все файлы плоской раскладки в шарды. Возвращает число файлов."""
+    moved = 0
+    try:
+        entries = os.listdir(SAVE_DIR)
+    except OSError:
+        return 0
+    for filename in entries:
+        stem, ext = os.path.splitext(filename)
+        if filename in SERVICE_FILES:
+            continue
+        if ext in _EXTENSIONS and os.path.isfile(os.path.join(SAVE_DIR, filename)):
+            if locate(stem):
+                moved += 1
+    return moved
+
+
+def add_to_index(name: str) -> None:
+    """Дописать аккаунт в перечень."""
+    line = safe_name(name) + "\n"
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    with _index_lock:
+        with open(os.path.join(SAVE_DIR, INDEX_FILE), 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+def list_accounts() -> List[str]:
+    """Все аккаунты по перечню, без обхода шардов."""
+    path = os.path.join(SAVE_DIR, INDEX_FILE)
+    if not os.path.exists(path):
+        rebuild_index()
+    else:
+        # Файлы плоской раскладки попадают в перечень при переносе в шард
+        migrate_flat_layout()
+    seen: Set[str] = set()
+    names: List[str] = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            name = line.strip()
+            if name and name not in seen:
+                seen.add(name)
+                names.append(name)
+    return names
+
+
+def rebuild_index() -> int:
+    """Пересобрать перечень по содержимому шардов."""
+    migrate_flat_layout()
+    names = sorted({name for name, _ in stream_accounts()})
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    path = os.path.join(SAVE_DIR, INDEX_FILE)
+    with _index_lock:
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            f.writelines(name + "\n" for name in names)
+        os.replace(path + ".tmp", path)
+    return len(names)
+
+
+def _scan_shard(top: str) -> List[Tuple[str, str]]:
+    found = []
+    top_path = os.path.join(SAVE_DIR, top)
+    try:
+        subdirs = sorted(os.listdir(top_path))
+    except OSError:
+        return found
+    for sub in subdirs:
+        try:
+            with os.scandir(os.path.join(top_path, sub)) as it:
+                for entry in it:
+                    stem, ext = os.path.splitext(entry.name)
+                    if ext in _EXTENSIONS and entry.is_file():
+                        found.append((stem, entry.path))
+        except OSError:
+            continue
+    return found
+
+
+def parallel_map(fn: Callable[[Any], Any], items: Iterable[Any],
+                 workers: int = SCAN_WORKERS, window: Optional[int] = None) -> Iterator[Any]:
+    """map() в пуле потоков с ограниченным числом задач в полёте. Порядок сохраняется."""
+    window = window or workers * 4
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def stream_accounts(workers: int = SCAN_WORKERS) -> Iterator[Tuple[str, str]]:
+    """Параллельно обойти шарды. Выдаёт (имя, путь) по мере готовности шардов."""
+    try:
+        tops = sorted(d for d in os.listdir(SAVE_DIR)
+                      if len(d) == 2 and os.path.isdir(os.path.join(SAVE_DIR, d)))
+    except OSError:
+        return
+    for shard in parallel_map(_scan_shard, tops, workers):
+        yield from shard
@@ -0,0 +1,227 @@
+
+import os
+import sys
+import json
+import signal
+import socket
+import asyncio
+import hashlib
+import argparse
+import multiprocessing
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from account_index import safe_name
+from resume import resume_cache, token_name
+from server import (TelnetConnection, GameServer, DEFAULT_HOST, DEFAULT_PORT,
+                    IDLE_TIMEOUT, STEP_WORKERS, SHUTDOWN_TIMEOUT, HANDOFF_SIZE)
+from metrics import METRICS_PORT
+
+
+# Число процессов-обработчиков; по умолчанию — по одному на ядро
+WORKERS = int(os.environ.get("TAJNA_WORKERS", str(os.cpu_count() or 1)))
+
+# Пауза перед перезапуском упавшего обработчика
+RESTART_DELAY = 1.0
+
+# Сколько ждать имени аккаунта от нового соединения
+LOGIN_TIMEOUT = 120.0
+
+
+def route(name: str, count: int) -> int:
+    """Номер обработчика для аккаунта. Одно имя — всегда один процесс."""
+    digest = hashlib.sha1(safe_name(name).encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], "big") % count
+
+
+def worker_main(control: socket.socket, idle_timeout: float, step_workers: int,
+                metrics_port: int, secret: bytes) -> None:
+    # Ctrl+C в терминале получает вся группа процессов — останавливает супервизор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    resume_cache.use_secret(secret)
+    server = GameServer(idle_timeout=idle_timeout, workers=step_workers, metrics_port=metrics_port)
+    asyncio.run(server.serve_handoff(control))
+
+
+class Worker:
+    """Процесс-обработчик и канал, по которому ему передаются соединения."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.control: Optional[socket.socket] = None
+        self.restarts = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive() and self.control is not None
+
+    def start(self, context, idle_timeout: float, step_workers: int, metrics_port: int,
+              secret: bytes) -> None:
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        # У каждого процесса своя страница метрик: порт + номер
+        port = metrics_port + self.index if metrics_port else 0
+        self.process = context.Process(target=worker_main,
+                                       args=(child, idle_timeout, step_workers, port, secret),
+                                       name=f"tajna-worker-{self.index}")
+        self.process.start()
+        child.close()
+        self.control = parent
+
+    def hand_over(self, sock: socket.socket, state: dict) -> None:
+        """Передать соединение процессу. OSError — процесс недоступен,
+        ValueError — состояние не помещается в одно сообщение."""
+        message = json.dumps(state, ensure_ascii=False).encode('utf-8')
+        if len(message) > HANDOFF_SIZE:
+            raise ValueError("handoff state too large")
+        socket.send_fds(self.control, [message], [sock.fileno()])
+
+    def close(self) -> None:
+        if self.control is not None:
+            self.control.close()
+            self.control = None
+
+
+class Supervisor:
+    """Принимает соединения и раздаёт их процессам по имени аккаунта.
+
+    Состояние и запись файлов аккаунта всегда в одном процессе,
+    поэтому процессам не нужно договариваться между собой. Упавший
+    обработчик перезапускается; игроки других процессов этого не замечают.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 workers: int = WORKERS, idle_timeout: float = IDLE_TIMEOUT,
+                 step_workers: int = STEP_WORKERS, metrics_port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.step_workers = step_workers
+        self.metrics_port = metrics_port
+        self.workers: List[Worker] = [Worker(i) for i in range(max(1, workers))]
+        # Один секрет кодов возврата на все обработчики
+        env_secret = os.environ.get("TAJNA_RESUME_SECRET")
+        self.secret = env_secret.encode('utf-8') if env_secret else os.urandom(32)
+        # spawn: обработчик не наследует слушающий сокет и чужие соединения
+        self._context = multiprocessing.get_context("spawn")
+        self._pending = set()
+        self._stopping: Optional[asyncio.Event] = None
+
+    def _start(self, worker: Worker) -> None:
+        worker.start(self._context, self.idle_timeout, self.step_workers, self.metrics_port,
+                     self.secret)
+        asyncio.get_running_loop().add_reader(worker.process.sentinel, self._exited, worker)
+
+    def _exited(self, worker: Worker) -> None:
+        loop = asyncio.get_running_loop()
+        loop.remove_reader(worker.process.sentinel)
+        worker.process.join()
+        worker.close()
+        if self._stopping.is_set():
+            return
+        worker.restarts += 1
+        print(f"  ⚠️ Обработчик {worker.index} завершился (код {worker.process.exitcode}),"
+              f" перезапуск", file=sys.stderr)
+        loop.call_later(RESTART_DELAY, self._restart, worker)
+
+    def _restart(self, worker: Worker) -> None:
+        if not self._stopping.is_set():
+            self._start(worker)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        conn = TelnetConnection(reader, writer, asyncio.get_running_loop())
+        self._pending.add(conn)
+        conn.negotiate()
+        try:
+            name = ""
+            while not name:
+                conn.write("\n  👤 Имя аккаунта (или код возврата): ")
+                line = (await conn.readline(LOGIN_TIMEOUT)).strip()
+                if "." in line:
+                    line = token_name(line) or ""
+                name = safe_name(line)
+
+            worker = self.workers[route(name, len(self.workers))]
+            if not worker.alive:
+                conn.write("\n  ⏳ Сервер перезапускается, зайдите через минуту.\n")
+                return
+            # Всё, что придёт дальше, должен прочитать уже обработчик
+            state = conn.handoff()
+            state["account"] = name
+            try:
+                worker.hand_over(writer.get_extra_info("socket"), state)
+            except OSError:
+                conn.write("\n  ⏳ Сервер перезапускается, зайдите через минуту.\n")
+            except ValueError:
+                # До входа клиент прислал больше, чем бывает ввода
+                pass
+        except (asyncio.TimeoutError, EOFError, ConnectionError):
+            pass
+        finally:
+            self._pending.discard(conn)
+            # Копия сокета у обработчика остаётся открытой
+            await conn.close()
+
+    async def serve(self) -> None:
+        """Запустить обработчики и принимать соединения до SIGINT/SIGTERM."""
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        for worker in self.workers:
+            self._start(worker)
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"  🌲 Сервер запущен: {self.host}:{self.port}, процессов: {len(self.workers)}",
+              file=sys.stderr)
+
+        await self._stopping.wait()
+        server.close()
+        await server.wait_closed()
+        for conn in list(self._pending):
+            conn.close_input()
+        await self.shutdown_workers()
+
+    def stop(self) -> None:
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def shutdown_workers(self) -> None:
+        """Остановить обработчики: каждый завершает сессии и дописывает сохранения."""
+        loop = asyncio.get_running_loop()
+        running = [w for w in self.workers if w.process is not None and w.process.is_alive()]
+        for worker in running:
+            loop.remove_reader(worker.process.sentinel)
+            worker.process.terminate()
+        for worker in running:
+            await loop.run_in_executor(None, worker.process.join, SHUTDOWN_TIMEOUT * 2)
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Сервер игры на нескольких процессах")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="число процессов")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="секунд без ввода до отключения")
+    parser.add_argument("--step-workers", type=int, default=STEP_WORKERS,
+                        help="потоков на процесс")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="метрики процесса N — на порту metrics-port + N (0 — выключены)")
+    args = parser.parse_args(argv)
+
+    supervisor = Supervisor(args.host, args.port, args.workers, args.idle_timeout,
+                            args.step_workers, args.metrics_port)
+    asyncio.run(supervisor.serve())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
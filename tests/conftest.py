@@ -0,0 +1,23 @@
+import os
+import sys
+
+# Дешёвый scrypt и запись аккаунта в том же потоке — до импорта модулей игры
+os.environ.setdefault("TAJNA_SCRYPT_N", "1024")
+os.environ.setdefault("TAJNA_SYNC_SAVES", "1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import storage
+
+
+@pytest.fixture(autouse=True)
+def save_dir(tmp_path, monkeypatch):
+    """Каждый тест пишет аккаунты во временный каталог."""
+    from game_state import account_index
+
+    monkeypatch.setattr(storage, "SAVE_DIR", str(tmp_path))
+    account_index.invalidate()
+    yield str(tmp_path)
+    account_index.invalidate()
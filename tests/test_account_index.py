@@ -0,0 +1,54 @@
+import storage
+from account_index import AccountIndex
+from flow import run_flow
+from game_state import GameManager, GameState, account_index
+
+
+def create(name, password="pw"):
+    manager = GameManager()
+    assert run_flow(None, manager.create_account(name, password))
+    return manager
+
+
+def test_entries_are_bounded():
+    for i in range(5):
+        create(f"user{i}")
+    index = AccountIndex(storage.locate, size=3)
+    for i in range(5):
+        assert index.lookup(f"user{i}") is not None
+    assert list(index._entries) == ["user2", "user3", "user4"]
+
+    # Недавно запрошенное имя вытесняется последним
+    index.lookup("user2")
+    index.lookup("user0")
+    assert list(index._entries) == ["user4", "user2", "user0"]
+
+
+def test_missing_names_are_bounded():
+    index = AccountIndex(storage.locate, missing_size=10)
+    for i in range(100):
+        assert index.lookup(f"ghost{i}") is None
+    assert len(index._missing) == 10
+    assert "ghost99" in index._missing
+
+
+def test_index_keeps_no_section_data():
+    manager = create("anna")
+    manager.current_state = GameState(class_id="иван", current_location="reka")
+    assert manager.save_game()
+
+    entry = account_index.lookup("anna")
+    assert not hasattr(entry, "sections")
+    assert entry.password_hash == manager.password_hash
+
+
+def test_login_reads_sections_from_file():
+    manager = create("anna", "secret")
+    manager.current_state = GameState(class_id="иван", current_location="reka")
+    assert manager.save_game()
+    assert account_index.lookup("anna") is not None
+
+    player = GameManager()
+    assert run_flow(None, player.login("anna", "secret"))
+    assert player.saved_state.current_location == "reka"
+    assert not run_flow(None, GameManager().login("anna", "wrong"))
@@ -0,0 +1,133 @@
+from flow import run_flow
+from game_state import GameManager, GameState, empty_stats, merge_stats
+
+
+def create(name, password="pw"):
+    manager = GameManager()
+    assert run_flow(None, manager.create_account(name, password))
+    return manager
+
+
+def load(name):
+    manager = GameManager()
+    assert manager.load_account(name, cache=False)
+    return manager
+
+
+def test_merge_stats_applies_our_changes_over_theirs():
+    base = empty_stats()
+    ours = dict(empty_stats(), defeats=2, total_games=3)
+    ours["victories"]["иван"].append("вода")
+    theirs = dict(empty_stats(), defeats=1, total_games=1)
+    theirs["victories"]["иван"].append("дым")
+
+    merged = merge_stats(base, ours, theirs)
+    assert merged["defeats"] == 3
+    assert merged["total_games"] == 4
+    assert merged["victories"]["иван"] == ["дым", "вода"]
+    # theirs не меняется
+    assert theirs["victories"]["иван"] == ["дым"]
+
+
+def test_merge_stats_does_not_duplicate_paths():
+    base = empty_stats()
+    ours = empty_stats()
+    ours["victories"]["слуга"].append("тьма")
+    theirs = empty_stats()
+    theirs["victories"]["слуга"].append("тьма")
+    assert merge_stats(base, ours, theirs)["victories"]["слуга"] == ["тьма"]
+
+
+def test_each_write_bumps_the_version():
+    manager = create("anna")
+    assert load("anna")._version == 1
+    manager.stats["defeats"] += 1
+    assert manager._save_account()
+    assert manager._version == 2
+    assert load("anna")._version == 2
+
+
+def test_concurrent_writers_merge_stats():
+    create("anna")
+    first = load("anna")
+    second = load("anna")
+
+    first.stats["defeats"] += 1
+    first.stats["total_games"] += 1
+    assert first._save_account()
+
+    # Вторая сессия пишет поверх устаревшей версии — её изменения сливаются
+    second.stats["total_games"] += 1
+    second.stats["victories"]["василиса"].append("вода")
+    assert second._save_account()
+
+    stats = load("anna").stats
+    assert stats["defeats"] == 1
+    assert stats["total_games"] == 2
+    assert stats["victories"]["василиса"] == ["вода"]
+    assert second.stats == stats
+
+
+def test_create_refuses_existing_account():
+    create("anna")
+    assert not run_flow(None, GameManager().create_account("anna", "other"))
+
+
+def test_stale_writer_keeps_sections_saved_elsewhere():
+    create("anna")
+    first = load("anna")
+    second = load("anna")
+
+    second.current_state = GameState(class_id="иван", current_location="reka")
+    assert second.save_game()
+    assert second.save_to_slot("1", "у реки")
+    second.push_history("у реки")
+
+    # Первая сессия меняет только статистику поверх устаревшей версии
+    first.stats["defeats"] += 1
+    assert first._save_account()
+    assert first.save_conflicts == []
+
+    fresh = load("anna")
+    assert fresh.stats["defeats"] == 1
+    assert fresh.saved_state.current_location == "reka"
+    assert fresh.slots["1"]["label"] == "у реки"
+    assert len(fresh.history) == 1
+    # Записанные другой сессией секции видны и в первой
+    assert first.saved_state.current_location == "reka"
+    assert "1" in first.slots
+
+
+def test_sections_changed_on_both_sides_conflict():
+    create("anna")
+    first = load("anna")
+    second = load("anna")
+
+    second.current_state = GameState(class_id="иван", current_location="reka")
+    assert second.save_game()
+
+    first.current_state = GameState(class_id="слуга", current_location="boloto")
+    first.stats["total_games"] += 1
+    assert not first.save_game()
+    assert first.save_conflicts == ["saved_game"]
+
+    # Чужое сохранение не перезаписано, статистика записана
+    fresh = load("anna")
+    assert fresh.saved_state.current_location == "reka"
+    assert fresh.stats["total_games"] == 1
+    assert first.saved_state.current_location == "reka"
+
+    # Повторное сохранение заменяет его уже сознательно
+    assert first.save_game()
+    assert first.save_conflicts == []
+    assert load("anna").saved_state.current_location == "boloto"
+
+
+def test_same_change_on_both_sides_is_not_a_conflict():
+    create("anna")
+    first = load("anna")
+    second = load("anna")
+    for manager in (first, second):
+        manager.current_state = GameState(class_id="иван", current_location="reka")
+        assert manager.save_game()
+    assert second.save_conflicts == []
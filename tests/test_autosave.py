@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+import game_state
+from autosave import SaveWriter
+from flow import run_flow
+from game_state import GameManager
+
+
+class Gate:
+    """Запись, которая ждёт разрешения: пока она идёт, поток записи занят."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.started.set()
+        return self.release.wait(5)
+
+
+@pytest.fixture
+def writer():
+    return SaveWriter()
+
+
+def test_pending_writes_of_one_owner_coalesce_to_the_latest(writer):
+    gate = Gate()
+    done = []
+    writer.submit("anna", gate)
+    assert gate.started.wait(5)
+    # Пока первая запись идёт, три новых ждут — выполнится только последняя
+    for i in range(3):
+        writer.submit("anna", lambda i=i: done.append(i) or True)
+    assert writer.coalesced == 2
+    gate.release.set()
+    assert writer.flush("anna", 5)
+    assert done == [2]
+    assert writer.written == 2
+
+
+def test_owners_do_not_coalesce_with_each_other(writer):
+    gate = Gate()
+    done = []
+    writer.submit("anna", gate)
+    assert gate.started.wait(5)
+    writer.submit("boris", lambda: done.append("boris") or True)
+    writer.submit("vera", lambda: done.append("vera") or True)
+    assert writer.coalesced == 0
+    gate.release.set()
+    assert writer.flush(None, 5)
+    assert done == ["boris", "vera"]
+
+
+def test_flush_waits_only_for_its_owner(writer):
+    gate = Gate()
+    writer.submit("anna", gate)
+    assert gate.started.wait(5)
+    # Чужая запись не задерживает: у boris ничего не ждёт
+    assert writer.flush("boris", 0)
+    # Своя запись ещё идёт — за время ожидания не закончилась
+    assert not writer.flush("anna", 0.05)
+    assert not writer.flush(None, 0.05)
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(writer.flush("anna", 5)))
+    waiter.start()
+    gate.release.set()
+    waiter.join(5)
+    assert results == [True]
+
+
+def test_failed_write_is_reported_once(writer):
+    writer.submit("anna", lambda: False)
+    writer.submit("boris", lambda: 1 / 0)
+    assert not writer.flush("anna", 5)
+    assert writer.flush("anna", 5)
+    assert not writer.flush(None, 5)
+    assert writer.flush(None, 5)
+
+
+def test_background_saves_of_a_session_coalesce(writer, monkeypatch):
+    monkeypatch.setattr(game_state, "BACKGROUND_SAVES", True)
+    monkeypatch.setattr(game_state, "save_writer", writer)
+    manager = GameManager()
+    assert run_flow(None, manager.create_account("anna", "pw"))
+    manager.new_game("иван")
+
+    gate = Gate()
+    writer.submit(manager, gate)
+    assert gate.started.wait(5)
+    assert manager.save_to_slot("1", "первый")
+    manager.current_state.hp = 7
+    assert manager.save_to_slot("2", "второй")
+    assert manager.save_game()
+    assert writer.coalesced == 2
+
+    gate.release.set()
+    # Барьер: после flush_saves на диске последнее состояние сессии
+    assert manager.flush_saves(5)
+    assert writer.written == 2
+    saved = GameManager()
+    assert saved.load_account("anna", cache=False)
+    assert sorted(saved.slots) == ["1", "2"]
+    assert saved.slots["2"]["state"]["hp"] == 7
+    assert saved.saved_state.hp == 7
@@ -0,0 +1,110 @@
+import io
+import os
+
+import pytest
+
+import save_format
+import storage
+from backup import BackupError, export_accounts, import_accounts
+from flow import run_flow
+from game_state import GameManager, GameState, account_index
+
+
+def create(name, password="pw"):
+    manager = GameManager()
+    assert run_flow(None, manager.create_account(name, password))
+    return manager
+
+
+def load(name):
+    manager = GameManager()
+    return manager if manager.load_account(name, cache=False) else None
+
+
+@pytest.fixture
+def accounts(save_dir):
+    anna = create("anna")
+    anna.current_state = GameState(class_id="иван", current_location="reka")
+    assert anna.save_game()
+    anna.stats["defeats"] = 4
+    assert anna._save_account()
+    create("boris")
+
+    # Аккаунт старой плоской раскладки — файл прямо в SAVE_DIR
+    vera = create("vera")
+    path = storage.locate("vera")
+    os.replace(path, os.path.join(save_dir, os.path.basename(path)))
+    account_index.invalidate()
+
+    # Служебный файл в корне не аккаунт
+    with open(os.path.join(save_dir, "global_stats.json"), "w") as f:
+        f.write("{}")
+    return {"anna": anna.password_hash, "boris": None, "vera": vera.password_hash}
+
+
+def fresh_dir(tmp_path, monkeypatch, name="restored"):
+    target = tmp_path / name
+    target.mkdir()
+    monkeypatch.setattr(storage, "SAVE_DIR", str(target))
+    account_index.invalidate()
+
+
+def export(fmt):
+    out = io.BytesIO()
+    count = export_accounts(out, fmt, workers=2)
+    # Формат потока определяется по заголовку через peek()
+    return count, io.BufferedReader(io.BytesIO(out.getvalue()))
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "binary"])
+def test_round_trip(accounts, fmt, tmp_path, monkeypatch):
+    count, stream = export(fmt)
+    assert count == 3
+
+    fresh_dir(tmp_path, monkeypatch)
+    assert import_accounts(stream, workers=2) == {"restored": 3, "skipped": 0, "failed": 0}
+
+    anna = load("anna")
+    assert anna.password_hash == accounts["anna"]
+    assert anna.stats["defeats"] == 4
+    assert anna.saved_state.current_location == "reka"
+    assert load("vera").password_hash == accounts["vera"]
+    assert not load("boris").has_saved_game()
+    assert sorted(storage.list_accounts()) == ["anna", "boris", "vera"]
+
+
+def test_existing_accounts_are_skipped_unless_overwrite(accounts):
+    _, stream = export("binary")
+    assert import_accounts(stream, workers=2)["skipped"] == 3
+
+    _, stream = export("binary")
+    assert import_accounts(stream, overwrite=True, workers=2)["restored"] == 3
+
+
+def test_corrupted_stream_is_rejected(accounts):
+    _, stream = export("jsonl")
+    original = stream.read()
+    data = original.replace(b'"defeats": 4', b'"defeats": 5')
+    assert data != original
+    with pytest.raises(BackupError):
+        import_accounts(io.BufferedReader(io.BytesIO(data)), workers=2)
+
+
+def test_truncated_binary_stream_is_rejected(accounts):
+    _, stream = export("binary")
+    data = stream.read()[:-10]
+    with pytest.raises(BackupError):
+        import_accounts(io.BufferedReader(io.BytesIO(data)), workers=2)
+
+
+
+def test_account_in_both_formats_is_exported_once(accounts):
+    path = storage.locate("anna")
+    with open(path, "rb") as f:
+        record = save_format.decode_record(f.read())
+    with open(os.path.splitext(path)[0] + save_format.JSON_EXT, "wb") as f:
+        f.write(save_format.encode_record(record, "json"))
+
+    count, stream = export("jsonl")
+    assert count == 3
+    assert sum(line.startswith(b'{"name": "anna"') for line in stream) == 1
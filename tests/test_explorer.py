@@ -0,0 +1,54 @@
+from collections import deque
+
+import pytest
+
+import explorer
+import heroes
+from heroes import create_hero
+
+
+def outcomes(run):
+    """Все исходы run() по всем развилкам бросков, как в explorer.visit."""
+    found = []
+    pending = deque([[]])
+    while pending:
+        decisions = pending.popleft()
+        explorer._chooser = explorer.Chooser(decisions)
+        try:
+            found.append((decisions, run()))
+        except explorer.NeedDecision as need:
+            pending.extend(decisions + [option] for option in need.options)
+    return found
+
+
+@pytest.fixture(autouse=True)
+def outcome_random(monkeypatch):
+    monkeypatch.setattr(heroes, "random", explorer.OutcomeRandom())
+    yield
+    explorer._chooser = None
+
+
+def test_every_threshold_interval_is_visited():
+    def avos():
+        hero = create_hero("иван")
+        hero.hp = 1
+        target = create_hero("слуга")
+        # Уворот бросается в core, не в heroes — пусть не мешает
+        target.agility = 0
+        return hero._perform_ability(2, target)
+
+    found = outcomes(avos)
+    assert len(found) == 3
+    assert "урона" in found[0][1]
+    assert "Полное исцеление" in found[1][1]
+    assert "Сила +10" in found[2][1]
+    assert [decisions for decisions, _ in found] == [["<0.33"], ["≥0.33", "<0.66"], ["≥0.33", "≥0.66"]]
+
+
+def test_roll_branches_only_where_undecided():
+    def compare():
+        roll = explorer.OutcomeRandom().random()
+        return (roll < 0.5, roll < 0.7, roll >= 0.2)
+
+    results = [result for _, result in outcomes(compare)]
+    assert results == [(True, True, False), (True, True, True), (False, True, True), (False, False, True)]
@@ -0,0 +1,93 @@
+from fingerprint import field_hash, mapping_fingerprint
+from game_state import SAVE_FIELDS, GameManager, GameState
+from heroes import create_hero
+
+
+def make_state():
+    return GameState(class_id="иван", player_name="Аня", inventory=[{"name": "Зелье"}],
+                     visited_locations=["opushka", "reka"])
+
+
+def test_matches_full_mapping_fingerprint():
+    state = make_state()
+    assert state.fingerprint() == mapping_fingerprint(state.to_dict())
+
+
+def test_assignment_invalidates_cached_field():
+    state = make_state()
+    before = state.fingerprint()
+    state.hp = 50
+    after = state.fingerprint()
+    assert after != before
+    assert after == mapping_fingerprint(state.to_dict())
+    state.hp = 100
+    assert state.fingerprint() == before
+
+
+def test_equal_assignment_keeps_cached_hash():
+    state = make_state()
+    state.fingerprint()
+    cached = state._hashes["visited_locations"]
+    state.visited_locations = ["opushka", "reka"]
+    assert state._hashes["visited_locations"] == cached
+
+
+def test_new_list_is_rehashed():
+    state = make_state()
+    before = state.fingerprint()
+    state.visited_locations = state.visited_locations + ["izba"]
+    assert state.fingerprint() != before
+
+
+def test_copy_keeps_hashes_and_stays_independent():
+    state = make_state()
+    key = state.fingerprint()
+    clone = state.copy()
+    assert clone._hashes == state._hashes
+    clone.strength = 99
+    assert clone.fingerprint() != key
+    assert state.fingerprint() == key
+    assert state.copy(deep=False).fingerprint() == key
+
+
+def test_player_name_and_set_order_are_ignored():
+    state = make_state()
+    other = make_state()
+    other.player_name = "Боря"
+    other.visited_locations = ["reka", "opushka"]
+    assert other.fingerprint() == state.fingerprint()
+
+
+def test_duplicates_in_sets_count():
+    state = make_state()
+    other = make_state()
+    other.inventory = [{"name": "Зелье"}, {"name": "Зелье"}]
+    assert other.fingerprint() != state.fingerprint()
+    assert field_hash("inventory", [1, 1]) != field_hash("inventory", [1])
+
+
+def test_field_subset():
+    state = make_state()
+    key = state.fingerprint(SAVE_FIELDS)
+    state.agility = 1
+    assert state.fingerprint(SAVE_FIELDS) == key
+    state.hp = 1
+    assert state.fingerprint(SAVE_FIELDS) != key
+
+
+def test_save_detection_follows_fingerprint():
+    manager = GameManager()
+    manager.current_state = make_state()
+    assert manager.can_save()
+    manager.saved_state = manager.current_state.copy()
+    assert not manager.can_save()
+    manager.current_state.current_location = "reka"
+    assert manager.can_save()
+
+
+def test_hero_fingerprint_tracks_state():
+    hero = create_hero("слуга")
+    key = hero.fingerprint()
+    assert create_hero("слуга").fingerprint() == key
+    hero.hp -= 10
+    assert hero.fingerprint() != key
@@ -0,0 +1,31 @@
+import inspect
+
+import pytest
+
+from flow import run_flow
+from heroes import create_hero
+from locations import LOCATIONS, Location, LocationResult
+from session import Session
+
+
+class SilentIO:
+    def print(self, *args, **kwargs):
+        pass
+
+    def input(self, prompt=""):
+        raise EOFError
+
+
+@pytest.mark.parametrize("location", LOCATIONS.values(), ids=LOCATIONS.keys())
+def test_location_enter_is_a_flow(location):
+    assert inspect.isgeneratorfunction(type(location).enter)
+
+
+def test_base_enter_marks_visit():
+    session = Session(io=SilentIO())
+    session.hero = create_hero("иван")
+    location = Location("test", "Тест", "впервые", "снова")
+    result = run_flow(session.io, location.enter(session))
+    assert isinstance(result, LocationResult)
+    assert session.hero.has_visited("test")
+
@@ -0,0 +1,267 @@
+import asyncio
+import importlib
+import itertools
+import os
+import re
+
+import pytest
+
+import journal
+import main as game
+import server
+import storage
+from channels import InputSource, IOChannel
+from flow import BATTLE, WAIT, Prompt
+from game_state import account_index
+from hibernate import SessionStore
+from resume import resume_cache
+from session import Session
+
+# Регистрация, новая игра за Ивана, развилка, река, бой с Водяным
+ANSWERS = ["2", "alice", "pwd", "pwd", "1", "1", "", "", "1", "", "1", "1", "1", "1", "1"]
+# Перед этим ответом игрок надолго задумался — посреди боя
+PAUSE_AT = 13
+
+
+class Out:
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def flush(self):
+        pass
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+
+class Transport:
+    def pause_reading(self):
+        pass
+
+
+class Writer:
+    """Заменяет StreamWriter: копит отправленные байты."""
+
+    def __init__(self):
+        self.sent = bytearray()
+        self.transport = Transport()
+
+    def is_closing(self):
+        return False
+
+    def write(self, data):
+        self.sent += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+    def get_extra_info(self, name):
+        return None
+
+
+@pytest.fixture(autouse=True)
+def story_random(monkeypatch):
+    """Кости сюжета — генераторы сессий, как на сервере."""
+    for name in journal.STORY_MODULES:
+        monkeypatch.setattr(importlib.import_module(name), "random", journal.SESSION_RANDOM)
+    monkeypatch.setattr(resume_cache, "_secret", b"test")
+    monkeypatch.setattr(resume_cache, "clock", lambda: 1000)
+
+
+@pytest.fixture
+def fresh_dir(save_dir, monkeypatch):
+    """Чистый каталог аккаунтов и те же зёрна для каждого прогона."""
+    runs = itertools.count()
+
+    def use():
+        monkeypatch.setattr(storage, "SAVE_DIR", os.path.join(save_dir, str(next(runs))))
+        account_index.invalidate()
+        seeds = itertools.count(1)
+        monkeypatch.setattr(journal, "new_seed", lambda: next(seeds))
+    return use
+
+
+def advance(session, flow, answer=None):
+    prompt = server.advance_session(session, flow, answer)
+    while prompt is not None and prompt.kind == WAIT:
+        prompt = server.advance_session(session, flow, prompt.future.result())
+    return prompt
+
+
+def play(pause_at=None, pending=None):
+    """Пройти ANSWERS; перед ответом pause_at выгрузить и поднять сессию."""
+    out = Out()
+    io = IOChannel(InputSource(), out=out)
+    session = Session(io=io)
+    flow = game.play(session)
+    prompt = advance(session, flow)
+    resumed = None
+    for i, answer in enumerate(ANSWERS):
+        io.write(prompt.text)
+        io.flush()
+        if i == pause_at:
+            assert session.manager.journal.ready
+            path = server.hibernate_session(session, flow, pending or prompt, "test")
+            assert os.path.exists(path)
+            session, flow, resumed = server.wake_session(io, path)
+            assert not os.path.exists(path)
+            if not resumed:
+                prompt = advance(session, flow)
+                continue
+        session.manager.journal.record(answer)
+        prompt = advance(session, flow, answer)
+    io.write(prompt.text)
+    io.flush()
+    return out.text, prompt, resumed
+
+
+def test_woken_session_continues_at_the_same_prompt(fresh_dir):
+    fresh_dir()
+    expected, prompt, _ = play()
+    fresh_dir()
+    text, woken_prompt, resumed = play(pause_at=PAUSE_AT)
+    assert resumed
+    assert woken_prompt == prompt
+    # Бой идёт дальше с теми же бросками, вывод тот же
+    assert text == expected
+
+
+def test_diverged_replay_restarts_the_location(fresh_dir):
+    fresh_dir()
+    text, prompt, resumed = play(pause_at=PAUSE_AT, pending=Prompt("другое", BATTLE))
+    assert resumed is False
+    assert "Игра продолжается" in text
+
+
+def test_menu_stops_journal_until_next_checkpoint(fresh_dir):
+    fresh_dir()
+    io = IOChannel(InputSource(), out=Out())
+    session = Session(io=io)
+    flow = game.play(session)
+    prompt = advance(session, flow)
+    for answer in ANSWERS[:PAUSE_AT - 3]:
+        session.manager.journal.record(answer)
+        prompt = advance(session, flow, answer)
+    assert session.manager.journal.ready
+    advance(session, flow, "0")
+    assert not session.manager.journal.ready
+
+
+async def serve(lines, pause_at=None, tail=True, hibernate_after=60.0):
+    """Сыграть через GameServer.handle; после pause_at строк ждать выгрузки."""
+    srv = server.GameServer(idle_timeout=30, metrics_port=0, hibernate_after=hibernate_after)
+    reader, writer = asyncio.StreamReader(), Writer()
+    task = asyncio.ensure_future(srv.handle(reader, writer))
+    cut = len(lines) if pause_at is None else pause_at
+    reader.feed_data("".join(line + "\r\n" for line in lines[:cut]).encode('utf-8'))
+    asleep = 0
+    if pause_at is not None:
+        for _ in range(200):
+            await asyncio.sleep(0.02)
+            if srv.asleep:
+                break
+        asleep = srv.asleep
+        if tail:
+            reader.feed_data("".join(line + "\r\n" for line in lines[cut:]).encode('utf-8'))
+    reader.feed_eof()
+    await asyncio.wait_for(task, 10)
+    srv.pool.shutdown()
+    return writer.sent.decode('utf-8', 'replace'), asleep, srv.asleep
+
+
+def test_server_hibernates_idle_connection_and_wakes_on_input(fresh_dir):
+    fresh_dir()
+    expected, _, _ = asyncio.run(serve(ANSWERS))
+    fresh_dir()
+    text, asleep, after = asyncio.run(serve(ANSWERS, PAUSE_AT, hibernate_after=0.05))
+    assert (asleep, after) == (1, 0)
+    assert text == expected
+    assert "Игра продолжается" not in text
+
+
+def test_disconnect_while_asleep_keeps_resume_code(fresh_dir):
+    fresh_dir()
+    text, asleep, after = asyncio.run(serve(ANSWERS, PAUSE_AT, tail=False, hibernate_after=0.05))
+    assert (asleep, after) == (1, 0)
+    assert os.listdir(os.path.join(storage.SAVE_DIR, "hibernate")) == []
+    token = re.search(r"Код возврата \(действует \d+ мин\): (\S+)", text).group(1)
+    name, manager = resume_cache.lookup(token)
+    # Сессия отпущена, как при обычном разрыве связи: возврат идёт в бой заново
+    assert name == "alice" and manager is not None
+    assert manager.hero is not None
+
+
+
+class Blob:
+    """Сессия для SessionStore: снимок — её данные."""
+
+    def __init__(self, data=b"x"):
+        self.data = data
+
+    def snapshot(self):
+        return self.data
+
+    @classmethod
+    def from_snapshot(cls, data):
+        return cls(data)
+
+
+def make_store(**options):
+    """Хранилище без фонового потока: выгружает только sweep() теста."""
+    store = SessionStore(10, **options)
+    store._ensure_sweeper = lambda: None
+    return store
+
+
+def test_store_hibernates_only_detached_idle_sessions():
+    store = make_store(idle_after=0)
+    store.put("a", Blob(b"a"))
+    store.put("b", Blob(b"b"))
+    store.detach("a", store._slots["a"].session)
+
+    assert store.sweep() == 1
+    assert store.resident() == 1
+    # Живую сессию никто не забирает, выгруженная поднимается из снимка
+    assert store.claim("b") is None
+    woken = store.claim("a")
+    assert woken.data == b"a"
+    assert store.resident() == 2
+    assert os.listdir(os.path.join(storage.SAVE_DIR, "hibernate")) == []
+
+
+def test_store_keeps_resident_sessions_within_budget():
+    store = make_store(idle_after=3600, resident_limit=2)
+    sessions = [Blob() for _ in range(4)]
+    for i, session in enumerate(sessions):
+        store.put(str(i), session)
+        store.detach(str(i), session)
+    store.sweep()
+    # Сверх бюджета выгружаются самые давние
+    assert store.resident() == 2
+    assert store._slots["0"].session is None and store._slots["3"].session is sessions[3]
+
+
+def test_store_does_not_hibernate_session_claimed_while_writing(monkeypatch):
+    store = make_store(idle_after=0)
+    session = Blob()
+    store.put("a", session)
+    store.detach("a", session)
+
+    def claim_during_snapshot():
+        # Пока пишется снимок, сессию забирает вернувшийся игрок
+        assert store.claim("a") is session
+        return b"x"
+    monkeypatch.setattr(session, "snapshot", claim_during_snapshot)
+    assert store.sweep() == 0
+    assert store._slots["a"].session is session
+    assert os.listdir(os.path.join(storage.SAVE_DIR, "hibernate")) == []
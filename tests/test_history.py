@@ -0,0 +1,85 @@
+import pytest
+
+from history import SaveHistory, apply_delta, make_delta
+
+
+def state(step):
+    return {
+        "hp": 100 - step,
+        "current_location": f"loc{step}",
+        "visited_locations": [f"loc{i}" for i in range(step + 1)],
+        "npc_relations": {f"npc{i}": "друг" for i in range(step)},
+        "game_flags": {"step": step} if step % 2 else {},
+    }
+
+
+def test_delta_round_trip():
+    prev, cur = state(2), state(5)
+    cur["extra"] = 1
+    prev["gone"] = True
+    assert apply_delta(prev, make_delta(prev, cur)) == cur
+
+
+def test_list_delta_keeps_common_prefix():
+    delta = make_delta(state(2), state(3))
+    assert delta["visited_locations"] == {"op": "list", "keep": 3, "tail": ["loc3"]}
+
+
+def test_apply_delta_does_not_touch_previous_state():
+    prev = state(1)
+    apply_delta(prev, make_delta(prev, state(4)))
+    assert prev == state(1)
+
+
+def test_history_reconstructs_every_snapshot():
+    history = SaveHistory(limit=10)
+    for step in range(6):
+        assert history.push(state(step), f"шаг {step}")
+    assert len(history) == 6
+    for step in range(6):
+        assert history.get(step) == state(step)
+
+
+def test_repeated_snapshot_is_skipped():
+    history = SaveHistory()
+    assert history.push(state(1), "a")
+    assert not history.push(state(1), "b")
+    assert len(history) == 1
+
+
+def test_oldest_snapshots_are_dropped_over_limit():
+    history = SaveHistory(limit=3)
+    for step in range(7):
+        history.push(state(step), f"шаг {step}")
+    assert history.labels == ["шаг 4", "шаг 5", "шаг 6"]
+    assert [history.get(i) for i in range(3)] == [state(4), state(5), state(6)]
+    with pytest.raises(IndexError):
+        history.get(3)
+
+
+def test_history_survives_serialization():
+    history = SaveHistory()
+    for step in range(4):
+        history.push(state(step), f"шаг {step}")
+    restored = SaveHistory.from_dict(history.to_dict())
+    assert restored.labels == history.labels
+    for step in range(4):
+        assert restored.get(step) == state(step)
+    # После восстановления новые снимки продолжают цепочку разниц
+    restored.push(state(9), "шаг 9")
+    assert restored.get(3) == state(3)
+    assert restored.get(4) == state(9)
+
+
+def test_map_states_rewrites_all_snapshots():
+    history = SaveHistory()
+    for step in range(3):
+        history.push(state(step), f"шаг {step}")
+
+    def heal(data):
+        return dict(data, hp=100), True
+
+    assert history.map_states(heal)
+    assert history.labels == ["шаг 0", "шаг 1", "шаг 2"]
+    assert [history.get(i)["hp"] for i in range(3)] == [100, 100, 100]
+    assert history.get(2)["current_location"] == "loc2"
@@ -0,0 +1,125 @@
+import json
+import threading
+
+import leaderboard as leaderboard_module
+import storage
+from account_index import AccountIndex
+from autosave import SaveWriter
+from flow import run_flow
+from game_state import GameManager, empty_stats
+from leaderboard import Leaderboard
+
+
+def stats(victories=(), defeats=0):
+    """Статистика аккаунта: victories — пары (класс, путь)."""
+    result = empty_stats()
+    for class_id, path in victories:
+        result["victories"][class_id].append(path)
+    result["total_games"] = len(victories) + defeats
+    result["defeats"] = defeats
+    return result
+
+
+def write_file(data):
+    with open(Leaderboard.path(), 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def test_games_are_added_to_totals_and_top():
+    board = Leaderboard()
+    board.record("anna", "иван", "вода", True, stats([("иван", "вода")]))
+    board.record("boris", "слуга", "", False, stats(defeats=1))
+    board.record("anna", "иван", "дым", True, stats([("иван", "вода"), ("иван", "дым")]))
+
+    data = board.load()
+    assert (data["total_games"], data["victories"], data["defeats"]) == (3, 2, 1)
+    assert data["classes"]["иван"] == {"games": 2, "victories": 2}
+    assert data["classes"]["слуга"] == {"games": 1, "victories": 0}
+    assert data["paths"] == {"вода": {"games": 1, "victories": 1},
+                             "дым": {"games": 1, "victories": 1}}
+    # У каждого имени одна строка, с последними очками
+    assert board.top() == [("anna", 2, 2), ("boris", 0, 0)]
+
+
+def test_pending_games_are_written_in_one_batch(monkeypatch):
+    writer = SaveWriter()
+    monkeypatch.setattr(leaderboard_module, "BACKGROUND_SAVES", True)
+    monkeypatch.setattr(leaderboard_module, "save_writer", writer)
+    board = Leaderboard()
+    writes = []
+    real_write = board._write
+    monkeypatch.setattr(board, "_write", lambda data: writes.append(1) or real_write(data))
+
+    # Поток записи занят чужой записью — игры копятся
+    started, release = threading.Event(), threading.Event()
+    writer.submit("other", lambda: started.set() or release.wait(5))
+    assert started.wait(5)
+    for i in range(5):
+        board.record(f"p{i}", "иван", "вода", True, stats([("иван", "вода")]))
+    release.set()
+
+    assert board.flush(5)
+    assert len(writes) == 1
+    assert writer.coalesced == 4
+    assert board.load()["total_games"] == 5
+
+
+def test_failed_write_keeps_games(monkeypatch):
+    board = Leaderboard()
+    real_write = storage.write_atomic
+
+    def broken(path, data):
+        raise IOError("диск полон")
+    monkeypatch.setattr(storage, "write_atomic", broken)
+    board.record("anna", "иван", "вода", True, stats([("иван", "вода")]))
+    assert board.load()["total_games"] == 0
+
+    monkeypatch.setattr(storage, "write_atomic", real_write)
+    board.record("boris", "иван", "", False, stats(defeats=1))
+    assert board.load()["total_games"] == 2
+
+
+def test_processes_writing_at_once_lose_no_games():
+    # Отдельные объекты — как таблицы разных процессов сервера
+    boards = [Leaderboard() for _ in range(4)]
+
+    def play(board, n):
+        for i in range(10):
+            board.record(f"p{n}", "иван", "", False, stats(defeats=i + 1))
+
+    threads = [threading.Thread(target=play, args=(board, n)) for n, board in enumerate(boards)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    data = boards[0].load()
+    assert data["total_games"] == data["defeats"] == 40
+    assert sorted(name for _, _, name in data["top"]) == ["p0", "p1", "p2", "p3"]
+
+
+def save_account(name, account_stats):
+    manager = GameManager()
+    assert run_flow(None, manager.create_account(name, "pw"))
+    manager.stats = account_stats
+    assert manager._save_account()
+
+
+def test_rebuild_recounts_accounts_and_keeps_newer_scores():
+    save_account("anna", stats([("иван", "вода")], defeats=2))
+    save_account("boris", stats([("слуга", "тьма"), ("слуга", "дым")]))
+    save_account("vera", empty_stats())
+    write_file({
+        "total_games": 99, "victories": 50, "defeats": 49,
+        "classes": {"иван": {"games": 7, "victories": 1}},
+        "paths": {"вода": {"games": 3, "victories": 1}},
+        # Игра anna, записанная после обхода, и удалённый аккаунт
+        "top": [[2, 2, "anna"], [5, 5, "ghost"]],
+    })
+
+    data = Leaderboard().rebuild(AccountIndex(storage.locate), workers=2)
+    assert (data["total_games"], data["victories"], data["defeats"]) == (5, 3, 2)
+    # Попытки по классам и путям в аккаунтах не хранятся — остаются прежними
+    assert data["classes"] == {"иван": {"games": 7, "victories": 1}}
+    assert data["paths"] == {"вода": {"games": 3, "victories": 1}}
+    assert data["top"] == [[2, 2, "boris"], [2, 2, "anna"], [0, 0, "vera"]]
+    assert Leaderboard().load() == data
@@ -0,0 +1,65 @@
+import save_format
+import storage
+from flow import run_flow
+from game_state import SCHEMA_VERSION, GameManager, GameState, migrate_state
+
+
+V0_STATE = {
+    "class_id": "василиса",
+    "player_name": "Аня",
+    "hp": 55,
+    "spells_used": [True],
+    "inventory": [{"name": "Зелье", "hp": 20}],
+}
+
+
+def test_v0_gets_class_defaults():
+    data, migrated = migrate_state(dict(V0_STATE))
+    assert migrated
+    assert data["schema_version"] == SCHEMA_VERSION
+    # Сохранённое значение не перетирается, недостающие — от класса героя
+    assert data["hp"] == 55
+    assert data["max_hp"] == 100
+    assert data["intellect"] == 25
+    assert data["mp"] == data["max_mp"] == 80
+    assert data["spells_used"] == [True, False, False]
+    item = data["inventory"][0]
+    assert item["name"] == "Зелье" and item["hp"] == 20
+    assert item["type"] == "misc" and item["usable"] and item["consumable"]
+
+
+def test_migration_does_not_modify_input():
+    original = dict(V0_STATE)
+    migrate_state(original)
+    assert original == V0_STATE
+
+
+def test_unknown_class_keeps_generic_defaults():
+    data, migrated = migrate_state({"class_id": "нет такого"})
+    assert migrated
+    assert "max_hp" not in data
+    assert GameState.from_dict(data).max_hp == 100
+
+
+def test_current_version_is_left_alone():
+    data = GameState(class_id="иван").to_dict()
+    result, migrated = migrate_state(data)
+    assert not migrated
+    assert result is data
+
+
+def test_old_saved_game_is_migrated_and_rewritten_on_load():
+    manager = GameManager()
+    assert run_flow(None, manager.create_account("anna", "pw"))
+    record = dict(manager.to_record(), version=manager._version, saved_game=V0_STATE)
+    storage.write_atomic(storage.locate("anna"), save_format.encode_record(record))
+
+    loaded = GameManager()
+    assert loaded.load_account("anna", cache=False)
+    assert loaded.saved_state.max_mp == 80
+    assert loaded.saved_state.schema_version == SCHEMA_VERSION
+
+    with open(storage.locate("anna"), "rb") as f:
+        on_disk = save_format.decode_record(f.read())
+    assert on_disk["saved_game"]["schema_version"] == SCHEMA_VERSION
+    assert on_disk["saved_game"]["max_mp"] == 80
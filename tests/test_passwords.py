@@ -0,0 +1,144 @@
+import hashlib
+import threading
+
+import passwords
+from flow import run_flow
+from game_state import GameManager, account_index
+from passwords import PasswordHasher, hash_password, verify_password
+
+
+def legacy(password):
+    return hashlib.sha256(password.encode('utf-8')).hexdigest()
+
+
+def old_scrypt(password):
+    """Хэш с прежними (меньшими) параметрами scrypt."""
+    n = passwords.SCRYPT_N
+    passwords.SCRYPT_N = n // 2
+    try:
+        return hash_password(password)
+    finally:
+        passwords.SCRYPT_N = n
+
+
+def create(name, password="pw", stored=None):
+    """Аккаунт; stored — хэш пароля, записанный вместо нового."""
+    manager = GameManager()
+    assert run_flow(None, manager.create_account(name, password))
+    if stored is not None:
+        manager.password_hash = stored
+        assert manager._save_account()
+        account_index.invalidate()
+
+
+def stored_hash(name):
+    manager = GameManager()
+    assert manager.load_account(name, cache=False)
+    return manager.password_hash
+
+
+def login(name, password):
+    return run_flow(None, GameManager().login(name, password))
+
+
+def test_current_hash_verifies_without_rehash():
+    stored = hash_password("секрет")
+    assert stored.startswith(f"scrypt${passwords.SCRYPT_N}$")
+    assert verify_password("секрет", stored) == (True, False)
+    assert verify_password("другой", stored) == (False, False)
+    # Соль своя у каждого хэша
+    assert hash_password("секрет") != stored
+
+
+def test_old_formats_verify_and_ask_for_rehash():
+    assert verify_password("pw", legacy("pw")) == (True, True)
+    assert verify_password("px", legacy("pw")) == (False, False)
+
+    old = old_scrypt("pw")
+    assert verify_password("pw", old) == (True, True)
+    assert verify_password("px", old) == (False, False)
+
+
+def test_malformed_hash_is_rejected():
+    assert verify_password("pw", "scrypt$x$8$1$AAAA$AAAA") == (False, False)
+    assert verify_password("pw", "scrypt$1024$8") == (False, False)
+
+
+def test_login_replaces_legacy_hash():
+    create("anna", stored=legacy("pw"))
+    assert login("anna", "pw")
+    stored = stored_hash("anna")
+    assert stored.startswith(f"scrypt${passwords.SCRYPT_N}$")
+    assert verify_password("pw", stored) == (True, False)
+
+    # Новый хэш уже с текущими параметрами — следующий вход его не меняет
+    assert login("anna", "pw")
+    assert stored_hash("anna") == stored
+
+
+def test_wrong_password_keeps_legacy_hash():
+    create("anna", stored=legacy("pw"))
+    assert not login("anna", "px")
+    assert stored_hash("anna") == legacy("pw")
+
+
+def test_login_replaces_hash_with_old_parameters():
+    old = old_scrypt("pw")
+    create("anna", stored=old)
+    assert login("anna", "pw")
+    assert stored_hash("anna") != old
+    assert verify_password("pw", stored_hash("anna")) == (True, False)
+
+
+def test_stale_session_does_not_restore_legacy_hash():
+    create("anna", stored=legacy("pw"))
+    stale = GameManager()
+    assert stale.load_account("anna", cache=False)
+    assert login("anna", "pw")
+    rehashed = stored_hash("anna")
+
+    # Сессия, открытая до входа, пишет поверх версии со старым хэшем
+    stale.stats["defeats"] += 1
+    assert stale._save_account()
+    assert stored_hash("anna") == rehashed
+    assert stale.password_hash == rehashed
+
+
+def test_concurrent_logins_with_legacy_hash():
+    create("anna", stored=legacy("pw"))
+    results = []
+
+    def enter():
+        results.append(login("anna", "pw"))
+
+    threads = [threading.Thread(target=enter) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert results == [True] * 4
+    # Какой бы вход ни записал хэш последним, он верный и новый
+    assert verify_password("pw", stored_hash("anna")) == (True, False)
+    assert login("anna", "pw")
+
+
+def test_full_queue_makes_submitter_wait():
+    hasher = PasswordHasher(workers=1, queue_size=1)
+    release = threading.Event()
+    first = hasher.submit(release.wait, 5)
+    second = hasher.submit(release.wait, 5)
+
+    submitted = threading.Event()
+
+    def third():
+        hasher.submit(lambda: None)
+        submitted.set()
+
+    thread = threading.Thread(target=third)
+    thread.start()
+    # Один хэш считается, второй в очереди — третий ждёт места
+    assert not submitted.wait(0.1)
+    release.set()
+    assert submitted.wait(5)
+    thread.join(5)
+    assert first.result(5) and second.result(5)
@@ -0,0 +1,65 @@
+import pytest
+
+from resume import ResumeCache, token_name
+
+
+class Session:
+    pass
+
+
+@pytest.fixture
+def cache():
+    cache = ResumeCache(ttl=60, secret=b"secret")
+    cache.clock = lambda: 1000.0
+    return cache
+
+
+def test_valid_token(cache):
+    session = Session()
+    token = cache.issue("Аня", session)
+    assert token_name(token) == "Аня"
+    # Пока сессию ведёт соединение, её не отдают
+    assert cache.lookup(token) == ("Аня", None)
+    cache.detach(token, session)
+    assert cache.lookup(" " + token + "\n") == ("Аня", session)
+    # Забранную сессию второй раз не отдают
+    assert cache.lookup(token) == ("Аня", None)
+
+
+def test_expired_token(cache):
+    session = Session()
+    token = cache.issue("anna", session)
+    cache.detach(token, session)
+    cache.clock = lambda: 1061.0
+    assert cache.lookup(token) is None
+    # Просроченная сессия убрана из кэша
+    cache.clock = lambda: 1000.0
+    assert cache.lookup(token) == ("anna", None)
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda t: t[:-1] + ("A" if t[-1] != "A" else "B"),
+    lambda t: "Ym9yaXM" + t[t.index("."):],
+    lambda t: t.replace(".1060.", ".9999."),
+    lambda t: t + ".x",
+    lambda t: "garbage",
+    lambda t: "",
+])
+def test_tampered_token(cache, tamper):
+    token = cache.issue("anna", Session())
+    assert cache.lookup(tamper(token)) is None
+
+
+@pytest.mark.parametrize("token", ["аня.1060.подпись", "YW5uYQ.1060.ÿÿÿÿ", "YW5uYQ.１０６０.abc"])
+def test_non_ascii_token(cache, token):
+    cache.issue("anna", Session())
+    assert cache.lookup(token) is None
+
+
+def test_token_from_another_secret(cache):
+    other = ResumeCache(ttl=60, secret=b"other")
+    other.clock = cache.clock
+    token = other.issue("anna", Session())
+    assert cache.lookup(token) is None
+    other.use_secret(b"secret")
+    assert cache.lookup(other.issue("anna", Session())) == ("anna", None)
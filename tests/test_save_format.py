@@ -0,0 +1,91 @@
+import pytest
+
+import save_format
+from save_format import LazySection, SaveFormatError, decode_record, encode_record
+
+
+RECORD = {
+    "version": 3,
+    "password_hash": "scrypt$abc",
+    "stats": {"victories": {"иван": ["вода"], "василиса": []}, "defeats": -2, "total_games": 300},
+    "saved_game": {
+        "hp": 42,
+        "ratio": 0.5,
+        "alive": True,
+        "dead": False,
+        "note": None,
+        "inventory": [
+            {"name": "Зелье", "hp": 20, "usable": True},
+            {"name": "Зелье", "hp": 20, "usable": True},
+            {"name": "Меч", "hp": 0, "usable": False},
+        ],
+    },
+}
+
+
+@pytest.mark.parametrize("fmt", ["binary", "json"])
+def test_round_trip(fmt):
+    assert decode_record(encode_record(RECORD, fmt)) == RECORD
+
+
+def test_none_sections_are_not_written():
+    data = encode_record(dict(RECORD, slots=None), "binary")
+    assert "slots" not in decode_record(data)
+
+
+def test_strings_and_dict_shapes_are_interned():
+    encoder = save_format._SectionEncoder()
+    encoder.encode(RECORD["saved_game"]["inventory"])
+    assert encoder.strings.count("Зелье") == 1
+    assert encoder.strings.count("name") == 1
+    # Одинаковые предметы — одна форма словаря
+    assert len(encoder.shapes) == 1
+
+
+def test_lazy_section_decodes_on_load():
+    record = decode_record(encode_record(RECORD, "binary"), lazy=["saved_game"])
+    section = record["saved_game"]
+    assert isinstance(section, LazySection)
+    assert section.raw is not None
+    assert section.load() == RECORD["saved_game"]
+    assert record["stats"] == RECORD["stats"]
+
+
+def test_untouched_lazy_section_is_copied_verbatim():
+    data = encode_record(RECORD, "binary")
+    record = decode_record(data, lazy=["saved_game"])
+    assert encode_record(record, "binary") == data
+
+
+def test_lazy_section_from_json():
+    record = decode_record(encode_record(RECORD, "json"), lazy=["saved_game"])
+    assert isinstance(record["saved_game"], LazySection)
+    assert decode_record(encode_record(record, "binary")) == RECORD
+
+
+def test_truncated_file_is_rejected():
+    data = encode_record(RECORD, "binary")
+    with pytest.raises(SaveFormatError):
+        decode_record(data[:-5])
+
+
+def test_newer_format_version_is_rejected():
+    data = bytearray(encode_record(RECORD, "binary"))
+    data[len(save_format.MAGIC)] = save_format.FORMAT_VERSION + 1
+    with pytest.raises(SaveFormatError):
+        decode_record(bytes(data))
+
+
+def test_any_damaged_byte_is_reported_as_corrupt():
+    data = encode_record(RECORD, "binary")
+    for i in range(len(data)):
+        for value in (0x00, 0x7F, 0xFF, data[i] ^ 0x80):
+            damaged = bytearray(data)
+            damaged[i] = value
+            try:
+                record = decode_record(bytes(damaged), lazy=["saved_game"])
+                for section in record.values():
+                    if isinstance(section, LazySection):
+                        section.load()
+            except SaveFormatError:
+                pass
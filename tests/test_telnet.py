@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from server import (CHARSET, DO, DONT, IAC, MAX_LINE, SB, SE, SGA, WILL, WONT,
+                    TelnetConnection)
+
+
+class Transport:
+    def __init__(self):
+        self.reading = True
+
+    def pause_reading(self):
+        self.reading = False
+
+
+class Writer:
+    """Заменяет StreamWriter: копит отправленные байты."""
+
+    def __init__(self):
+        self.sent = bytearray()
+        self.transport = Transport()
+
+    def is_closing(self):
+        return False
+
+    def write(self, data):
+        self.sent += data
+
+    async def drain(self):
+        pass
+
+    def get_extra_info(self, name):
+        return None
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def connect(loop):
+    return TelnetConnection(asyncio.StreamReader(loop=loop), Writer(), loop)
+
+
+def lines(conn, *chunks):
+    for chunk in chunks:
+        conn._feed(chunk)
+    result, conn._lines = conn._lines, []
+    return result
+
+
+def test_line_endings(loop):
+    conn = connect(loop)
+    assert lines(conn, b"abc\r\ndef\nghi\r\0jkl\r") == ["abc", "def", "ghi", "jkl"]
+    # LF после CR из прошлого куска — тот же конец строки
+    assert lines(conn, b"\nmno\n") == ["mno"]
+    assert not conn.telnet
+
+
+def test_utf8_and_escaped_iac(loop):
+    conn = connect(loop)
+    assert lines(conn, "привет\r\n".encode()) == ["привет"]
+    assert lines(conn, b"a" + bytes((IAC, IAC)) + b"b\n") == ["a�b"]
+
+
+def test_option_negotiation(loop):
+    conn = connect(loop)
+    assert lines(conn, bytes((IAC, DO, 99, IAC, WILL, 98, IAC, DO, SGA)), b"ok\n") == ["ok"]
+    assert conn.telnet
+    assert conn.writer.sent == bytes((IAC, WONT, 99, IAC, DONT, 98))
+
+
+def test_charset_request(loop):
+    conn = connect(loop)
+    lines(conn, bytes((IAC, DO, CHARSET)))
+    assert conn.writer.sent.startswith(bytes((IAC, SB, CHARSET)))
+    assert conn.writer.sent.endswith(b"UTF-8" + bytes((IAC, SE)))
+
+
+def test_subnegotiation_is_skipped(loop):
+    data = bytes((IAC, SB, 24, 0)) + b"xterm\n" + bytes((IAC, IAC, IAC, SE)) + b"x\n"
+    assert lines(connect(loop), data) == ["x"]
+
+
+def test_commands_split_across_reads(loop):
+    conn = connect(loop)
+    chunks = [bytes((b,)) for b in bytes((IAC, DO, 99, IAC, SB, 24, IAC, SE))] + [b"y", b"\r", b"\n"]
+    assert lines(conn, *chunks) == ["y"]
+    assert conn.writer.sent == bytes((IAC, WONT, 99))
+
+
+def test_long_line_is_truncated(loop):
+    assert lines(connect(loop), b"x" * (MAX_LINE + 100) + b"\n") == ["x" * MAX_LINE]
+
+
+def test_readline_and_eof(loop):
+    conn = connect(loop)
+    conn.reader.feed_data(b"one\r\ntwo")
+    conn.reader.feed_eof()
+    assert loop.run_until_complete(conn.readline()) == "one"
+    with pytest.raises(EOFError):
+        loop.run_until_complete(conn.readline())
+
+
+def test_handoff_keeps_parser_state_and_unread_input(loop):
+    conn = connect(loop)
+    conn.reader.feed_data(b"name\r")
+    assert loop.run_until_complete(conn.readline()) == "name"
+    # Уже принятые сокетом, но не прочитанные байты: LF от CR выше,
+    # начало строки и начало команды
+    conn.reader.feed_data(b"\npart" + bytes((IAC,)))
+    state = conn.handoff()
+    assert not conn.writer.transport.reading
+    assert conn.writer.sent == b""
+
+    worker = connect(loop)
+    worker.adopt(state)
+    assert lines(worker, bytes((DO, 99)), b"ial\n") == ["partial"]
+    assert worker.writer.sent == bytes((IAC, WONT, 99))
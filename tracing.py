@@ -0,0 +1,202 @@
+
+import os
+import sys
+import time
+import inspect
+import functools
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Generator, List, Optional, Tuple
+
+from metrics import Histogram
+
+
+# Включить трассировку при запуске (main.py --profile включает сам)
+TRACE = os.environ.get("TAJNA_TRACE", "0") == "1"
+
+# Сколько самых долгих участков печатать в сводке
+SUMMARY_TOP = 15
+
+SPAN_SECONDS = Histogram("tajna_span_seconds",
+                         "Длительность участков кода (при включённой трассировке)", ("span",))
+
+_enabled = TRACE
+_local = threading.local()
+_lock = threading.Lock()
+# Свёрнутый стек "a;b;c" → собственное время, секунды
+_folded: Dict[str, float] = defaultdict(float)
+# Участок → [вызовов, полное время]
+_totals: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+
+
+def enable(on: bool = True) -> None:
+    global _enabled
+    _enabled = on
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    with _lock:
+        _folded.clear()
+        _totals.clear()
+
+
+class _Frame:
+    __slots__ = ("name", "started", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.children = 0.0
+
+
+def _stack() -> List[_Frame]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _push(name: str) -> _Frame:
+    frame = _Frame(name)
+    _stack().append(frame)
+    return frame
+
+
+def _pop(frame: _Frame) -> float:
+    """Снять участок со стека, учесть собственное время. Возвращает полное."""
+    stack = _stack()
+    elapsed = time.perf_counter() - frame.started
+    path = ";".join(f.name for f in stack)
+    stack.pop()
+    if stack:
+        stack[-1].children += elapsed
+    with _lock:
+        _folded[path] += elapsed - frame.children
+    return elapsed
+
+
+def _record(name: str, elapsed: float) -> None:
+    with _lock:
+        total = _totals[name]
+        total[0] += 1
+        total[1] += elapsed
+    SPAN_SECONDS.observe(elapsed, name)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("name", "frame")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.frame = _push(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, _pop(self.frame))
+        return False
+
+
+def span(name: str):
+    """Контекстный менеджер участка. Выключенная трассировка почти ничего не стоит."""
+    return _Span(name) if _enabled else _NO_SPAN
+
+
+def trace_flow(name: str, flow: Generator) -> Generator:
+    """Обернуть поток игры: время считается только пока он выполняется,
+    ожидание ввода игрока не учитывается."""
+    if not _enabled:
+        return flow
+    return _traced_flow(name, flow)
+
+
+def _traced_flow(name: str, flow: Generator) -> Generator:
+    active = 0.0
+    answer, error = None, None
+    while True:
+        frame = _push(name)
+        try:
+            if error is not None:
+                prompt = flow.throw(error)
+            else:
+                prompt = flow.send(answer)
+        except StopIteration as stop:
+            _record(name, active + _pop(frame))
+            return stop.value
+        except BaseException:
+            _record(name, active + _pop(frame))
+            raise
+        active += _pop(frame)
+
+        try:
+            answer, error = (yield prompt), None
+        except GeneratorExit:
+            flow.close()
+            raise
+        except BaseException as e:
+            answer, error = None, e
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Декоратор участка. Для генераторов (потоков игры) — как trace_flow."""
+    def decorate(fn: Callable) -> Callable:
+        label = name or fn.__qualname__
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def flow_wrapper(*args, **kwargs):
+                return trace_flow(label, fn(*args, **kwargs))
+            return flow_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            frame = _push(label)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(label, _pop(frame))
+        return wrapper
+    return decorate
+
+
+def folded() -> List[Tuple[str, int]]:
+    """Свёрнутые стеки для flamegraph.pl / speedscope: (стек, микросекунды)."""
+    with _lock:
+        items = sorted(_folded.items())
+    return [(path, round(seconds * 1e6)) for path, seconds in items if seconds > 0]
+
+
+def dump(path: str, out=None) -> None:
+    """Записать свёрнутые стеки в файл и напечатать сводку по участкам."""
+    out = out or sys.stderr
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, micros in folded():
+            f.write(f"{stack} {micros}\n")
+
+    with _lock:
+        totals = sorted(_totals.items(), key=lambda item: -item[1][1])
+    out.write(f"\n  ⏱️ Профиль ({path}):\n")
+    out.write(f"  {'участок':<32}{'вызовов':>9}{'всего мс':>12}{'среднее мс':>12}\n")
+    for label, (count, seconds) in totals[:SUMMARY_TOP]:
+        out.write(f"  {label:<32}{count:>9}{seconds * 1000:>12.2f}{seconds * 1000 / count:>12.3f}\n")
+    out.flush()